@@ -1355,6 +1355,8 @@ class CBindingsPacket(c_common.CPacket):
         return return_list, needs_i
 
 class CBindingsGenerator(c_common.CGeneratorTrait, common.BindingsGenerator):
+    incremental_state = ['released_files']
+
     def get_bindings_name(self):
         return 'c'
 
@@ -1373,14 +1375,11 @@ class CBindingsGenerator(c_common.CGeneratorTrait, common.BindingsGenerator):
     def generate(self, device):
         filename = '{0}_{1}'.format(device.get_category().under, device.get_name().under)
 
-        with open(os.path.join(self.get_bindings_dir(), filename + '.c'), 'w') as f:
-            f.write(device.get_c_source())
+        common.write_output_file(os.path.join(self.get_bindings_dir(), filename + '.c'), device.get_c_source())
 
-        with open(os.path.join(self.get_bindings_dir(), filename + '.h'), 'w') as f:
-            f.write(device.get_c_header())
+        common.write_output_file(os.path.join(self.get_bindings_dir(), filename + '.h'), device.get_c_header())
 
-        with open(os.path.join(self.get_bindings_dir(), filename + '.symbols'), 'w') as f:
-            f.write(device.get_c_symbols())
+        common.write_output_file(os.path.join(self.get_bindings_dir(), filename + '.symbols'), device.get_c_symbols())
 
         if device.is_released():
             self.released_files.append(filename + '.c')
@@ -440,8 +440,7 @@ class CDocGenerator(c_common.CGeneratorTrait, common.DocGenerator):
         return c_common.CElement
 
     def generate(self, device):
-        with open(device.get_doc_rst_path(), 'w') as f:
-            f.write(device.get_c_doc())
+        common.write_output_file(device.get_doc_rst_path(), device.get_c_doc())
 
 def generate(root_dir, language):
     common.generate(root_dir, language, CDocGenerator)
@@ -872,8 +872,7 @@ class CExamplesGenerator(c_common.CGeneratorTrait, common.ExamplesGenerator):
             else:
                 print('  - ' + filename)
 
-            with open(filepath, 'w') as f:
-                f.write(example.get_c_source())
+            common.write_output_file(filepath, example.get_c_source())
 
 def generate(root_dir):
     common.generate(root_dir, 'en', CExamplesGenerator)
@@ -33,6 +33,9 @@ import copy
 import math
 import multiprocessing.dummy
 import functools
+import hashlib
+import pickle
+import json
 from collections import namedtuple
 
 gen_text_rst = """..
@@ -512,7 +515,10 @@ def copy_examples(copy_files, path):
     for copy_file in copy_files:
         doc_dest = os.path.join(doc_path, copy_file[1])
         doc_src = copy_file[0]
-        shutil.copy(doc_src, doc_dest)
+
+        with open(doc_src, 'rb') as f:
+            write_output_file(doc_dest, f.read())
+
         print('   - {0}'.format(copy_file[1]))
 
     if len(copy_files) == 0:
@@ -631,6 +637,71 @@ def recreate_dir(path):
 
     os.makedirs(path)
 
+# all generated files are written by write_output_file. it only writes a file if
+# its content differs from the existing file, ignoring the date in the header
+# comment. this keeps the mtime of unchanged files, so downstream build tools and
+# copy_all.py don't see them as modified
+output_file_date_marker = 'This file was automatically generated on'
+output_file_paths = set()
+output_file_counts = {'written': 0, 'skipped': 0}
+
+def reset_output_files():
+    output_file_paths.clear()
+    output_file_counts['written'] = 0
+    output_file_counts['skipped'] = 0
+
+def output_file_is_unchanged(path, content):
+    if isinstance(content, bytes):
+        mode = 'rb'
+        marker = output_file_date_marker.encode('ascii')
+    else:
+        mode = 'r'
+        marker = output_file_date_marker
+
+    try:
+        with open(path, mode) as f:
+            existing_content = f.read()
+    except (IOError, OSError):
+        return False
+
+    if existing_content == content:
+        return True
+
+    existing_lines = existing_content.splitlines(True)
+    lines = content.splitlines(True)
+
+    if len(existing_lines) != len(lines):
+        return False
+
+    for existing_line, line in zip(existing_lines, lines):
+        if existing_line != line and (marker not in existing_line or marker not in line):
+            return False
+
+    return True
+
+def keep_output_file(path):
+    # mark a file as generated without writing it, see Generator.remove_stale_output_files
+    output_file_paths.add(os.path.realpath(path))
+
+def write_output_file(path, content):
+    keep_output_file(path)
+
+    if output_file_is_unchanged(path, content):
+        output_file_counts['skipped'] += 1
+        return False
+
+    # write the file atomically, some files (e.g. device_infos.py) are written
+    # by generators that might run in parallel
+    tmp_path = '{0}.{1}.tmp'.format(path, os.getpid())
+
+    with open(tmp_path, 'wb' if isinstance(content, bytes) else 'w') as f:
+        f.write(content)
+
+    os.rename(tmp_path, path)
+    output_file_counts['written'] += 1
+
+    return True
+
 def specialize_template(template_filename, destination_filename, replacements, check_completeness=True):
     lines = []
     replaced = set()
@@ -650,8 +721,7 @@ def specialize_template(template_filename, destination_filename, replacements, c
     if check_completeness and replaced != set(replacements.keys()):
         raise GeneratorError('Not all replacements for {0} have been applied'.format(template_filename))
 
-    with open(destination_filename, 'w') as f:
-        f.writelines(lines)
+    write_output_file(destination_filename, ''.join(lines))
 
 def make_c_like_bitmask(value, shift='{0} << {1}', combine='({0}) | ({1})'):
     if value == 0:
@@ -702,169 +772,280 @@ def generate(root_dir, language, generator_class):
 
         subgenerate(root_dir, language, generator_class, config_name)
 
-def subgenerate(root_dir, language, generator_class, config_name):
-    global lang
-    lang = language
+def prepare_common_constant_groups(com, common_constant_groups):
+    features = com['features']
 
-    print('--> {0}'.format(config_name))
+    for common_constant_group in common_constant_groups:
+        if common_constant_group['feature'] not in features:
+            common_constant_group['to_be_removed'] = True
 
-    config_path_parts = [root_dir, '..', 'configs']
+    return filter(lambda x: 'to_be_removed' not in x, common_constant_groups)
 
-    if config_name != 'tinkerforge':
-        config_path_parts.append(config_name)
+def prepare_common_packets(com, common_packets):
+    features = com['features']
+
+    for common_packet in common_packets:
+        if common_packet.get('is_virtual', False):
+            continue
+
+        if com['name'] in common_packet['since_firmware']:
+            common_packet['since_firmware'] = common_packet['since_firmware'][com['name']]
+        else:
+            common_packet['since_firmware'] = common_packet['since_firmware']['*']
+
+        if common_packet['since_firmware'] == None:
+            common_packet['to_be_removed'] = True
+
+        if common_packet['feature'] not in features:
+            common_packet['to_be_removed'] = True
+
+    return filter(lambda x: 'to_be_removed' not in x, common_packets)
+
+def prepare_device_config(name, com, common_constant_groups, common_packets):
+    if com['documented'] and not com['released']:
+        raise GeneratorError('{0} is marked as documented, but as not released'.format(name))
+
+    check_name(com['name'], display_name=com['display_name'])
+
+    if 'common_included' not in com:
+        com['constant_groups'].extend(prepare_common_constant_groups(com, copy.deepcopy(common_constant_groups)))
+        com['packets'].extend(prepare_common_packets(com, copy.deepcopy(common_packets)))
+        com['common_included'] = True
 
-    config_path = os.path.join(*config_path_parts)
+    next_function_id = 1
+
+    for raw_packet in com['packets']:
+        if not 'function_id' in raw_packet:
+            raw_packet['function_id'] = next_function_id
+        else:
+            next_function_id = raw_packet['function_id']
+
+        next_function_id += 1
+
+    api_version = com['api_version']
+    api_version_extra = com.get('api_version_extra', 0)
+
+    if not com['released'] and api_version != [2, 0, 0]:
+        raise GeneratorError('Unreleased device must have API version 2.0.0')
+
+    since_firmwares = set()
+
+    for raw_packet in com['packets']:
+        since_firmware = raw_packet['since_firmware']
+
+        if since_firmware != None and since_firmware > [2, 0, 0]:
+            since_firmwares.add('.'.join([str(x) for x in since_firmware]))
+
+    since_firmwares = list(since_firmwares)
+
+    if len(since_firmwares) + api_version_extra != api_version[2]:
+        raise GeneratorError('API version mismatch: len({0}) + {1} != {2}'
+                             .format(since_firmwares, api_version_extra, api_version[2]))
+
+device_configs_cache = {}
+device_config_cache_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), '.cache', 'generators')
+
+def get_device_config_base_hash(config_path):
+    # the merged com dict of a device config depends on the config itself, on the
+    # common config and helper modules next to it and on the code in common.py
+    base_hash = hashlib.sha256()
+
+    base_hash.update('python{0}\n'.format(sys.version_info[0]).encode('ascii'))
+
+    for path in [os.path.realpath(__file__).replace('.pyc', '.py')] + \
+                [os.path.join(config_path, name) for name in sorted(os.listdir(config_path))
+                 if name.endswith('.py') and not name.endswith('_config.py')]:
+        with open(path, 'rb') as f:
+            base_hash.update(f.read())
+
+    return base_hash
+
+def load_cached_device_config(cache_path):
+    try:
+        with open(cache_path, 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        # a missing or broken cache file is not an error, the config is just parsed again
+        return None
+
+def store_cached_device_config(cache_path, com):
+    try:
+        if not os.path.exists(device_config_cache_dir):
+            os.makedirs(device_config_cache_dir)
+
+        # write atomically, generators might run in parallel
+        tmp_path = '{0}.{1}.tmp'.format(cache_path, os.getpid())
+
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(com, f, 2)
+
+        os.rename(tmp_path, cache_path)
+    except (IOError, OSError) as e:
+        print('Warning: Could not write device config cache file {0}: {1}'.format(cache_path, e))
+
+def load_device_configs(config_path):
+    # the device configs are loaded, merged with the common config and validated
+    # only once per process and are then shared between all generators. the
+    # returned com dicts must be treated as read-only. additionally the merged
+    # and validated com dicts are cached on disk, keyed by the SHA-256 of their
+    # inputs, so that unchanged configs don't have to be parsed and validated
+    # again. to clear the cache remove the .cache/generators/ directory
+    config_key = os.path.realpath(config_path)
+
+    if config_key in device_configs_cache:
+        return device_configs_cache[config_key]
 
     if config_path not in sys.path:
         sys.path.append(config_path)
 
-    configs = sorted(os.listdir(config_path))
+    base_hash = get_device_config_base_hash(config_path)
+    device_configs = []
+    device_identifiers = set()
 
-    common_constant_groups = copy.deepcopy(__import__('device_commonconfig').common_constant_groups)
-    common_packets = copy.deepcopy(__import__('device_commonconfig').common_packets)
+    for config in sorted(os.listdir(config_path)):
+        if config.endswith('_config.py'):
+            name = config[:-10]
+            config_hash = base_hash.copy()
 
-    brick_infos = []
-    bricklet_infos = []
-    tng_infos = []
-    device_identifiers = set()
+            with open(os.path.join(config_path, config), 'rb') as f:
+                config_hash.update(f.read())
 
-    generator = generator_class(root_dir, config_name, language)
-    generator.prepare()
+            cache_path = os.path.join(device_config_cache_dir, config_hash.hexdigest() + '.pickle')
+            com = load_cached_device_config(cache_path)
 
-    def prepare_common_constant_groups(com, common_constant_groups):
-        features = com['features']
+            if com == None:
+                common_config = __import__('device_commonconfig')
+                com = copy.deepcopy(__import__(config[:-3]).com)
 
-        for common_constant_group in common_constant_groups:
-            if common_constant_group['feature'] not in features:
-                common_constant_group['to_be_removed'] = True
+                prepare_device_config(name, com, common_config.common_constant_groups, common_config.common_packets)
+                store_cached_device_config(cache_path, com)
 
-        return filter(lambda x: 'to_be_removed' not in x, common_constant_groups)
+            if com['device_identifier'] in device_identifiers:
+                raise GeneratorError('Device identifier {0} is not unique'.format(com['device_identifier']))
 
-    def prepare_common_packets(com, common_packets):
-        features = com['features']
+            device_identifiers.add(com['device_identifier'])
+            device_configs.append((name, com, config_hash.hexdigest()))
 
-        for common_packet in common_packets:
-            if common_packet.get('is_virtual', False):
-                continue
+    device_configs_cache[config_key] = device_configs
 
-            if com['name'] in common_packet['since_firmware']:
-                common_packet['since_firmware'] = common_packet['since_firmware'][com['name']]
-            else:
-                common_packet['since_firmware'] = common_packet['since_firmware']['*']
+    return device_configs
 
-            if common_packet['since_firmware'] == None:
-                common_packet['to_be_removed'] = True
+def is_incremental_generation():
+    # incremental generation is enabled by setting GENERATORS_INCREMENTAL=1 in
+    # the environment or by passing --incremental to generate_all.py
+    return os.environ.get('GENERATORS_INCREMENTAL', '0') == '1'
+
+def subgenerate(root_dir, language, generator_class, config_name):
+    global lang
+    lang = language
 
-            if common_packet['feature'] not in features:
-                common_packet['to_be_removed'] = True
+    print('--> {0}'.format(config_name))
 
-        return filter(lambda x: 'to_be_removed' not in x, common_packets)
+    reset_output_files()
 
-    for config in configs:
-        if config.endswith('_config.py'):
-            com = copy.deepcopy(__import__(config[:-3]).com)
+    config_path_parts = [root_dir, '..', 'configs']
 
-            if com['documented'] and not com['released']:
-                raise GeneratorError('{0} is marked as documented, but as not released'.format(config[:-10]))
+    if config_name != 'tinkerforge':
+        config_path_parts.append(config_name)
 
-            if not com['released'] and not com['documented']:
-                print(' * {0} \033[01;36m(not released, not documented)\033[0m'.format(config[:-10]))
-            elif not com['released']:
-                print(' * {0} \033[01;36m(not released)\033[0m'.format(config[:-10]))
-            elif not com['documented']:
-                print(' * {0} \033[01;36m(not documented)\033[0m'.format(config[:-10]))
-            else:
-                print(' * {0}'.format(config[:-10]))
+    device_configs = load_device_configs(os.path.join(*config_path_parts))
 
-            if 'common_included' not in com:
-                com['constant_groups'].extend(prepare_common_constant_groups(com, copy.deepcopy(common_constant_groups)))
-                com['packets'].extend(prepare_common_packets(com, copy.deepcopy(common_packets)))
-                com['common_included'] = True
+    brick_infos = []
+    bricklet_infos = []
+    tng_infos = []
 
-            device = generator.get_device_class()(com, generator)
-            device_identifier = device.get_device_identifier()
+    generator = generator_class(root_dir, config_name, language)
+    generator.prepare()
 
-            if device_identifier in device_identifiers:
-                raise GeneratorError('Device identifier {0} is not unique'.format(device_identifier))
+    for name, com, config_hash in device_configs:
+        if not com['released'] and not com['documented']:
+            print(' * {0} \033[01;36m(not released, not documented)\033[0m'.format(name))
+        elif not com['released']:
+            print(' * {0} \033[01;36m(not released)\033[0m'.format(name))
+        elif not com['documented']:
+            print(' * {0} \033[01;36m(not documented)\033[0m'.format(name))
+        else:
+            print(' * {0}'.format(name))
 
-            device_identifiers.add(device_identifier)
+        device = generator.get_device_class()(com, generator)
 
-            # only collect device_infos for default config
-            if config_name == 'tinkerforge':
-                if device.is_brick():
-                    ref_name = device.get_name().under + '_brick'
-                    hardware_doc_name = device.get_short_display_name().replace(' ', '_').replace('/', '_').replace('-', '').replace('2.0', 'V2').replace('3.0', 'V3') + '_Brick'
-                    software_doc_prefix = device.get_name().camel + '_Brick'
+        # only collect device_infos for default config
+        if config_name == 'tinkerforge':
+            if device.is_brick():
+                ref_name = device.get_name().under + '_brick'
+                hardware_doc_name = device.get_short_display_name().replace(' ', '_').replace('/', '_').replace('-', '').replace('2.0', 'V2').replace('3.0', 'V3') + '_Brick'
+                software_doc_prefix = device.get_name().camel + '_Brick'
 
-                    if device.get_device_identifier() != 17:
-                        firmware_url_part = device.get_name().under
-                    else:
-                        firmware_url_part = None
-
-                    device_info = (device.get_device_identifier(),
-                                   device.get_long_display_name(),
-                                   device.get_short_display_name(),
-                                   ref_name,
-                                   hardware_doc_name,
-                                   software_doc_prefix,
-                                   device.get_git_name(),
-                                   firmware_url_part,
-                                   False,
-                                   device.is_released(),
-                                   device.is_documented(),
-                                   device.is_discontinued(),
-                                   True,
-                                   device.get_description())
-
-                    brick_infos.append(device_info)
-                elif device.is_tng():
-                    ref_name = 'tng_' + device.get_name().under
-                    hardware_doc_name = device.get_short_display_name().replace(' ', '_').replace('/', '_').replace('-', '').replace('2.0', 'V2').replace('3.0', 'V3')
-                    software_doc_prefix = 'TNG_' + device.get_name().camel
+                if device.get_device_identifier() != 17:
                     firmware_url_part = device.get_name().under
-
-                    device_info = (device.get_device_identifier(),
-                                   device.get_long_display_name(),
-                                   device.get_short_display_name(),
-                                   ref_name,
-                                   hardware_doc_name,
-                                   software_doc_prefix,
-                                   device.get_git_name(),
-                                   firmware_url_part,
-                                   False,
-                                   device.is_released(),
-                                   device.is_documented(),
-                                   device.is_discontinued(),
-                                   True,
-                                   device.get_description())
-
-                    tng_infos.append(device_info)
                 else:
-                    ref_name = device.get_name().under + '_bricklet'
-                    hardware_doc_name = device.get_short_display_name().replace(' ', '_').replace('/', '_').replace('-', '').replace('2.0', 'V2').replace('3.0', 'V3')
-                    software_doc_prefix = device.get_name().camel + '_Bricklet'
-                    firmware_url_part = device.get_name().under
-
-                    device_info = (device.get_device_identifier(),
-                                   device.get_long_display_name(),
-                                   device.get_short_display_name(),
-                                   ref_name,
-                                   hardware_doc_name,
-                                   software_doc_prefix,
-                                   device.get_git_name(),
-                                   firmware_url_part,
-                                   device.has_comcu(),
-                                   device.is_released(),
-                                   device.is_documented(),
-                                   device.is_discontinued(),
-                                   True,
-                                   device.get_description())
-
-                    bricklet_infos.append(device_info)
-
-            generator.generate(device)
+                    firmware_url_part = None
+
+                device_info = (device.get_device_identifier(),
+                               device.get_long_display_name(),
+                               device.get_short_display_name(),
+                               ref_name,
+                               hardware_doc_name,
+                               software_doc_prefix,
+                               device.get_git_name(),
+                               firmware_url_part,
+                               False,
+                               device.is_released(),
+                               device.is_documented(),
+                               device.is_discontinued(),
+                               True,
+                               device.get_description())
+
+                brick_infos.append(device_info)
+            elif device.is_tng():
+                ref_name = 'tng_' + device.get_name().under
+                hardware_doc_name = device.get_short_display_name().replace(' ', '_').replace('/', '_').replace('-', '').replace('2.0', 'V2').replace('3.0', 'V3')
+                software_doc_prefix = 'TNG_' + device.get_name().camel
+                firmware_url_part = device.get_name().under
+
+                device_info = (device.get_device_identifier(),
+                               device.get_long_display_name(),
+                               device.get_short_display_name(),
+                               ref_name,
+                               hardware_doc_name,
+                               software_doc_prefix,
+                               device.get_git_name(),
+                               firmware_url_part,
+                               False,
+                               device.is_released(),
+                               device.is_documented(),
+                               device.is_discontinued(),
+                               True,
+                               device.get_description())
+
+                tng_infos.append(device_info)
+            else:
+                ref_name = device.get_name().under + '_bricklet'
+                hardware_doc_name = device.get_short_display_name().replace(' ', '_').replace('/', '_').replace('-', '').replace('2.0', 'V2').replace('3.0', 'V3')
+                software_doc_prefix = device.get_name().camel + '_Bricklet'
+                firmware_url_part = device.get_name().under
+
+                device_info = (device.get_device_identifier(),
+                               device.get_long_display_name(),
+                               device.get_short_display_name(),
+                               ref_name,
+                               hardware_doc_name,
+                               software_doc_prefix,
+                               device.get_git_name(),
+                               firmware_url_part,
+                               device.has_comcu(),
+                               device.is_released(),
+                               device.is_documented(),
+                               device.is_discontinued(),
+                               True,
+                               device.get_description())
+
+                bricklet_infos.append(device_info)
+
+        generator.generate_incremental(device, config_hash)
 
     generator.finish()
+    generator.remove_stale_output_files()
 
     # only update device_infos.py for default config
     if config_name == 'tinkerforge':
@@ -876,27 +1057,34 @@ def subgenerate(root_dir, language, generator_class, config_name):
                                {'en': 'Makes all Bricklet signals available',
                                 'de': 'Macht alle Bricklet Signale zugänglich'}))
 
-        with open(os.path.join(root_dir, '..', 'device_infos.py'), 'w') as f:
-            f.write('# -*- coding: utf-8 -*-\n')
-            f.write('from collections import namedtuple\n')
-            f.write('\n')
-            f.write("DeviceInfo = namedtuple('DeviceInfo', 'identifier long_display_name short_display_name ref_name hardware_doc_name software_doc_prefix git_name firmware_url_part has_comcu is_released is_documented is_discontinued has_bindings description')\n")
-            f.write('\n')
-            f.write('brick_infos = \\\n')
-            f.write('[\n')
+        # device_infos.py is written by the bindings generators of all languages,
+        # write_output_file writes it atomically as those might run in parallel
+        lines = []
+        lines.append('# -*- coding: utf-8 -*-\n')
+        lines.append('from collections import namedtuple\n')
+        lines.append('\n')
+        lines.append("DeviceInfo = namedtuple('DeviceInfo', 'identifier long_display_name short_display_name ref_name hardware_doc_name software_doc_prefix git_name firmware_url_part has_comcu is_released is_documented is_discontinued has_bindings description')\n")
+        lines.append('\n')
+        lines.append('brick_infos = \\\n')
+        lines.append('[\n')
+
+        for brick_info in sorted(brick_infos, key=lambda info: info[2].lower()):
+            lines.append('    DeviceInfo{0},\n'.format(brick_info))
 
-            for brick_info in sorted(brick_infos, key=lambda info: info[2].lower()):
-                f.write('    DeviceInfo{0},\n'.format(brick_info))
+        lines.append(']\n')
+        lines.append('\n')
+        lines.append('bricklet_infos = \\\n')
+        lines.append('[\n')
 
-            f.write(']\n')
-            f.write('\n')
-            f.write('bricklet_infos = \\\n')
-            f.write('[\n')
+        for bricklet_info in sorted(bricklet_infos, key=lambda info: info[2].lower()):
+            lines.append('    DeviceInfo{0},\n'.format(bricklet_info))
 
-            for bricklet_info in sorted(bricklet_infos, key=lambda info: info[2].lower()):
-                f.write('    DeviceInfo{0},\n'.format(bricklet_info))
+        lines.append(']\n')
 
-            f.write(']\n')
+        write_output_file(os.path.join(root_dir, '..', 'device_infos.py'), ''.join(lines))
+
+    if output_file_counts['written'] + output_file_counts['skipped'] > 0:
+        print(' * {0} file(s) written, {1} file(s) unchanged'.format(output_file_counts['written'], output_file_counts['skipped']))
 
 check_name_valid_word_head = re.compile('^[A-Z]+[A-Z0-9]*[a-z0-9]*$')
 check_name_valid_word_tail = re.compile('^[A-Z0-9]+[a-z0-9]*$')
@@ -904,7 +1092,15 @@ check_name_valid_word_constant = re.compile('^[A-Z0-9]+[a-z0-9]*$') # constants
 check_name_exceptions_whole_name = ['Industrial Dual 0 20mA', 'Industrial Dual 0 20mA V2']
 check_name_exceptions_word_in_constant = ['20mA', '24mA', 'EtOH']
 
+check_name_valid_names = set()
+
 def check_name(name, display_name=None, is_constant=False):
+    # the same names are checked for every generator, only check them once
+    key = (name, display_name, is_constant)
+
+    if key in check_name_valid_names:
+        return
+
     if isinstance(name, tuple):
         raise GeneratorError('Name {0} uses old tuple format, update it to new split-camel-case format'.format(name))
 
@@ -944,6 +1140,8 @@ def check_name(name, display_name=None, is_constant=False):
             raise GeneratorError("Name '{0}' and display name '{1}' ({2}) mismatch" \
                                  .format(name, display_name, display_name_to_check))
 
+    check_name_valid_names.add(key)
+
 def break_string(string, indent_marker, space=' ', continuation='', indent_head='',
                  indent_tail='', indent_suffix='', max_length=90, break_point='<BP>'):
     result = string.replace(break_point, space)
@@ -1273,6 +1471,7 @@ class Packet(object):
         self.device = device
         self.elements = []
         self.high_level = {}
+        self.doc_text = raw_data['doc'][1]
 
         check_name(raw_data['name'])
 
@@ -1411,7 +1610,7 @@ class Packet(object):
         if self.get_type() == 'callback' and self.has_high_level():
             null = self.get_generator().get_doc_null_value_name()
             param = self.get_generator().get_doc_formatted_param(self.get_high_level('stream_*').get_data_element())
-            doc = self.raw_data['doc'][1]
+            doc = dict(self.raw_data['doc'][1]) # the raw data is shared between all generators, don't modify it
             doc['de'] += """
 .. note::
  Falls das Rekonstruieren des Wertes fehlschlägt, wird der Callback mit {} für {} ausgelöst.
@@ -1420,6 +1619,7 @@ class Packet(object):
 .. note::
  If reconstructing the value fails, the callback is triggered with {} for {}.
 """.format(null, param)
+            self.doc_text = doc
 
     def get_device(self): # parent
         return self.device
@@ -1502,7 +1702,7 @@ class Packet(object):
         return self.raw_data['doc'][0]
 
     def get_doc_text(self):
-        return self.raw_data['doc'][1]
+        return self.doc_text
 
     def get_doc_substitutions(self):
         doc = self.raw_data['doc']
@@ -1645,16 +1845,8 @@ class Device(object):
 
             self.constant_groups.append(constant_group)
 
-        next_function_id = 1
-
+        # function IDs are assigned by prepare_device_config
         for raw_packet in raw_data['packets']:
-            if not 'function_id' in raw_packet:
-                raw_packet['function_id'] = next_function_id
-            else:
-                next_function_id = raw_packet['function_id']
-
-            next_function_id += 1
-
             packet = generator.get_packet_class()(raw_packet, self)
 
             self.all_packets.append(packet)
@@ -1662,23 +1854,6 @@ class Device(object):
             if packet.get_function_id() >= 0:
                 self.all_packets_without_doc_only.append(packet)
 
-        if not self.is_released() and self.get_api_version() != [2, 0, 0]:
-            raise GeneratorError('Unreleased device must have API version 2.0.0')
-
-        since_firmwares = set()
-
-        for packet in self.all_packets:
-            since_firmware = packet.get_since_firmware()
-
-            if since_firmware != None and since_firmware > [2, 0, 0]:
-                since_firmwares.add(packet.get_formatted_since_firmware())
-
-        since_firmwares = list(since_firmwares)
-
-        if len(since_firmwares) + self.get_api_version_extra() != self.get_api_version()[2]:
-            raise GeneratorError('API version mismatch: len({0}) + {1} != {2}'
-                                 .format(since_firmwares, self.get_api_version_extra(), self.get_api_version()[2]))
-
         function_names = set()
         callback_names = set()
 
@@ -2796,6 +2971,9 @@ class Generator:
             self.bindings_dir_name = 'bindings_' + self.get_config_name().under
             self.doc_dir_name = 'doc_' + self.get_config_name().under
 
+        self.output_dirs = []
+        self.output_files_before = {}
+
     def get_bindings_name(self):
         raise GeneratorError("get_bindings_name() not implemented")
 
@@ -2958,9 +3136,42 @@ class Generator:
     def generate(self, device):
         raise GeneratorError("generate() not implemented")
 
+    def generate_incremental(self, device, config_hash):
+        self.generate(device)
+
     def finish(self):
         pass
 
+    def prepare_output_dir(self, path):
+        # used instead of recreate_dir to keep the existing files for
+        # write_output_file. files that are not generated again are removed by
+        # remove_stale_output_files after finish
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+        for root, _, names in os.walk(path):
+            for name in names:
+                file_path = os.path.realpath(os.path.join(root, name))
+                self.output_files_before[file_path] = os.stat(file_path).st_mtime
+
+        self.output_dirs.append(os.path.realpath(path))
+
+    def remove_stale_output_files(self):
+        # files that were written by other means than write_output_file are
+        # detected by their changed mtime
+        for path, mtime in self.output_files_before.items():
+            if path not in output_file_paths and os.path.exists(path) and os.stat(path).st_mtime == mtime:
+                os.remove(path)
+
+                parent = os.path.dirname(path)
+
+                while parent not in self.output_dirs and len(os.listdir(parent)) == 0:
+                    os.rmdir(parent)
+                    parent = os.path.dirname(parent)
+
+        self.output_dirs = []
+        self.output_files_before = {}
+
 class DocGenerator(Generator):
     def __init__(self, *args, **kwargs):
         Generator.__init__(self, *args, **kwargs)
@@ -2978,7 +3189,7 @@ class DocGenerator(Generator):
         return True
 
     def prepare(self):
-        recreate_dir(os.path.join(self.get_doc_dir(), self.get_language()))
+        self.prepare_output_dir(os.path.join(self.get_doc_dir(), self.get_language()))
 
     def finish(self):
         # Copy IPConnection examples
@@ -2999,19 +3210,137 @@ class DocGenerator(Generator):
 class BindingsGenerator(Generator):
     recreate_bindings_dir = True
 
+    # names of the list attributes that generate() appends to and that finish()
+    # uses. for incremental generation the items appended for each device are
+    # recorded in the manifest and restored if the device is not regenerated.
+    # None means that the generator does not support incremental generation
+    incremental_state = None
+
     def __init__(self, *args, **kwargs):
         Generator.__init__(self, *args, **kwargs)
 
         self.released_files = []
+        self.manifest = None # protected by is_incremental
+        self.new_manifest = {}
+        self.generator_hash = None
+        self.regenerated_count = 0
+        self.skipped_count = 0
+
+    def is_incremental(self):
+        return is_incremental_generation() and self.recreate_bindings_dir and self.incremental_state != None
+
+    def get_manifest_path(self):
+        return os.path.join(self.get_bindings_dir(), '__manifest__')
+
+    def load_manifest(self):
+        try:
+            with open(self.get_manifest_path(), 'r') as f:
+                return json.load(f)
+        except:
+            return None
+
+    def get_generator_hash(self):
+        # the output of a generator depends on its modules and on the templates
+        # and other files next to it
+        if self.generator_hash == None:
+            generator_hash = hashlib.sha256()
+            paths = set()
+
+            for cls in type(self).__mro__:
+                path = getattr(sys.modules[cls.__module__], '__file__', None)
+
+                if path != None:
+                    paths.add(os.path.realpath(path).replace('.pyc', '.py'))
+
+            root_dir = self.get_root_dir()
+
+            for name in os.listdir(root_dir):
+                path = os.path.join(root_dir, name)
+
+                if os.path.isfile(path) and not name.endswith('.zip'):
+                    paths.add(os.path.realpath(path))
+
+            for path in sorted(paths):
+                generator_hash.update(path.encode('utf-8'))
+
+                with open(path, 'rb') as f:
+                    generator_hash.update(f.read())
+
+            self.generator_hash = generator_hash.hexdigest()
+
+        return self.generator_hash
+
+    def get_bindings_files(self):
+        bindings_dir = self.get_bindings_dir()
+        files = {}
+
+        for root, _, names in os.walk(bindings_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                files[os.path.relpath(path, bindings_dir)] = os.stat(path).st_mtime
+
+        return files
 
     def prepare(self):
         if self.recreate_bindings_dir:
-            recreate_dir(self.get_bindings_dir())
+            if self.is_incremental():
+                self.manifest = self.load_manifest()
+
+            self.prepare_output_dir(self.get_bindings_dir())
+
+    def generate_incremental(self, device, config_hash):
+        if not self.is_incremental():
+            self.generate(device)
+            return
+
+        key = device.get_category().under + '_' + device.get_name().under
+        input_hash = hashlib.sha256((config_hash + self.get_generator_hash()).encode('ascii')).hexdigest()
+        entry = None
+
+        if self.manifest != None:
+            entry = self.manifest.get(key)
+
+        if entry != None and entry['hash'] == input_hash and \
+           all([os.path.exists(os.path.join(self.get_bindings_dir(), name)) for name in entry['files']]):
+            for name in entry['files']:
+                keep_output_file(os.path.join(self.get_bindings_dir(), name))
+
+            for name, items in entry['state'].items():
+                getattr(self, name).extend([tuple(item) if isinstance(item, list) else item for item in items])
+
+            self.new_manifest[key] = entry
+            self.skipped_count += 1
+            return
+
+        bindings_dir = os.path.realpath(self.get_bindings_dir())
+        output_files_before = set(output_file_paths)
+        files_before = self.get_bindings_files()
+        lengths = dict([(name, len(getattr(self, name))) for name in self.incremental_state])
+
+        self.generate(device)
+
+        # unchanged files keep their mtime, those are only known to write_output_file
+        files = set([name for name, mtime in self.get_bindings_files().items() if files_before.get(name) != mtime])
+
+        for path in output_file_paths - output_files_before:
+            if path.startswith(bindings_dir + os.sep):
+                files.add(os.path.relpath(path, bindings_dir))
+
+        state = dict([(name, getattr(self, name)[lengths[name]:]) for name in self.incremental_state])
+
+        self.new_manifest[key] = {'hash': input_hash, 'files': sorted(files), 'state': state}
+        self.regenerated_count += 1
 
     def finish(self):
-        with open(os.path.join(self.get_bindings_dir(), '__released_files__'), 'w') as f:
-            for released_file in self.released_files:
-                f.write(released_file + '\n')
+        write_output_file(os.path.join(self.get_bindings_dir(), '__released_files__'),
+                          ''.join([released_file + '\n' for released_file in self.released_files]))
+
+        # files of devices that don't exist anymore and files that are not
+        # generated for a device anymore are removed by remove_stale_output_files
+        if self.is_incremental():
+            write_output_file(self.get_manifest_path(), json.dumps(self.new_manifest, indent=1, sort_keys=True))
+
+            print(' * {0} device(s) regenerated, {1} device(s) unchanged'.format(self.regenerated_count, self.skipped_count))
 
 class ZipGenerator(Generator):
     def get_tmp_dir(self):
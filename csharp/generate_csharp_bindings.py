@@ -1034,6 +1034,8 @@ class CSharpBindingsPacket(csharp_common.CSharpPacket):
         return '\n\t\t///  '.join(text.strip().split('\n'))
 
 class CSharpBindingsGenerator(csharp_common.CSharpGeneratorTrait, common.BindingsGenerator):
+    incremental_state = ['released_files']
+
     def get_bindings_name(self):
         return 'csharp'
 
@@ -1052,8 +1054,7 @@ class CSharpBindingsGenerator(csharp_common.CSharpGeneratorTrait, common.Binding
     def generate(self, device):
         filename = '{0}.cs'.format(device.get_csharp_class_name())
 
-        with open(os.path.join(self.get_bindings_dir(), filename), 'w') as f:
-            f.write(device.get_csharp_source())
+        common.write_output_file(os.path.join(self.get_bindings_dir(), filename), device.get_csharp_source())
 
         if device.is_released():
             self.released_files.append(filename)
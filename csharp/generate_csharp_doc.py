@@ -355,8 +355,7 @@ class CSharpDocGenerator(csharp_common.CSharpGeneratorTrait, common.DocGenerator
         return csharp_common.CSharpElement
 
     def generate(self, device):
-        with open(device.get_doc_rst_path(), 'w') as f:
-            f.write(device.get_csharp_doc())
+        common.write_output_file(device.get_doc_rst_path(), device.get_csharp_doc())
 
 def generate(root_dir, language):
     common.generate(root_dir, language, CSharpDocGenerator)
@@ -689,8 +689,7 @@ class CSharpExamplesGenerator(csharp_common.CSharpGeneratorTrait, common.Example
             else:
                 print('  - ' + filename)
 
-            with open(filepath, 'w') as f:
-                f.write(example.get_csharp_source())
+            common.write_output_file(filepath, example.get_csharp_source())
 
 def generate(root_dir):
     common.generate(root_dir, 'en', CSharpExamplesGenerator)
@@ -1549,6 +1549,8 @@ class DelphiBindingsElement(delphi_common.DelphiElement):
         return name
 
 class DelphiBindingsGenerator(delphi_common.DelphiGeneratorTrait, common.BindingsGenerator):
+    incremental_state = ['released_files']
+
     def get_bindings_name(self):
         return 'delphi'
 
@@ -1567,8 +1569,7 @@ class DelphiBindingsGenerator(delphi_common.DelphiGeneratorTrait, common.Binding
     def generate(self, device):
         filename = '{0}{1}.pas'.format(device.get_category().camel, device.get_name().camel)
 
-        with open(os.path.join(self.get_bindings_dir(), filename), 'w') as f:
-            f.write(device.get_delphi_source())
+        common.write_output_file(os.path.join(self.get_bindings_dir(), filename), device.get_delphi_source())
 
         if device.is_released():
             self.released_files.append(filename)
@@ -358,8 +358,7 @@ class DelphiDocGenerator(delphi_common.DelphiGeneratorTrait, common.DocGenerator
         return delphi_common.DelphiElement
 
     def generate(self, device):
-        with open(device.get_doc_rst_path(), 'w') as f:
-            f.write(device.get_delphi_doc())
+        common.write_output_file(device.get_doc_rst_path(), device.get_delphi_doc())
 
 def generate(root_dir, language):
     common.generate(root_dir, language, DelphiDocGenerator)
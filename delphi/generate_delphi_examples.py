@@ -773,8 +773,7 @@ class DelphiExamplesGenerator(delphi_common.DelphiGeneratorTrait, common.Example
             else:
                 print('  - ' + filename)
 
-            with open(filepath, 'w') as f:
-                f.write(example.get_delphi_source())
+            common.write_output_file(filepath, example.get_delphi_source())
 
 def generate(root_dir):
     common.generate(root_dir, 'en', DelphiExamplesGenerator)
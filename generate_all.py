@@ -4,90 +4,233 @@
 import sys
 import os
 import socket
+import traceback
+import multiprocessing
+import tempfile
 import common
 
-positive = set()
-negative = set()
-actions = {'bindings', 'examples', 'doc', 'zip'}
+try:
+    import queue # Python 3
+except ImportError:
+    import Queue as queue # Python 2
 
-for arg in sys.argv[1:]:
-    if arg.startswith('-'):
-        negative.add(arg[1:])
-    else:
-        positive.add(arg)
+path = os.getcwd()
 
-if not positive.issubset(actions) or not negative.issubset(actions):
-    print('Error: Invalid argument')
+def get_steps(bindings, actions):
+    # each step is (key, dependencies, binding, kind, lang). the dependencies
+    # only refer to steps of the same binding: zip needs the generated bindings
+    # and examples, doc needs the examples. the en and de doc are independent
+    steps = []
 
-if len(positive) > 0 and len(negative) > 0:
-    print('Error: Cannot mix positive and negative arguments')
+    # bindings
+    if 'bindings' in actions and socket.gethostname() != 'tinkerforge.com':
+        for binding in bindings:
+            if binding in ['tcpip', 'modbus', 'stubs', 'tvpl']:
+                continue
 
-if len(positive) > 0:
-    actions = positive
-else:
-    actions -= negative
+            steps.append(((binding, 'bindings', None), [], binding, 'bindings', None))
 
-# exclude examples if not explicitly specified
-if 'examples' not in positive and 'examples' in actions:
-    actions.remove('examples')
+    # examples
+    if 'examples' in actions and socket.gethostname() != 'tinkerforge.com':
+        for binding in bindings:
+            if binding in ['tcpip', 'modbus', 'json', 'stubs', 'tvpl']:
+                continue
 
-path = os.getcwd()
-bindings = []
+            steps.append(((binding, 'examples', None), [], binding, 'examples', None))
 
-for d in os.listdir(path):
-    if os.path.isdir(d):
-        if d not in ['configs', 'stubs', '.git', '__pycache__', '.vscode']:
-            bindings.append(d)
-            sys.path.append(os.path.join(path, d))
+    # doc
+    if 'doc' in actions:
+        for binding in bindings:
+            if binding in ['json', 'stubs', 'tvpl']:
+                continue
 
-bindings = sorted(bindings)
+            for lang in ['en', 'de']:
+                steps.append(((binding, 'doc', lang), [(binding, 'examples', None)], binding, 'doc', lang))
 
-# bindings
-if 'bindings' in actions and socket.gethostname() != 'tinkerforge.com':
-    for binding in bindings:
-        if binding in ['tcpip', 'modbus', 'stubs', 'tvpl']:
-            continue
+    # zip
+    if 'zip' in actions and socket.gethostname() != 'tinkerforge.com':
+        for binding in bindings:
+            if binding in ['tcpip', 'modbus', 'stubs', 'tvpl']:
+                continue
 
-        module = __import__('generate_{0}_bindings'.format(binding))
-        print('\nGenerating bindings for {0}:'.format(binding))
-        module.generate(os.path.join(path, binding))
+            steps.append(((binding, 'zip', None), [(binding, 'bindings', None), (binding, 'examples', None)], binding, 'zip', None))
+
+    return steps
+
+def run_step(binding, kind, lang):
+    binding_path = os.path.join(path, binding)
 
-# examples
-if 'examples' in actions and socket.gethostname() != 'tinkerforge.com':
-    for binding in bindings:
-        if binding in ['tcpip', 'modbus', 'json', 'stubs', 'tvpl']:
-            continue
+    if binding_path not in sys.path:
+        sys.path.append(binding_path)
 
-        try:
-            module = __import__('generate_{0}_examples'.format(binding))
-        except ImportError:
-            print("\nNo example generator for {0}".format(binding))
-            continue
+    try:
+        module = __import__('generate_{0}_{1}'.format(binding, kind))
+    except ImportError:
+        if kind != 'examples':
+            raise
 
+        print("\nNo example generator for {0}".format(binding))
+        return
+
+    if kind == 'bindings':
+        print('\nGenerating bindings for {0}:'.format(binding))
+        module.generate(binding_path)
+    elif kind == 'examples':
         print('\nGenerating examples for {0}:'.format(binding))
-        module.generate(os.path.join(path, binding))
+        module.generate(binding_path)
+    elif kind == 'doc':
+        print('\nGenerating {0} documentation for {1}:'.format(lang, binding))
+        module.generate(binding_path, lang)
+    elif kind == 'zip':
+        print('\nGenerating ZIP for {0}:'.format(binding))
+        module.generate(binding_path)
+
+def run_step_buffered(key, binding, kind, lang):
+    # buffer the output of the step, otherwise the output of all concurrently
+    # running steps gets interleaved. each step runs in a pool process of its
+    # own, so stdout and stderr are redirected on file descriptor level. this
+    # also buffers the output of the subprocesses started by the step, such
+    # as compilers and zip tools
+    buffer = tempfile.TemporaryFile()
+    stdout_fd = os.dup(1)
+    stderr_fd = os.dup(2)
+    error = None
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.dup2(buffer.fileno(), 1)
+    os.dup2(buffer.fileno(), 2)
+
+    try:
+        run_step(binding, kind, lang)
+    except:
+        error = traceback.format_exc()
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(stdout_fd, 1)
+        os.dup2(stderr_fd, 2)
+        os.close(stdout_fd)
+        os.close(stderr_fd)
+
+    buffer.seek(0)
+    output = buffer.read()
+    buffer.close()
+
+    if sys.hexversion >= 0x03000000:
+        output = output.decode('utf-8', 'replace')
+
+    return key, output, error
+
+def run_steps_parallel(steps, jobs):
+    pool = multiprocessing.Pool(processes=jobs)
+    pending = list(steps)
+    known = set([step[0] for step in steps])
+    done = set()
+    running = 0
+    failed = False
+    results = queue.Queue()
+
+    while len(pending) > 0 or running > 0:
+        if not failed:
+            for step in list(pending):
+                key, dependencies, binding, kind, lang = step
+
+                # dependencies that are not part of this run are treated as done
+                if all([dependency in done or dependency not in known for dependency in dependencies]):
+                    pending.remove(step)
+                    running += 1
+                    pool.apply_async(run_step_buffered, args=(key, binding, kind, lang), callback=results.put)
+        elif running == 0:
+            break
+
+        key, output, error = results.get()
+        running -= 1
+        done.add(key)
+
+        sys.stdout.write(output)
+
+        if error != None:
+            sys.stdout.write(error)
+            failed = True
+
+        sys.stdout.flush()
+
+    pool.close()
+    pool.join()
+
+    return not failed
+
+def main():
+    positive = set()
+    negative = set()
+    actions = {'bindings', 'examples', 'doc', 'zip'}
+    jobs = 1
+    args = sys.argv[1:]
+
+    while len(args) > 0:
+        arg = args.pop(0)
+
+        if arg in ['--jobs', '-j']:
+            if len(args) == 0:
+                print('Error: Missing value for {0}'.format(arg))
+                sys.exit(1)
+
+            arg = '--jobs=' + args.pop(0)
+
+        if arg.startswith('--jobs='):
+            try:
+                jobs = int(arg[len('--jobs='):])
+            except ValueError:
+                jobs = 0
+
+            if jobs < 1:
+                print('Error: Invalid value for --jobs')
+                sys.exit(1)
+        elif arg == '--incremental':
+            # inherited by the generator processes, see common.is_incremental_generation
+            os.environ['GENERATORS_INCREMENTAL'] = '1'
+        elif arg.startswith('-'):
+            negative.add(arg[1:])
+        else:
+            positive.add(arg)
+
+    if not positive.issubset(actions) or not negative.issubset(actions):
+        print('Error: Invalid argument')
+
+    if len(positive) > 0 and len(negative) > 0:
+        print('Error: Cannot mix positive and negative arguments')
+
+    if len(positive) > 0:
+        actions = positive
+    else:
+        actions -= negative
 
-# doc
-if 'doc' in actions:
-    for binding in bindings:
-        if binding in ['json', 'stubs', 'tvpl']:
-            continue
+    # exclude examples if not explicitly specified
+    if 'examples' not in positive and 'examples' in actions:
+        actions.remove('examples')
 
-        module = __import__('generate_{0}_doc'.format(binding))
+    bindings = []
 
-        for lang in ['en', 'de']:
-            print('\nGenerating {0} documentation for {1}:'.format(lang, binding))
-            module.generate(os.path.join(path, binding), lang)
+    for d in os.listdir(path):
+        if os.path.isdir(d):
+            if d not in ['configs', 'stubs', '.git', '__pycache__', '.vscode', '.cache']:
+                bindings.append(d)
+                sys.path.append(os.path.join(path, d))
 
-# zip
-if 'zip' in actions and socket.gethostname() != 'tinkerforge.com':
-    for binding in bindings:
-        if binding in ['tcpip', 'modbus', 'stubs', 'tvpl']:
-            continue
+    bindings = sorted(bindings)
+    steps = get_steps(bindings, actions)
 
-        module = __import__('generate_{0}_zip'.format(binding))
-        print('\nGenerating ZIP for {0}:'.format(binding))
-        module.generate(os.path.join(path, binding))
+    if jobs == 1:
+        for _, _, binding, kind, lang in steps:
+            run_step(binding, kind, lang)
+    elif not run_steps_parallel(steps, jobs):
+        print('')
+        print('>>> Failed <<<')
+        sys.exit(1)
+
+    print('')
+    print('>>> Done <<<')
 
-print('')
-print('>>> Done <<<')
+if __name__ == '__main__':
+    main()
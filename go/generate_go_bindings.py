@@ -580,13 +580,16 @@ class GoBindingsGenerator(go_common.GoGeneratorTrait, common.BindingsGenerator):
 
     def generate(self, device):
         filename = '{0}_{1}'.format(device.get_name().under, device.get_category().under)
-        os.mkdir(os.path.join(self.get_bindings_dir(), filename))
+        device_dir = os.path.join(self.get_bindings_dir(), filename)
+
+        if not os.path.exists(device_dir):
+            os.mkdir(device_dir)
+
         if sys.version_info.major >= 3:
             content = device.get_go_source().replace("‍REPLACE_WITH_ZWJ", "\u200d")
         else:
             content = device.get_go_source().replace("‍REPLACE_WITH_ZWJ", (u"\u200d").encode('utf-8'))
-        with open(os.path.join(self.get_bindings_dir(), filename + '.go'), 'w') as f:
-            f.write(content)
+        common.write_output_file(os.path.join(self.get_bindings_dir(), filename + '.go'), content)
 
         if device.is_released():
             self.released_files.append(filename + '.go')
@@ -366,8 +366,7 @@ class GoDocGenerator(go_common.GoGeneratorTrait, common.DocGenerator):
         return GoDocPacket
 
     def generate(self, device):
-        with open(device.get_doc_rst_path(), 'w') as f:
-            f.write(device.get_go_doc())
+        common.write_output_file(device.get_doc_rst_path(), device.get_go_doc())
 
     def get_doc_null_value_name(self):
         return 'nil'
@@ -664,8 +664,7 @@ class GoExamplesGenerator(go_common.GoGeneratorTrait, common.ExamplesGenerator):
             else:
                 print('  - ' + filename)
 
-            with open(filepath, 'w') as f:
-                f.write(example.get_go_source())
+            common.write_output_file(filepath, example.get_go_source())
             if not example.is_incomplete():
                 p = subprocess.Popen(["go", "fmt", filename], cwd=examples_dir, stdout = subprocess.PIPE, stderr = subprocess.PIPE)
                 out, err = p.communicate() #block unti l gofmt has finished
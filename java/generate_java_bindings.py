@@ -1502,6 +1502,8 @@ class JavaBindingsPacket(java_common.JavaPacket):
         return bbgets, bbret
 
 class JavaBindingsGenerator(java_common.JavaGeneratorTrait, common.BindingsGenerator):
+    incremental_state = ['released_files', 'device_classes']
+
     def get_bindings_name(self):
         return 'java'
 
@@ -1523,9 +1525,14 @@ class JavaBindingsGenerator(java_common.JavaGeneratorTrait, common.BindingsGener
         result = common.BindingsGenerator.prepare(self)
 
         if self.is_matlab():
-            os.makedirs(os.path.join(self.get_bindings_dir(), 'matlab'))
+            flavor_dir = os.path.join(self.get_bindings_dir(), 'matlab')
         elif self.is_octave():
-            os.makedirs(os.path.join(self.get_bindings_dir(), 'octave'))
+            flavor_dir = os.path.join(self.get_bindings_dir(), 'octave')
+        else:
+            flavor_dir = None
+
+        if flavor_dir != None and not os.path.exists(flavor_dir):
+            os.makedirs(flavor_dir)
 
         return result
 
@@ -1539,11 +1546,9 @@ class JavaBindingsGenerator(java_common.JavaGeneratorTrait, common.BindingsGener
         else:
             flavor = ''
 
-        with open(os.path.join(self.get_bindings_dir(), flavor, class_name + '.java'), 'w') as f:
-            f.write(device.get_java_source())
+        common.write_output_file(os.path.join(self.get_bindings_dir(), flavor, class_name + '.java'), device.get_java_source())
 
-        with open(os.path.join(self.get_bindings_dir(), flavor, class_name + 'Provider.java'), 'w') as f:
-            f.write(device.get_java_provider())
+        common.write_output_file(os.path.join(self.get_bindings_dir(), flavor, class_name + 'Provider.java'), device.get_java_provider())
 
         if device.is_released():
             self.device_classes.append(class_name)
@@ -1558,9 +1563,8 @@ class JavaBindingsGenerator(java_common.JavaGeneratorTrait, common.BindingsGener
         else:
             flavor = ''
 
-        with open(os.path.join(self.get_bindings_dir(), flavor, 'com.tinkerforge.DeviceProvider'), 'w') as f:
-            for name in sorted(self.device_classes):
-                f.write('com.tinkerforge.{0}Provider\n'.format(name))
+        common.write_output_file(os.path.join(self.get_bindings_dir(), flavor, 'com.tinkerforge.DeviceProvider'),
+                                 ''.join(['com.tinkerforge.{0}Provider\n'.format(name) for name in sorted(self.device_classes)]))
 
         return common.BindingsGenerator.finish(self)
 
@@ -453,8 +453,7 @@ class JavaDocGenerator(java_common.JavaGeneratorTrait, common.DocGenerator):
         return java_common.JavaElement
 
     def generate(self, device):
-        with open(device.get_doc_rst_path(), 'w') as f:
-            f.write(device.get_java_doc())
+        common.write_output_file(device.get_doc_rst_path(), device.get_java_doc())
 
     def is_matlab(self):
         return False
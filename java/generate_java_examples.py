@@ -665,8 +665,7 @@ class JavaExamplesGenerator(java_common.JavaGeneratorTrait, common.ExamplesGener
             else:
                 print('  - ' + filename)
 
-            with open(filepath, 'w') as f:
-                f.write(example.get_java_source())
+            common.write_output_file(filepath, example.get_java_source())
 
 def generate(root_dir):
     common.generate(root_dir, 'en', JavaExamplesGenerator)
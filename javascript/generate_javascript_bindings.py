@@ -1210,27 +1210,23 @@ class JavaScriptBindingsGenerator(javascript_common.JavascriptGeneratorTrait, co
     def prepare(self):
         ret = common.BindingsGenerator.prepare(self)
 
-        browser_api_filename = os.path.join(self.get_bindings_dir(), 'BrowserAPI.js')
-        npm_main_filename = os.path.join(self.get_bindings_dir(), 'TinkerforgeNPM.js')
-        source_main_filename = os.path.join(self.get_bindings_dir(), 'TinkerforgeSource.js')
-
-        self.browser_api_file = open(browser_api_filename, 'w')
-        self.npm_main_file = open(npm_main_filename, 'w')
-        self.source_main_file = open(source_main_filename, 'w')
+        self.browser_api_lines = []
+        self.npm_main_lines = []
+        self.source_main_lines = []
 
         self.released_files.append('BrowserAPI.js')
         self.released_files.append('TinkerforgeNPM.js')
         self.released_files.append('TinkerforgeSource.js')
 
-        self.browser_api_file.write("""function Tinkerforge() {
+        self.browser_api_lines.append("""function Tinkerforge() {
 	this.IPConnection = require('./IPConnection');
 """)
 
-        self.npm_main_file.write("""function Tinkerforge() {
+        self.npm_main_lines.append("""function Tinkerforge() {
 	this.IPConnection = require('./lib/IPConnection');
 """)
 
-        self.source_main_file.write("""function Tinkerforge() {
+        self.source_main_lines.append("""function Tinkerforge() {
 	this.IPConnection = require('./Tinkerforge/IPConnection');
 """)
 
@@ -1241,21 +1237,21 @@ class JavaScriptBindingsGenerator(javascript_common.JavascriptGeneratorTrait, co
             api = """	this.{0}{1} = require('./{0}{1}');
 """
             api_format = api.format(device.get_category().camel, device.get_name().camel)
-            self.browser_api_file.write(api_format)
+            self.browser_api_lines.append(api_format)
 
     def add_npm_main_function(self, device):
         if device.is_released():
             npm_main = """	this.{0}{1} = require('./lib/{0}{1}');
 """
             npm_main_format = npm_main.format(device.get_category().camel, device.get_name().camel)
-            self.npm_main_file.write(npm_main_format)
+            self.npm_main_lines.append(npm_main_format)
 
     def add_source_main_function(self, device):
         if device.is_released():
             source_main = """	this.{0}{1} = require('./Tinkerforge/{0}{1}');
 """
             source_main_format = source_main.format(device.get_category().camel, device.get_name().camel)
-            self.source_main_file.write(source_main_format)
+            self.source_main_lines.append(source_main_format)
 
     def generate(self, device):
         self.add_browser_api_function(device)
@@ -1264,27 +1260,29 @@ class JavaScriptBindingsGenerator(javascript_common.JavascriptGeneratorTrait, co
 
         filename = '{0}{1}.js'.format(device.get_category().camel, device.get_name().camel)
 
-        with open(os.path.join(self.get_bindings_dir(), filename), 'w') as f:
-            f.write(device.get_javascript_source())
+        common.write_output_file(os.path.join(self.get_bindings_dir(), filename), device.get_javascript_source())
 
         if device.is_released():
             self.released_files.append(filename)
 
     def finish(self):
-        self.browser_api_file.write("""}
+        self.browser_api_lines.append("""}
 
 global.Tinkerforge = new Tinkerforge();""")
-        self.browser_api_file.close()
 
-        self.npm_main_file.write("""}
+        common.write_output_file(os.path.join(self.get_bindings_dir(), 'BrowserAPI.js'), ''.join(self.browser_api_lines))
+
+        self.npm_main_lines.append("""}
 
 module.exports = new Tinkerforge();""")
-        self.npm_main_file.close()
 
-        self.source_main_file.write("""}
+        common.write_output_file(os.path.join(self.get_bindings_dir(), 'TinkerforgeNPM.js'), ''.join(self.npm_main_lines))
+
+        self.source_main_lines.append("""}
 
 module.exports = new Tinkerforge();""")
-        self.source_main_file.close()
+
+        common.write_output_file(os.path.join(self.get_bindings_dir(), 'TinkerforgeSource.js'), ''.join(self.source_main_lines))
 
         return common.BindingsGenerator.finish(self)
 
@@ -789,8 +789,7 @@ class JavaScriptExamplesGenerator(javascript_common.JavascriptGeneratorTrait, co
             else:
                 print('  - ' + filename)
 
-            with open(filepath, 'w') as f:
-                f.write(example.get_nodejs_source())
+            common.write_output_file(filepath, example.get_nodejs_source())
 
         # html
         for example in examples:
@@ -810,8 +809,7 @@ class JavaScriptExamplesGenerator(javascript_common.JavascriptGeneratorTrait, co
             else:
                 print('  - ' + filename)
 
-            with open(filepath, 'w') as f:
-                f.write(example.get_html_source())
+            common.write_output_file(filepath, example.get_html_source())
 
 def generate(root_dir):
     common.generate(root_dir, 'en', JavaScriptExamplesGenerator)
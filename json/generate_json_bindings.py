@@ -106,6 +106,8 @@ class JSONGeneratorTrait:
         return element.get_name().space
 
 class JSONBindingsGenerator(JSONGeneratorTrait, common.BindingsGenerator):
+    incremental_state = ['released_files']
+
     def get_bindings_name(self):
         return 'json'
 
@@ -124,8 +126,7 @@ class JSONBindingsGenerator(JSONGeneratorTrait, common.BindingsGenerator):
     def generate(self, device):
         filename = '{0}_{1}.json'.format(device.get_category().under, device.get_name().under)
 
-        with open(os.path.join(self.get_bindings_dir(), filename), 'w') as f:
-            f.write(device.get_json_source())
+        common.write_output_file(os.path.join(self.get_bindings_dir(), filename), device.get_json_source())
 
         if device.is_released():
             self.released_files.append(filename)
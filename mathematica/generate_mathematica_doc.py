@@ -519,8 +519,7 @@ class MathematicaDocGenerator(common.DocGenerator):
         return MathematicaDocElement
 
     def generate(self, device):
-        with open(device.get_doc_rst_path(), 'w') as f:
-            f.write(device.get_mathematica_doc())
+        common.write_output_file(device.get_doc_rst_path(), device.get_mathematica_doc())
 
 def generate(root_dir, language):
     common.generate(root_dir, language, MathematicaDocGenerator)
@@ -701,8 +701,7 @@ class MathematicaExamplesGenerator(common.ExamplesGenerator):
             else:
                 print('  - ' + filename)
 
-            with open(filepath, 'w') as f:
-                f.write(example.get_mathematica_source())
+            common.write_output_file(filepath, example.get_mathematica_source())
 
             txt2nb(filepath)
 
@@ -527,8 +527,7 @@ class MATLABDocGenerator(matlab_common.MATLABGeneratorTrait, common.DocGenerator
         return example[1].split('_')[0], example[2], example[0] # flavor, lines, filename
 
     def generate(self, device):
-        with open(device.get_doc_rst_path(), 'w') as f:
-            f.write(device.get_matlab_doc())
+        common.write_output_file(device.get_doc_rst_path(), device.get_matlab_doc())
 
 def generate(root_dir, language):
     common.generate(root_dir, language, MATLABDocGenerator)
@@ -844,8 +844,7 @@ class MATLABExamplesGenerator(matlab_common.MATLABGeneratorTrait, common.Example
             else:
                 print('  - ' + filename)
 
-            with open(os.path.join(examples_dir, filename), 'w') as f:
-                f.write(example.get_matlab_source())
+            common.write_output_file(os.path.join(examples_dir, filename), example.get_matlab_source())
 
         # octave
         for example in examples:
@@ -865,8 +864,7 @@ class MATLABExamplesGenerator(matlab_common.MATLABGeneratorTrait, common.Example
             else:
                 print('  - ' + filename)
 
-            with open(filepath, 'w') as f:
-                f.write(example.get_octave_source())
+            common.write_output_file(filepath, example.get_octave_source())
 
 def generate(root_dir):
     common.generate(root_dir, 'en', MATLABExamplesGenerator)
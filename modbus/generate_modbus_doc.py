@@ -314,8 +314,7 @@ class ModbusDocGenerator(common.DocGenerator):
         return element.get_name().headless
 
     def generate(self, device):
-        with open(device.get_doc_rst_path(), 'w') as f:
-            f.write(device.get_modbus_doc())
+        common.write_output_file(device.get_doc_rst_path(), device.get_modbus_doc())
 
 def generate(root_dir, language):
     common.generate(root_dir, language, ModbusDocGenerator)
@@ -249,8 +249,7 @@ class MQTTBindingsGenerator(mqtt_common.MQTTGeneratorTrait, common.BindingsGener
     def generate(self, device):
         filename = '{0}.part'.format(device.get_mqtt_device_name())
 
-        with open(os.path.join(self.get_bindings_dir(), filename), 'w') as f:
-            f.write(device.get_mqtt_source())
+        common.write_output_file(os.path.join(self.get_bindings_dir(), filename), device.get_mqtt_source())
 
         if device.is_released():
             self.devices.append("'{mqtt_dev_name}': {py_dev_name}".format(mqtt_dev_name=device.get_mqtt_device_name(), py_dev_name=device.get_python_class_name()))
@@ -264,7 +263,7 @@ class MQTTBindingsGenerator(mqtt_common.MQTTGeneratorTrait, common.BindingsGener
         root_dir = self.get_root_dir()
         bindings_dir = self.get_bindings_dir()
         version = self.get_changelog_version()
-        mqtt = open(os.path.join(bindings_dir, 'tinkerforge_mqtt'), 'w')
+        mqtt = []
 
         with open(os.path.join(root_dir, 'tinkerforge.header'), 'r') as f:
             header = f.read().replace('<<VERSION>>', '.'.join(version))
@@ -275,24 +274,25 @@ class MQTTBindingsGenerator(mqtt_common.MQTTGeneratorTrait, common.BindingsGener
         with open(os.path.join(root_dir, 'tinkerforge.footer'), 'r') as f:
             footer = f.read().replace('<<VERSION>>', '.'.join(version))
 
-        mqtt.write(header)
+        mqtt.append(header)
 
         with open(os.path.join(root_dir, '..', 'python', 'ip_connection.py'), 'r') as f:
             ipcon = f.read()
 
-        mqtt.write('\n\n\n' + ipcon + '\n\n\n')
-        mqtt.write(middle + '\n\n\n')
+        mqtt.append('\n\n\n' + ipcon + '\n\n\n')
+        mqtt.append(middle + '\n\n\n')
 
         for filename in sorted(self.part_files):
             if filename.endswith('.part'):
                 with open(os.path.join(bindings_dir, filename), 'r') as f:
-                    mqtt.write(f.read())
+                    mqtt.append(f.read())
 
-        mqtt.write('\n\n\ndevices = {\n\t' + ',\n\t'.join(self.devices) + '\n}\n\n\n')
-        mqtt.write('\n\n\nmqtt_names = {\n\t' + ',\n\t'.join(self.device_mqtt_names) + '\n}\n\n\n')
-        mqtt.write('\n\n\ndisplay_names = {\n\t' + ',\n\t'.join(self.device_display_names) + '\n}\n\n\n')
-        mqtt.write(footer)
-        mqtt.close()
+        mqtt.append('\n\n\ndevices = {\n\t' + ',\n\t'.join(self.devices) + '\n}\n\n\n')
+        mqtt.append('\n\n\nmqtt_names = {\n\t' + ',\n\t'.join(self.device_mqtt_names) + '\n}\n\n\n')
+        mqtt.append('\n\n\ndisplay_names = {\n\t' + ',\n\t'.join(self.device_display_names) + '\n}\n\n\n')
+        mqtt.append(footer)
+
+        common.write_output_file(os.path.join(bindings_dir, 'tinkerforge_mqtt'), ''.join(mqtt))
 
 def generate(root_dir):
     common.generate(root_dir, 'en', MQTTBindingsGenerator)
@@ -93,6 +93,7 @@ class MQTTDocDevice(mqtt_common.MQTTDevice):
  A callback can be registered for this event by publishing to the ``.../register/{device}/<UID>/{callback_name_under}[/<SUFFIX>]`` topic with the payload "true".
  An added callback can be removed by publishing to the same topic with the payload "false".
  To support multiple (de)registrations, e.g. for message filtering, an optional suffix can be used.
+ Instead of "true" a JSON object with ``"register": true`` and publish options can be used, see the :ref:`publish options <{ref_name}_mqtt_callbacks>`.
 
  If the callback is triggered, a message with it's payload is published under the corresponding ``.../callback/{device}/<UID>/{callback_name_under}[/<SUFFIX>]`` topic for each registered suffix.
 
@@ -104,6 +105,7 @@ class MQTTDocDevice(mqtt_common.MQTTDevice):
  Ein Callback für dieses Event kann durch Senden des Payloads "true" an das ``.../register/{device}/<UID>/{callback_name_under}[/<SUFFIX>]``-Topic hinzugefügt werden.
  Ein hinzugefügtes Callback kann durch Senden des Payloads "false" an das selbe Topic wieder entfernt werden.
  Um mehrere (De-)Registrierungen zu unterstützen, z.B. um Nachrichten filtern zu können, kann ein optionaler Suffix verwendet werden.
+ Anstelle von "true" kann ein JSON-Objekt mit ``"register": true`` und Veröffentlichungsoptionen verwendet werden, siehe :ref:`Veröffentlichungsoptionen <{ref_name}_mqtt_callbacks>`.
 
  Wenn das Callback ausgelöst wird, wird dessen Payload für jeden Suffix auf dem entsprechenden ``.../callback/{device}/<UID>/{callback_name_under}[/<SUFFIX>]``-Topic veröffentlicht.
 
@@ -121,6 +123,7 @@ class MQTTDocDevice(mqtt_common.MQTTDevice):
             else:
                 skip = 0
             cbs += common.select_lang(cb).format(device=device,
+                                                    ref_name=self.get_doc_rst_ref_name(),
                                                     callback_name_under=packet.get_mqtt_name(skip=skip),
                                                     result_type=result_type,
                                                     desc=desc)
@@ -143,6 +146,46 @@ This suffix can be used to deregister the callback later.
  compared to using getters. It will use less USB bandwidth and the latency
  will be a lot better, since there is no round trip time.
 
+Instead of the payload "true" a JSON object with ``"register": true`` and the
+following publish options can be published to the ``.../register/...`` topic,
+for example ``{{"register": true, "min_interval": 100, "latest_only": true}}``.
+The publish options limit the rate of the messages that are published to the
+``.../callback/...`` topic for this registration:
+
+* ``min_interval`` (number): At most one message is published per interval
+  of this many milliseconds. Callbacks triggered within the interval are
+  dropped. Default is 0.
+* ``latest_only`` (bool): If true, the latest callback triggered within the
+  interval is published when the interval is over instead of being dropped.
+  Default is false.
+* ``batch_size`` (int): If greater than 1, the callback payloads are published
+  as JSON lists of at least this many payloads. All callbacks triggered while
+  a full batch waits for the interval are added to it. Default is 1.
+* ``batch_timeout`` (number): A partial batch is published at most this many
+  milliseconds after its first callback, even if it is not full. Without this
+  option a partial batch waits for more callbacks. Default is no timeout.
+* ``changes_only`` (bool): If true, a message is not published if its payload
+  is equal to the previously published one. Default is false.
+* ``retain`` (bool): If true, the messages are published as retained
+  messages, so the broker keeps the latest one for new subscribers. Together
+  with ``changes_only`` the current state is kept on the broker without
+  repeating unchanged values. Default is false.
+
+Callbacks that are not published yet when the registration is removed or
+replaced are discarded. If an option is invalid the callback is not
+registered and an error is published to the ``.../callback/...`` topic, for
+example ``{{"_ERROR": "Callback registration of <CALLBACK> for device <UID> of type <DEVICE>: batch_timeout can only be used with a batch_size > 1"}}``.
+The following errors are possible:
+
+* ``min_interval has to be a non-negative number of milliseconds``
+* ``latest_only has to be a bool``
+* ``batch_size has to be a positive integer``
+* ``latest_only can not be combined with a batch_size > 1``
+* ``batch_timeout has to be a non-negative number of milliseconds``
+* ``batch_timeout can only be used with a batch_size > 1``
+* ``changes_only has to be a bool``
+* ``retain has to be a bool``
+
 {3}
 """,
             'de': """
@@ -162,6 +205,50 @@ Mit diesem Suffix kann das Callback später deregistriert werden.
  Es wird weniger USB-Bandbreite benutzt und die Latenz ist
  erheblich geringer, da es keine Paketumlaufzeit gibt.
 
+Anstelle des Payloads "true" kann ein JSON-Objekt mit ``"register": true`` und
+den folgenden Veröffentlichungsoptionen an das ``.../register/...``-Topic
+gesendet werden, zum Beispiel ``{{"register": true, "min_interval": 100, "latest_only": true}}``.
+Die Veröffentlichungsoptionen begrenzen die Rate der Nachrichten, die für
+diese Registrierung auf dem ``.../callback/...``-Topic veröffentlicht werden:
+
+* ``min_interval`` (number): Pro Intervall von dieser Anzahl Millisekunden
+  wird höchstens eine Nachricht veröffentlicht. Innerhalb des Intervalls
+  ausgelöste Callbacks werden verworfen. Standardwert ist 0.
+* ``latest_only`` (bool): Falls true, wird das letzte innerhalb des Intervalls
+  ausgelöste Callback am Ende des Intervalls veröffentlicht, anstatt verworfen
+  zu werden. Standardwert ist false.
+* ``batch_size`` (int): Falls größer als 1, werden die Payloads der Callbacks
+  als JSON-Listen von mindestens dieser Anzahl Payloads veröffentlicht. Alle
+  Callbacks, die ausgelöst werden während ein voller Batch auf das Intervall
+  wartet, werden hinzugefügt. Standardwert ist 1.
+* ``batch_timeout`` (number): Ein unvollständiger Batch wird spätestens diese
+  Anzahl Millisekunden nach seinem ersten Callback veröffentlicht, auch wenn
+  er nicht voll ist. Ohne diese Option wartet ein unvollständiger Batch auf
+  weitere Callbacks. Standardmäßig gibt es kein Timeout.
+* ``changes_only`` (bool): Falls true, wird eine Nachricht nicht
+  veröffentlicht, wenn ihr Payload gleich dem zuvor veröffentlichten ist.
+  Standardwert ist false.
+* ``retain`` (bool): Falls true, werden die Nachrichten als Retained Messages
+  veröffentlicht, so dass der Broker die letzte für neue Abonnenten behält.
+  Zusammen mit ``changes_only`` wird der aktuelle Zustand auf dem Broker
+  gehalten, ohne unveränderte Werte zu wiederholen. Standardwert ist false.
+
+Callbacks, die noch nicht veröffentlicht wurden wenn die Registrierung
+entfernt oder ersetzt wird, werden verworfen. Falls eine Option ungültig ist,
+wird das Callback nicht registriert und ein Fehler auf dem
+``.../callback/...``-Topic veröffentlicht, zum Beispiel
+``{{"_ERROR": "Callback registration of <CALLBACK> for device <UID> of type <DEVICE>: batch_timeout can only be used with a batch_size > 1"}}``.
+Die folgenden Fehler sind möglich:
+
+* ``min_interval has to be a non-negative number of milliseconds``
+* ``latest_only has to be a bool``
+* ``batch_size has to be a positive integer``
+* ``latest_only can not be combined with a batch_size > 1``
+* ``batch_timeout has to be a non-negative number of milliseconds``
+* ``batch_timeout can only be used with a batch_size > 1``
+* ``changes_only has to be a bool``
+* ``retain has to be a bool``
+
 {3}
 """
         }
@@ -338,9 +425,310 @@ class MQTTDocGenerator(mqtt_common.MQTTGeneratorTrait, common.DocGenerator):
     def get_element_class(self):
         return mqtt_common.MQTTElement
 
+    def get_mqtt_bridge_doc(self):
+        options = {
+            'en': """
+.. _ipcon_mqtt_bridge_options:
+
+Bridge Options
+--------------
+
+The MQTT bindings are a bridge between an MQTT broker and a Brick Daemon,
+WIFI or Ethernet Extension. The bridge is configured with the following
+command line options:
+
+``--ipcon-host <HOST>``
+ Hostname or IP address of the Brick Daemon, WIFI or Ethernet Extension (default: localhost).
+
+``--ipcon-port <PORT>``
+ Port number of the Brick Daemon, WIFI or Ethernet Extension (default: 4223).
+
+``--ipcon-auth-secret <SECRET>``
+ Authentication secret of the Brick Daemon, WIFI or Ethernet Extension.
+
+``--ipcon-timeout <TIMEOUT>``
+ Timeout in milliseconds for the communication with the Brick Daemon, WIFI or Ethernet Extension (default: 2500).
+
+``--broker-host <HOST>``
+ Hostname or IP address of the MQTT broker (default: localhost).
+
+``--broker-port <PORT>``
+ Port number of the MQTT broker (default: 1883).
+
+``--broker-username <USERNAME>``, ``--broker-password <PASSWORD>``
+ Username and password for the MQTT broker connection.
+
+``--broker-certificate <FILE>``
+ Certificate Authority certificate file used for SSL/TLS connections.
+
+``--broker-tls-insecure``
+ Disables the verification of the server hostname in the server certificate for the MQTT broker connection.
+
+``--global-topic-prefix <PREFIX>``
+ Global MQTT topic prefix for this bridge instance (default: tinkerforge/).
+
+``--request-workers <COUNT>``
+ Number of threads that handle the messages published to the ``.../request/...``
+ and ``.../register/...`` topics (default: 0).
+
+ With 0 all messages are handled one after another on the thread of the MQTT
+ client, in the order they were received. A slow or missing device then
+ delays the messages for all other devices.
+
+ With 1 or more worker threads the messages for the same device UID are
+ always handled by the same worker thread, one after another and in the
+ order they were received. Their responses are published in the same order.
+ Messages for different devices are handled concurrently, their responses
+ can be published in a different order than the messages were received.
+ The messages for the ``ip_connection`` and ``bindings`` topics have no UID,
+ they are handled in order among each other.
+
+ The entries of a :ref:`bulk request <ipcon_mqtt_bulk_requests>` for
+ different devices are only executed concurrently with 1 or more worker
+ threads.
+
+``--cache-ttl [<DEVICE>/]<FUNCTION>=<TTL>``
+ Caches the responses of a getter for TTL milliseconds, for example
+ ``--cache-ttl temperature_v2_bricklet/get_temperature=1000``. Without
+ ``<DEVICE>/`` the TTL applies to the getter of all device types that have
+ it. The option can be given multiple times.
+
+ A request for a cached getter with the same UID and payload is answered
+ from the cache while the TTL is not expired, without a request to the
+ device. Any other request for the same UID clears the cached responses of
+ this UID, so a setter is never followed by an outdated cached value. Error
+ responses are not cached.
+
+ Only getters can be cached: functions whose name starts with ``get_``,
+ ``is_`` or ``are_``, that have results and that are not stream functions.
+ The bindings refuse to start if another function, an unknown function or an
+ unknown device type is given.
+
+``--debug``
+ Enables the debug output.
+
+``--no-symbolic-response``
+ Disables the translation of constants into symbols in the responses.
+
+``--show-payload``
+ Shows the received payload if it cannot be parsed as JSON.
+
+``--init-file <FILE>``
+ File with initial messages to publish after startup.
+""",
+            'de': """
+.. _ipcon_mqtt_bridge_options:
+
+Bridge-Optionen
+---------------
+
+Die MQTT-Bindings sind eine Bridge zwischen einem MQTT-Broker und einem Brick
+Daemon, einer WIFI oder Ethernet Extension. Die Bridge wird mit den folgenden
+Kommandozeilenoptionen konfiguriert:
+
+``--ipcon-host <HOST>``
+ Hostname oder IP-Adresse des Brick Daemons, der WIFI oder Ethernet Extension (Standard: localhost).
+
+``--ipcon-port <PORT>``
+ Portnummer des Brick Daemons, der WIFI oder Ethernet Extension (Standard: 4223).
+
+``--ipcon-auth-secret <SECRET>``
+ Authentifizierungsgeheimnis des Brick Daemons, der WIFI oder Ethernet Extension.
+
+``--ipcon-timeout <TIMEOUT>``
+ Timeout in Millisekunden für die Kommunikation mit dem Brick Daemon, der WIFI oder Ethernet Extension (Standard: 2500).
+
+``--broker-host <HOST>``
+ Hostname oder IP-Adresse des MQTT-Brokers (Standard: localhost).
+
+``--broker-port <PORT>``
+ Portnummer des MQTT-Brokers (Standard: 1883).
+
+``--broker-username <USERNAME>``, ``--broker-password <PASSWORD>``
+ Benutzername und Passwort für die Verbindung zum MQTT-Broker.
+
+``--broker-certificate <FILE>``
+ Zertifikatsdatei der Zertifizierungsstelle für SSL/TLS-Verbindungen.
+
+``--broker-tls-insecure``
+ Deaktiviert die Überprüfung des Server-Hostnamens im Server-Zertifikat für die Verbindung zum MQTT-Broker.
+
+``--global-topic-prefix <PREFIX>``
+ Globales MQTT-Topic-Präfix für diese Bridge-Instanz (Standard: tinkerforge/).
+
+``--request-workers <COUNT>``
+ Anzahl der Threads, die die an die ``.../request/...``- und
+ ``.../register/...``-Topics gesendeten Nachrichten bearbeiten (Standard: 0).
+
+ Bei 0 werden alle Nachrichten nacheinander auf dem Thread des MQTT-Clients
+ bearbeitet, in der Reihenfolge in der sie empfangen wurden. Ein langsames
+ oder fehlendes Gerät verzögert dann die Nachrichten für alle anderen Geräte.
+
+ Bei einem oder mehr Worker-Threads werden die Nachrichten für die selbe
+ Geräte-UID immer vom selben Worker-Thread bearbeitet, nacheinander und in der
+ Reihenfolge in der sie empfangen wurden. Ihre Antworten werden in der selben
+ Reihenfolge veröffentlicht. Nachrichten für verschiedene Geräte werden
+ gleichzeitig bearbeitet, ihre Antworten können in einer anderen Reihenfolge
+ veröffentlicht werden als die Nachrichten empfangen wurden. Die Nachrichten
+ für die ``ip_connection``- und ``bindings``-Topics haben keine UID, sie
+ werden untereinander in Reihenfolge bearbeitet.
+
+ Die Einträge einer :ref:`Bulk-Anfrage <ipcon_mqtt_bulk_requests>` für
+ verschiedene Geräte werden nur bei einem oder mehr Worker-Threads
+ gleichzeitig ausgeführt.
+
+``--cache-ttl [<DEVICE>/]<FUNCTION>=<TTL>``
+ Speichert die Antworten eines Getters für TTL Millisekunden zwischen, zum
+ Beispiel ``--cache-ttl temperature_v2_bricklet/get_temperature=1000``. Ohne
+ ``<DEVICE>/`` gilt die TTL für den Getter aller Gerätetypen, die ihn haben.
+ Die Option kann mehrfach angegeben werden.
+
+ Eine Anfrage an einen zwischengespeicherten Getter mit der selben UID und dem
+ selben Payload wird aus dem Zwischenspeicher beantwortet, solange die TTL
+ nicht abgelaufen ist, ohne eine Anfrage an das Gerät. Jede andere Anfrage für
+ die selbe UID löscht die zwischengespeicherten Antworten dieser UID, so dass
+ auf einen Setter nie ein veralteter zwischengespeicherter Wert folgt.
+ Fehlerantworten werden nicht zwischengespeichert.
+
+ Nur Getter können zwischengespeichert werden: Funktionen deren Name mit
+ ``get_``, ``is_`` oder ``are_`` beginnt, die Rückgabewerte haben und die
+ keine Stream-Funktionen sind. Die Bindings starten nicht, falls eine andere
+ Funktion, eine unbekannte Funktion oder ein unbekannter Gerätetyp angegeben
+ wird.
+
+``--debug``
+ Aktiviert die Debug-Ausgabe.
+
+``--no-symbolic-response``
+ Deaktiviert die Übersetzung von Konstanten in Symbole in den Antworten.
+
+``--show-payload``
+ Zeigt den empfangenen Payload an, falls er nicht als JSON geparst werden kann.
+
+``--init-file <FILE>``
+ Datei mit initialen Nachrichten, die nach dem Start veröffentlicht werden.
+"""
+        }
+
+        bulk = {
+            'en': """
+.. _ipcon_mqtt_bulk_requests:
+
+Bulk Requests
+-------------
+
+Several requests can be combined into a single message by publishing a JSON
+list of request entries to the ``.../request/bulk`` topic. Each entry is a JSON
+object of the following form:
+
+.. code-block:: json
+
+ {"device": "<DEVICE>", "uid": "<UID>", "function": "<FUNCTION>", "args": {...}}
+
+``device``, ``uid`` and ``function`` are the parts of the topic of the single
+request, for example ``temperature_v2_bricklet``, ``XYZ`` and
+``get_temperature`` for ``.../request/temperature_v2_bricklet/XYZ/get_temperature``.
+``args`` is the payload of the single request and can be left out for
+functions without parameters. Entries for the ``ip_connection`` device have no
+``uid``.
+
+The bindings publish a single JSON list to the ``.../response/bulk`` topic. It
+contains the response of each entry in the order of the entries. The response
+of an entry is the payload that the single request would have published to
+its ``.../response/...`` topic: the result object, an object with an
+``"_ERROR"`` attribute or ``null`` for functions without response. For
+example the bulk request
+
+.. code-block:: json
+
+ [{"device": "temperature_v2_bricklet", "uid": "XYZ", "function": "get_temperature"},
+  {"device": "humidity_v2_bricklet", "uid": "ABC", "function": "set_status_led_config", "args": {"config": "off"}}]
+
+is answered with
+
+.. code-block:: json
+
+ [{"temperature": 2350}, null]
+
+The entries for the same UID are executed one after another in the order of
+the list. The entries for different UIDs are executed concurrently if the
+bindings are started with :ref:`--request-workers <ipcon_mqtt_bridge_options>`
+1 or more, otherwise all entries are executed one after another.
+
+If the payload is not a JSON list, a single object with an ``"_ERROR"``
+attribute is published to the ``.../response/bulk`` topic instead of the
+list. Entries that are not an object with ``device`` and ``function``, that
+have no ``uid`` (except for ``ip_connection``), that have a list or object as
+``uid`` or that have ``args`` that are not an object get an ``"_ERROR"``
+response in the list, the other entries are executed anyway.
+""",
+            'de': """
+.. _ipcon_mqtt_bulk_requests:
+
+Bulk-Anfragen
+-------------
+
+Mehrere Anfragen können in einer einzelnen Nachricht kombiniert werden, indem
+eine JSON-Liste von Anfrage-Einträgen an das ``.../request/bulk``-Topic
+gesendet wird. Jeder Eintrag ist ein JSON-Objekt der folgenden Form:
+
+.. code-block:: json
+
+ {"device": "<DEVICE>", "uid": "<UID>", "function": "<FUNCTION>", "args": {...}}
+
+``device``, ``uid`` und ``function`` sind die Teile des Topics der einzelnen
+Anfrage, zum Beispiel ``temperature_v2_bricklet``, ``XYZ`` und
+``get_temperature`` für ``.../request/temperature_v2_bricklet/XYZ/get_temperature``.
+``args`` ist der Payload der einzelnen Anfrage und kann bei Funktionen ohne
+Parameter weggelassen werden. Einträge für das ``ip_connection``-Gerät haben
+keine ``uid``.
+
+Die Bindings veröffentlichen eine einzelne JSON-Liste auf dem
+``.../response/bulk``-Topic. Sie enthält die Antwort jedes Eintrags in der
+Reihenfolge der Einträge. Die Antwort eines Eintrags ist der Payload, den die
+einzelne Anfrage auf ihrem ``.../response/...``-Topic veröffentlicht hätte:
+das Ergebnis-Objekt, ein Objekt mit einem ``"_ERROR"``-Attribut oder ``null``
+für Funktionen ohne Antwort. Zum Beispiel wird die Bulk-Anfrage
+
+.. code-block:: json
+
+ [{"device": "temperature_v2_bricklet", "uid": "XYZ", "function": "get_temperature"},
+  {"device": "humidity_v2_bricklet", "uid": "ABC", "function": "set_status_led_config", "args": {"config": "off"}}]
+
+beantwortet mit
+
+.. code-block:: json
+
+ [{"temperature": 2350}, null]
+
+Die Einträge für die selbe UID werden nacheinander in der Reihenfolge der
+Liste ausgeführt. Die Einträge für verschiedene UIDs werden gleichzeitig
+ausgeführt, falls die Bindings mit :ref:`--request-workers <ipcon_mqtt_bridge_options>`
+1 oder mehr gestartet wurden, ansonsten werden alle Einträge nacheinander
+ausgeführt.
+
+Falls der Payload keine JSON-Liste ist, wird anstelle der Liste ein einzelnes
+Objekt mit einem ``"_ERROR"``-Attribut auf dem ``.../response/bulk``-Topic
+veröffentlicht. Einträge, die kein Objekt mit ``device`` und ``function`` sind,
+die keine ``uid`` haben (außer für ``ip_connection``), die eine Liste oder ein
+Objekt als ``uid`` haben oder deren ``args`` kein Objekt sind, erhalten eine
+``"_ERROR"``-Antwort in der Liste, die anderen Einträge werden trotzdem
+ausgeführt.
+"""
+        }
+
+        return common.select_lang(options) + common.select_lang(bulk)
+
     def generate(self, device):
-        with open(device.get_doc_rst_path(), 'w') as f:
-            f.write(device.get_mqtt_doc())
+        common.write_output_file(device.get_doc_rst_path(), device.get_mqtt_doc())
+
+    def finish(self):
+        common.DocGenerator.finish(self)
+
+        print(' * bridge')
+
+        common.write_output_file(os.path.join(self.get_doc_dir(), self.get_language(), 'IPConnection_MQTT_Bridge.rst'),
+                                 self.get_mqtt_bridge_doc())
 
 def generate(root_dir, language):
     common.generate(root_dir, language, MQTTDocGenerator)
@@ -492,8 +492,7 @@ class MQTTExamplesGenerator(mqtt_common.MQTTGeneratorTrait, common.ExamplesGener
             else:
                 print('  - ' + filename)
 
-            with open(filepath, 'w') as f:
-                f.write(example.get_mqtt_source())
+            common.write_output_file(filepath, example.get_mqtt_source())
 
 def generate(root_dir):
     common.generate(root_dir, 'en', MQTTExamplesGenerator)
@@ -24,8 +24,8 @@ Boston, MA 02111-1307, USA.
 """
 
 from collections import namedtuple
+import copy
 import os
-import shutil
 import sys
 
 sys.path.append(os.path.split(os.getcwd())[0])
@@ -262,7 +262,8 @@ class OpenHABBindingsDevice(JavaBindingsDevice):
         JavaBindingsDevice.__init__(self, *args, **kwargs)
 
         if 'openhab' in self.raw_data:
-            oh = self.apply_defaults(self.raw_data['openhab'])
+            # apply_defaults modifies the given dict, but the raw data is shared between all generators
+            oh = self.apply_defaults(copy.deepcopy(self.raw_data['openhab']))
         else:
             oh = self.apply_defaults({})
 
@@ -951,6 +952,8 @@ public class {name_camel} {{
                                channels='\n\n    '.join(channels))
 
 class OpenHABBindingsGenerator(JavaBindingsGenerator):
+    incremental_state = None # released_devices holds Device objects
+
     def __init__(self, *args, **kwargs):
         JavaBindingsGenerator.__init__(self, *args, **kwargs)
         self.released_devices = []
@@ -978,13 +981,11 @@ class OpenHABBindingsGenerator(JavaBindingsGenerator):
             return
         class_name = device.get_java_class_name()
 
-        with open(os.path.join(self.get_bindings_dir(), class_name + '.java'), 'w') as f:
-            f.write(device.get_java_source())
+        common.write_output_file(os.path.join(self.get_bindings_dir(), class_name + '.java'), device.get_java_source())
 
         config_classes = device.get_openhab_config_classes()
         for config_class_name, config_class in config_classes:
-            with open(os.path.join(self.get_bindings_dir(), config_class_name + '.java'), 'w') as f:
-                f.write(config_class)
+            common.write_output_file(os.path.join(self.get_bindings_dir(), config_class_name + '.java'), config_class)
 
         if device.is_released():
             self.released_devices.append(device)
@@ -1021,12 +1022,10 @@ class OpenHABBindingsGenerator(JavaBindingsGenerator):
 
         docs = [(d.get_name().under + '_' + d.get_category().under, d.get_openhab_docs()) for d in self.released_devices if d.get_openhab_docs() is not None]
         doc_folder = os.path.join(self.get_bindings_dir(), '..', 'doc')
-        shutil.rmtree(doc_folder, ignore_errors=True)
-        os.makedirs(doc_folder)
+        self.prepare_output_dir(doc_folder)
 
         for file, content in docs:
-            with open(os.path.join(doc_folder, file + '.txt'), 'w') as f:
-                f.write(content)
+            common.write_output_file(os.path.join(doc_folder, file + '.txt'), content)
 
 def generate(root_dir):
     common.generate(root_dir, 'en', OpenHABBindingsGenerator)
@@ -805,6 +805,8 @@ class PerlBindingsPacket(common.Packet):
         return ' '.join(forms)
 
 class PerlBindingsGenerator(perl_common.PerlGeneratorTrait, common.BindingsGenerator):
+    incremental_state = ['released_files']
+
     def get_bindings_name(self):
         return 'perl'
 
@@ -823,8 +825,7 @@ class PerlBindingsGenerator(perl_common.PerlGeneratorTrait, common.BindingsGener
     def generate(self, device):
         filename = '{0}{1}.pm'.format(device.get_category().camel, device.get_name().camel)
 
-        with open(os.path.join(self.get_bindings_dir(), filename), 'w') as f:
-            f.write(device.get_perl_source())
+        common.write_output_file(os.path.join(self.get_bindings_dir(), filename), device.get_perl_source())
 
         if device.is_released():
             self.released_files.append(filename)
@@ -490,8 +490,7 @@ class PerlDocGenerator(perl_common.PerlGeneratorTrait, common.DocGenerator):
         return perl_common.PerlElement
 
     def generate(self, device):
-        with open(device.get_doc_rst_path(), 'w') as f:
-            f.write(device.get_perl_doc())
+        common.write_output_file(device.get_doc_rst_path(), device.get_perl_doc())
 
 def generate(root_dir, language):
     common.generate(root_dir, language, PerlDocGenerator)
@@ -646,8 +646,7 @@ class PerlExamplesGenerator(perl_common.PerlGeneratorTrait, common.ExamplesGener
             else:
                 print('  - ' + filename)
 
-            with open(filepath, 'w') as f:
-                f.write(example.get_perl_source())
+            common.write_output_file(filepath, example.get_perl_source())
 
 def generate(root_dir):
     common.generate(root_dir, 'en', PerlExamplesGenerator)
@@ -908,6 +908,8 @@ class PHPBindingsPacket(php_common.PHPPacket):
         return '\n'.join(param)
 
 class PHPBindingsGenerator(php_common.PHPGeneratorTrait, common.BindingsGenerator):
+    incremental_state = ['released_files']
+
     def get_bindings_name(self):
         return 'php'
 
@@ -926,8 +928,7 @@ class PHPBindingsGenerator(php_common.PHPGeneratorTrait, common.BindingsGenerato
     def generate(self, device):
         filename = '{0}.php'.format(device.get_php_class_name())
 
-        with open(os.path.join(self.get_bindings_dir(), filename), 'w') as f:
-            f.write(device.get_php_source())
+        common.write_output_file(os.path.join(self.get_bindings_dir(), filename), device.get_php_source())
 
         if device.is_released():
             self.released_files.append(filename)
@@ -420,8 +420,7 @@ class PHPDocGenerator(php_common.PHPGeneratorTrait, common.DocGenerator):
         return php_common.PHPElement
 
     def generate(self, device):
-        with open(device.get_doc_rst_path(), 'w') as f:
-            f.write(device.get_php_doc())
+        common.write_output_file(device.get_doc_rst_path(), device.get_php_doc())
 
 def generate(root_dir, language):
     common.generate(root_dir, language, PHPDocGenerator)
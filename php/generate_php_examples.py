@@ -637,8 +637,7 @@ class PHPExamplesGenerator(php_common.PHPGeneratorTrait, common.ExamplesGenerato
             else:
                 print('  - ' + filename)
 
-            with open(filepath, 'w') as f:
-                f.write(example.get_php_source())
+            common.write_output_file(filepath, example.get_php_source())
 
 def generate(root_dir):
     common.generate(root_dir, 'en', PHPExamplesGenerator)
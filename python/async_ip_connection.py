@@ -0,0 +1,663 @@
+# -*- coding: utf-8 -*-
+#
+# Redistribution and use in source and binary forms of this file,
+# with or without modification, are permitted. See the Creative
+# Commons Zero (CC0 1.0) License for more details.
+
+# asyncio variant of the IP Connection. this module requires Python 3.7 or
+# newer, the Device classes for it are generated into the async_*.py files
+# next to the normal Device classes
+
+import asyncio
+import struct
+import os
+import hmac
+import hashlib
+import collections
+import time
+
+try:
+    from .ip_connection import BrickDaemon, IPConnection, Error, base58encode, base58decode, \
+                               get_uid_from_data, get_function_id_from_data, get_sequence_number_from_data, \
+                               check_error_code, get_payload_codec, StreamArray, PacketCapture
+except ImportError:
+    from ip_connection import BrickDaemon, IPConnection, Error, base58encode, base58decode, \
+                              get_uid_from_data, get_function_id_from_data, get_sequence_number_from_data, \
+                              check_error_code, get_payload_codec, StreamArray, PacketCapture
+
+class CallbackIterator(object):
+    """
+    Asynchronous iterator over the values of a callback. Single value
+    callbacks yield the value itself, callbacks with multiple values yield a
+    tuple and callbacks without values yield *None*.
+
+    If *maxsize* is greater than zero and the consumer falls behind then the
+    oldest values are dropped. The iterator ends if it gets closed.
+    """
+
+    def __init__(self, dispatcher, maxsize):
+        self.dispatcher = dispatcher
+        self.queue = asyncio.Queue(maxsize)
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.closed and self.queue.empty():
+            raise StopAsyncIteration
+
+        value = await self.queue.get()
+
+        if value is CallbackIterator:
+            raise StopAsyncIteration
+
+        return value
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, type_, value, traceback):
+        self.close()
+
+    def put(self, value):
+        if self.queue.full():
+            self.queue.get_nowait()
+
+        self.queue.put_nowait(value)
+
+    def close(self):
+        """
+        Stops the iteration. Values that are already queued are still
+        returned.
+        """
+
+        if self.closed:
+            return
+
+        self.closed = True
+        self.dispatcher.remove_iterator(self)
+
+        if self.queue.full():
+            self.queue.get_nowait()
+
+        self.queue.put_nowait(CallbackIterator) # wakes up a pending __anext__
+
+class CallbackDispatcher(object):
+    # stored in the registered_callbacks dict instead of the plain function.
+    # it forwards the callback to the registered function and to all iterators
+    # of the callback. if the function returns an awaitable then it is run as
+    # a task, exceptions are reported to the exception handler of the loop
+
+    def __init__(self, registered_callbacks, callback_id):
+        self.registered_callbacks = registered_callbacks
+        self.callback_id = callback_id
+        self.function = None
+        self.iterators = []
+
+    def __call__(self, *args):
+        if self.function is not None:
+            try:
+                result = self.function(*args)
+
+                if asyncio.iscoroutine(result) or isinstance(result, asyncio.Future):
+                    asyncio.ensure_future(result)
+            except Exception as e:
+                asyncio.get_event_loop().call_exception_handler({'message': 'Exception in callback {0}'.format(self.callback_id),
+                                                                 'exception': e})
+
+        if len(self.iterators) > 0:
+            if len(args) == 0:
+                value = None
+            elif len(args) == 1:
+                value = args[0]
+            else:
+                value = args
+
+            for iterator in self.iterators:
+                iterator.put(value)
+
+    def set_function(self, function):
+        self.function = function
+        self.update()
+
+    def add_iterator(self, maxsize):
+        iterator = CallbackIterator(self, maxsize)
+
+        self.iterators.append(iterator)
+        self.update()
+
+        return iterator
+
+    def remove_iterator(self, iterator):
+        self.iterators.remove(iterator)
+        self.update()
+
+    def update(self):
+        # only keep the dispatcher registered while there is someone to
+        # dispatch to, the IP Connection doesn't queue callbacks that are not
+        # registered at all
+        if self.function is None and len(self.iterators) == 0:
+            if self.registered_callbacks.get(self.callback_id) is self:
+                del self.registered_callbacks[self.callback_id]
+        else:
+            self.registered_callbacks[self.callback_id] = self
+
+def get_callback_dispatcher(registered_callbacks, callback_id):
+    dispatcher = registered_callbacks.get(callback_id)
+
+    if not isinstance(dispatcher, CallbackDispatcher):
+        dispatcher = CallbackDispatcher(registered_callbacks, callback_id)
+
+    return dispatcher
+
+class AsyncDevice(object):
+    """
+    Base class of the generated Async* Device classes. All functions that
+    communicate with the device are coroutines. Callbacks can be received by
+    registering a function with register_callback or by iterating over
+    callbacks(callback_id) with async for.
+    """
+
+    def __init__(self, uid, ipcon):
+        """
+        Creates the device object with the unique device ID *uid* and adds
+        it to the AsyncIPConnection *ipcon*.
+        """
+
+        super(AsyncDevice, self).__init__(uid, ipcon)
+
+        self.stream_lock = asyncio.Lock()
+
+    def register_callback(self, callback_id, function):
+        """
+        Registers the given *function* with the given *callback_id*. The
+        *function* can also be a coroutine function.
+        """
+
+        get_callback_dispatcher(self.registered_callbacks, callback_id).set_function(function)
+
+    def callbacks(self, callback_id, maxsize=0):
+        """
+        Returns an asynchronous iterator over the values of the callback with
+        the given *callback_id*. If *maxsize* is greater than zero then at
+        most *maxsize* values are queued and the oldest values are dropped.
+        """
+
+        return get_callback_dispatcher(self.registered_callbacks, callback_id).add_iterator(maxsize)
+
+    async def read_stream_array(self, function_id, data, form, form_ret, roles, fixed_length, stream_name, array_type):
+        # NOTE: assumes that stream_lock is locked
+        stream = StreamArray(get_payload_codec(form_ret), roles, fixed_length, array_type)
+
+        stream.add_response(await self.ipcon.send_request(self, function_id, data, form, form_ret, True))
+
+        # the remaining chunks are read with multiple requests in flight
+        for response in await self.ipcon.send_requests(self, function_id, [data] * stream.get_missing_chunk_count(), form, form_ret, True):
+            stream.add_response(response)
+
+        if stream.out_of_sync: # discard remaining stream to bring it back in-sync
+            while stream.has_remaining_chunks():
+                stream.add_response(await self.ipcon.send_request(self, function_id, data, form, form_ret, True))
+
+            raise Error(Error.STREAM_OUT_OF_SYNC, '{0} stream is out-of-sync'.format(stream_name))
+
+        return stream.data, stream.get_last_values()
+
+class AsyncBrickDaemon(AsyncDevice, BrickDaemon):
+    async def get_authentication_nonce(self):
+        return await self.ipcon.send_request(self, BrickDaemon.FUNCTION_GET_AUTHENTICATION_NONCE, (), '', '4B')
+
+    async def authenticate(self, client_nonce, digest):
+        await self.ipcon.send_request(self, BrickDaemon.FUNCTION_AUTHENTICATE, (client_nonce, digest), '4B 20B', '')
+
+class AsyncIPConnectionProtocol(asyncio.Protocol):
+    def __init__(self, ipcon):
+        self.ipcon = ipcon
+        self.buffer = bytearray()
+
+    def data_received(self, data):
+        self.buffer += data
+        start = 0
+
+        while len(self.buffer) - start >= 8:
+            length = self.buffer[start + 4]
+
+            if len(self.buffer) - start < length:
+                # Wait for complete packet
+                break
+
+            packet = bytes(self.buffer[start:start + length])
+            start += length
+
+            self.ipcon.handle_response(packet)
+
+        del self.buffer[:start]
+
+    def connection_lost(self, exc):
+        self.ipcon.handle_connection_lost(self, exc)
+
+class AsyncIPConnection(IPConnection):
+    """
+    IP Connection for asyncio. It uses a single transport and no threads,
+    responses are matched to the pending requests by UID, function ID and
+    sequence number. Callbacks are dispatched from the event loop.
+
+    Connecting, disconnecting, enumerating, authenticating and all functions
+    of the Async* Device classes are coroutines. The AsyncIPConnection and its
+    devices have to be created while the event loop is running.
+    """
+
+    def __init__(self):
+        """
+        Creates an asyncio IP Connection object that can be used to enumerate
+        the available devices. It is also required for the constructor of the
+        Async* Bricks and Bricklets.
+        """
+
+        IPConnection.__init__(self)
+
+        self.transport = None
+        self.protocol = None
+        self.connect_pending = False
+        self.response_futures = {}
+        self.authentication_lock = asyncio.Lock()
+        self.disconnect_probe_task = None
+        self.auto_reconnect_task = None
+        self.brickd = AsyncBrickDaemon('2', self)
+
+    async def connect(self, host, port):
+        """
+        Creates a TCP/IP connection to the given *host* and *port*. The host
+        and port can point to a Brick Daemon or to a WIFI/Ethernet Extension.
+
+        Raises an exception if there is no Brick Daemon or WIFI/Ethernet
+        Extension listening at the given host and port.
+        """
+
+        if self.transport is not None or self.connect_pending:
+            raise Error(Error.ALREADY_CONNECTED,
+                        'Already connected to {0}:{1}'.format(self.host, self.port))
+
+        self.host = host
+        self.port = port
+
+        self.connect_pending = True
+
+        try:
+            await self.connect_unlocked(False)
+        finally:
+            self.connect_pending = False
+
+    async def disconnect(self):
+        """
+        Disconnects the TCP/IP connection from the Brick Daemon or the
+        WIFI/Ethernet Extension.
+        """
+
+        self.auto_reconnect_allowed = False
+
+        if self.auto_reconnect_pending:
+            # abort potentially pending auto reconnect
+            self.auto_reconnect_pending = False
+            self.auto_reconnect_task.cancel()
+            self.auto_reconnect_task = None
+        else:
+            if self.transport is None:
+                raise Error(Error.NOT_CONNECTED, 'Not connected')
+
+            self.disconnect_unlocked()
+
+        self.dispatch_meta(IPConnection.CALLBACK_DISCONNECTED, IPConnection.DISCONNECT_REASON_REQUEST)
+
+    async def authenticate(self, secret):
+        """
+        Performs an authentication handshake with the connected Brick Daemon or
+        WIFI/Ethernet Extension, see IPConnection.authenticate.
+        """
+
+        try:
+            secret_bytes = secret.encode('ascii')
+        except UnicodeEncodeError:
+            raise Error(Error.NON_ASCII_CHAR_IN_SECRET, 'Authentication secret contains non-ASCII characters')
+
+        async with self.authentication_lock:
+            if self.next_authentication_nonce == 0:
+                self.next_authentication_nonce = struct.unpack('<I', os.urandom(4))[0]
+
+            server_nonce = await self.brickd.get_authentication_nonce()
+            client_nonce = struct.unpack('<4B', struct.pack('<I', self.next_authentication_nonce))
+            self.next_authentication_nonce = (self.next_authentication_nonce + 1) % (1 << 32)
+
+            h = hmac.new(secret_bytes, digestmod=hashlib.sha1)
+
+            h.update(struct.pack('<4B', *server_nonce))
+            h.update(struct.pack('<4B', *client_nonce))
+
+            digest = struct.unpack('<20B', h.digest())
+            h = None
+
+            await self.brickd.authenticate(client_nonce, digest)
+
+    def get_connection_state(self):
+        """
+        Can return the following states:
+
+        - CONNECTION_STATE_DISCONNECTED: No connection is established.
+        - CONNECTION_STATE_CONNECTED: A connection to the Brick Daemon or
+          the WIFI/Ethernet Extension is established.
+        - CONNECTION_STATE_PENDING: IP Connection is currently trying to
+          connect.
+        """
+
+        if self.transport is not None:
+            return IPConnection.CONNECTION_STATE_CONNECTED
+        elif self.auto_reconnect_pending or self.connect_pending:
+            return IPConnection.CONNECTION_STATE_PENDING
+        else:
+            return IPConnection.CONNECTION_STATE_DISCONNECTED
+
+    async def enumerate(self):
+        """
+        Broadcasts an enumerate request. All devices will respond with an
+        enumerate callback.
+        """
+
+        IPConnection.enumerate(self)
+
+    def wait(self):
+        raise Error(Error.NOT_SUPPORTED, 'Not supported by AsyncIPConnection, use callbacks() instead')
+
+    def unwait(self):
+        raise Error(Error.NOT_SUPPORTED, 'Not supported by AsyncIPConnection, use callbacks() instead')
+
+    def register_callback(self, callback_id, function):
+        """
+        Registers the given *function* with the given *callback_id*. The
+        *function* can also be a coroutine function.
+        """
+
+        get_callback_dispatcher(self.registered_callbacks, callback_id).set_function(function)
+
+    def callbacks(self, callback_id, maxsize=0):
+        """
+        Returns an asynchronous iterator over the values of the callback with
+        the given *callback_id*, see AsyncDevice.callbacks.
+        """
+
+        return get_callback_dispatcher(self.registered_callbacks, callback_id).add_iterator(maxsize)
+
+    async def call_many(self, calls):
+        """
+        Calls the given device functions concurrently and returns their
+        results as a list in the same order. Each call is a tuple of a device
+        function and its arguments. If calls fail then the exception of the
+        first failed call is raised after all calls are done.
+        """
+
+        results = await asyncio.gather(*[call[0](*call[1:]) for call in calls], return_exceptions=True)
+
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+        return results
+
+    async def connect_unlocked(self, is_auto_reconnect):
+        # NOTE: assumes that transport is None
+        loop = asyncio.get_event_loop()
+        transport, protocol = await loop.create_connection(lambda: AsyncIPConnectionProtocol(self),
+                                                           self.host, self.port)
+
+        self.transport = transport
+        self.protocol = protocol
+
+        self.disconnect_probe_flag = True
+        self.disconnect_probe_task = asyncio.ensure_future(self.disconnect_probe_loop())
+
+        if is_auto_reconnect:
+            connect_reason = IPConnection.CONNECT_REASON_AUTO_RECONNECT
+        else:
+            connect_reason = IPConnection.CONNECT_REASON_REQUEST
+
+        self.auto_reconnect_allowed = False
+        self.auto_reconnect_pending = False
+
+        self.dispatch_meta(IPConnection.CALLBACK_CONNECTED, connect_reason)
+
+    def disconnect_unlocked(self):
+        # NOTE: assumes that transport is not None
+        self.disconnect_probe_task.cancel()
+        self.disconnect_probe_task = None
+
+        self.transport.close()
+        self.transport = None
+        self.protocol = None
+
+        # fail pending requests directly instead of letting them time out
+        for future in self.response_futures.values():
+            if not future.done():
+                future.set_exception(Error(Error.NOT_CONNECTED, 'Not connected'))
+
+    def dispatch_meta(self, function_id, parameter, socket_id=None):
+        if function_id in self.registered_callbacks:
+            self.registered_callbacks[function_id](parameter)
+
+    async def disconnect_probe_loop(self):
+        request, _, _ = self.create_packet_header(None, 8, IPConnection.FUNCTION_DISCONNECT_PROBE)
+
+        while True:
+            await asyncio.sleep(IPConnection.DISCONNECT_PROBE_INTERVAL)
+
+            if self.disconnect_probe_flag:
+                # write errors are reported by connection_lost
+                self.transport.write(request)
+            else:
+                self.disconnect_probe_flag = True
+
+    async def auto_reconnect_loop(self):
+        while self.auto_reconnect_allowed and self.transport is None:
+            # wait a moment before each attempt, otherwise a disappearing
+            # server results in a tight loop of failing connects
+            await asyncio.sleep(0.1)
+
+            try:
+                await self.connect_unlocked(True)
+            except OSError:
+                pass
+
+        self.auto_reconnect_pending = False
+        self.auto_reconnect_task = None
+
+    def send(self, packet):
+        if self.transport is None:
+            raise Error(Error.NOT_CONNECTED, 'Not connected')
+
+        self.transport.write(packet)
+
+        self.disconnect_probe_flag = False
+
+        statistics = self.statistics
+
+        if statistics is not None:
+            statistics.add_sent(packet)
+
+        capture = self.capture
+
+        if capture is not None:
+            capture.write(PacketCapture.DIRECTION_SENT, packet)
+
+    async def send_request(self, device, function_id, data, form, form_ret, raw=False):
+        # if raw is true then the response packet is returned instead of the
+        # unpacked result
+        codec = get_payload_codec(form)
+        request, response_expected, sequence_number = \
+            self.create_packet_header(device, 8 + codec.size, function_id)
+
+        request += codec.pack(data)
+
+        if not response_expected:
+            self.send(request)
+            return None
+
+        key = (device.uid, function_id, sequence_number)
+
+        # the sequence number wraps around after 15 requests. if an older
+        # request with the same key is still in flight then its response
+        # cannot be told apart from the response to this request, so wait
+        # for the older request to finish first
+        while key in self.response_futures:
+            await asyncio.wait([self.response_futures[key]])
+
+        future = asyncio.get_event_loop().create_future()
+        self.response_futures[key] = future
+
+        statistics = self.statistics
+
+        if statistics is not None:
+            start_time = time.time()
+
+        try:
+            self.send(request)
+
+            response = await asyncio.wait_for(future, self.timeout)
+
+            if statistics is not None:
+                statistics.add_request(device.uid, function_id, time.time() - start_time)
+        except asyncio.TimeoutError:
+            if statistics is not None:
+                statistics.add_timeout(device.uid, function_id)
+
+            msg = 'Did not receive response for function {0} in time'.format(function_id)
+            raise Error(Error.TIMEOUT, msg, suppress_context=True)
+        finally:
+            if self.response_futures.get(key) is future:
+                del self.response_futures[key]
+
+        check_error_code(response, function_id)
+
+        if raw:
+            return response
+
+        codec_ret = get_payload_codec(form_ret)
+
+        if len(codec_ret.items) > 0:
+            return codec_ret.unpack(response, 8)
+
+    async def send_requests(self, device, function_id, data_list, form, form_ret, raw=False):
+        # sends the requests in the given order and returns their results in
+        # the same order with up to PIPELINE_DEPTH requests in flight. tasks
+        # start in the order they are created, so the requests are sent in
+        # order as well
+        tasks = collections.deque()
+        results = []
+
+        try:
+            for data in data_list:
+                if len(tasks) == IPConnection.PIPELINE_DEPTH:
+                    results.append(await tasks.popleft())
+
+                tasks.append(asyncio.ensure_future(self.send_request(device, function_id, data, form, form_ret, raw)))
+
+            while len(tasks) > 0:
+                results.append(await tasks.popleft())
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        return results
+
+    def handle_response(self, packet):
+        self.disconnect_probe_flag = False
+
+        statistics = self.statistics
+
+        if statistics is not None:
+            statistics.add_received(packet)
+
+        capture = self.capture
+
+        if capture is not None:
+            capture.write(PacketCapture.DIRECTION_RECEIVED, packet)
+
+        function_id = get_function_id_from_data(packet)
+        sequence_number = get_sequence_number_from_data(packet)
+
+        if sequence_number == 0:
+            # there is no callback thread, callbacks are dispatched directly.
+            # dispatch_packet ignores callbacks that are not registered
+            self.dispatch_packet(packet)
+            return
+
+        future = self.response_futures.get((get_uid_from_data(packet), function_id, sequence_number))
+
+        if future is not None and not future.done():
+            future.set_result(packet)
+
+        # Response seems to be OK, but can't be handled
+
+    def handle_connection_lost(self, protocol, exc):
+        if protocol is not self.protocol:
+            # closed by disconnect_unlocked
+            return
+
+        if exc is None:
+            self.handle_disconnect_by_peer(IPConnection.DISCONNECT_REASON_SHUTDOWN, None, True)
+        else:
+            self.handle_disconnect_by_peer(IPConnection.DISCONNECT_REASON_ERROR, None, True)
+
+    def handle_disconnect_by_peer(self, disconnect_reason, socket_id, disconnect_immediately):
+        self.auto_reconnect_allowed = True
+
+        self.disconnect_unlocked()
+        self.dispatch_meta(IPConnection.CALLBACK_DISCONNECTED, disconnect_reason)
+
+        if self.auto_reconnect and self.auto_reconnect_allowed and self.auto_reconnect_task is None:
+            self.auto_reconnect_pending = True
+            self.auto_reconnect_task = asyncio.ensure_future(self.auto_reconnect_loop())
+
+    async def write_bricklet_plugin(self, device, port, position, plugin_chunk):
+        await self.send_request(device,
+                                IPConnection.FUNCTION_WRITE_BRICKLET_PLUGIN,
+                                (port, position, plugin_chunk),
+                                'c B 32B',
+                                '')
+
+    async def read_bricklet_plugin(self, device, port, position):
+        return await self.send_request(device,
+                                       IPConnection.FUNCTION_READ_BRICKLET_PLUGIN,
+                                       (port, position),
+                                       'c B',
+                                       '32B')
+
+    async def get_adc_calibration(self, device):
+        return await self.send_request(device,
+                                       IPConnection.FUNCTION_GET_ADC_CALIBRATION,
+                                       (),
+                                       '',
+                                       'h h')
+
+    async def adc_calibrate(self, device, port):
+        await self.send_request(device,
+                                IPConnection.FUNCTION_ADC_CALIBRATE,
+                                (port,),
+                                'c',
+                                '')
+
+    async def write_bricklet_uid(self, device, port, uid):
+        uid_int = base58decode(uid)
+
+        await self.send_request(device,
+                                IPConnection.FUNCTION_WRITE_BRICKLET_UID,
+                                (port, uid_int),
+                                'c I',
+                                '')
+
+    async def read_bricklet_uid(self, device, port):
+        uid_int = await self.send_request(device,
+                                          IPConnection.FUNCTION_READ_BRICKLET_UID,
+                                          (port,),
+                                          'c',
+                                          'I')
+
+        return base58encode(uid_int)
@@ -0,0 +1,435 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# benchmarks for the hot paths of ip_connection.py: pack_payload,
+# unpack_payload, receive_loop, dispatch_packet and the high-level stream
+# methods. the payload shapes are taken from the device configs, the device
+# benchmarks use the generated bindings from the bindings/ directory. for
+# each benchmark the operations per second and the memory allocated by one
+# operation are reported. the allocations are measured as the peak of the
+# memory traced by tracemalloc during the operation, this requires Python
+# 3.4 or newer. usage:
+#
+#   python benchmark_ip_connection.py [--duration 1.0] [--filter unpack] [--simulator]
+#
+# with --simulator the request and stream benchmarks are run against the
+# Brick Daemon simulator from the tcpip/ directory, which is started as a
+# subprocess on a free port on the loopback interface
+
+import sys
+import os
+import types
+import time
+import array
+import threading
+import subprocess
+import argparse
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None # Python < 3.4
+
+if sys.hexversion < 0x03030000:
+    perf_counter = time.time
+else:
+    perf_counter = time.perf_counter
+
+root_dir = os.path.dirname(os.path.realpath(__file__))
+
+sys.path.append(os.path.split(root_dir)[0])
+import common
+import python_common
+
+# the generated bindings use a relative import of ip_connection, so they are
+# imported as part of a tinkerforge package made of this directory and the
+# bindings/ directory. this ensures that everything uses the ip_connection.py
+# from this directory
+package = types.ModuleType('tinkerforge')
+package.__path__ = [root_dir, os.path.join(root_dir, 'bindings')]
+sys.modules['tinkerforge'] = package
+
+from tinkerforge.ip_connection import pack_payload, unpack_payload, get_payload_codec, IPConnection
+
+# connected IP Connections, disconnected at the end
+connections = []
+
+# (label, config name, packet name, direction)
+PAYLOAD_SHAPES = [
+    ('scalar', 'bricklet_temperature_v2', 'Get Temperature', 'out'),
+    ('identity', 'bricklet_temperature_v2', 'Get Identity', 'out'),
+    ('bool bitfield', 'bricklet_io16_v2', 'Get Value', 'out'),
+    ('bool chunk', 'bricklet_lcd_128x64', 'Write Pixels Low Level', 'in'),
+    ('char array', 'bricklet_rs485', 'Read Low Level', 'out'),
+    ('string', 'bricklet_lcd_20x4', 'Write Line', 'in'),
+    ('64 byte chunk', 'bricklet_thermal_imaging', 'Get Temperature Image Low Level', 'out')
+]
+
+class BenchmarkGenerator(python_common.PythonGeneratorTrait, common.Generator):
+    # the generator is only used to build the device model from the configs
+    check_root_dir_name = False
+
+    def get_bindings_name(self):
+        return 'python'
+
+    def get_bindings_display_name(self):
+        return 'Python'
+
+    def get_element_class(self):
+        return python_common.PythonElement
+
+def load_payload_shapes():
+    generator = BenchmarkGenerator(root_dir, 'tinkerforge', 'en')
+    devices = {}
+    shapes = []
+
+    for name, com, _ in common.load_device_configs(generator.get_config_dir()):
+        devices[name] = com
+
+    for label, config_name, packet_name, direction in PAYLOAD_SHAPES:
+        device = generator.get_device_class()(devices[config_name], generator)
+        packet = [packet for packet in device.get_packets() if packet.get_name().space == packet_name][0]
+        form = ' '.join([element.get_python_struct_format() for element in packet.get_elements(direction=direction)])
+        size = sum([element.get_size() for element in packet.get_elements(direction=direction)])
+
+        # non-zero sample data, so that strings and bitfields are not empty
+        payload = bytes(bytearray([(i * 37 + 1) % 97 + 1 for i in range(size)]))
+
+        shapes.append(('{0} ({1} {2}, {3})'.format(label, device.get_long_display_name(), packet_name, form), form, payload))
+
+    return shapes
+
+def import_bindings(module_name, class_name):
+    try:
+        module = __import__('tinkerforge.' + module_name, fromlist=[class_name])
+    except ImportError:
+        return None
+
+    return getattr(module, class_name)
+
+def make_packet(uid, function_id, payload):
+    return pack_payload((uid, 8 + len(payload), function_id, 0, 0), 'I B B B B') + payload
+
+class Benchmark(object):
+    # each call of the function performs ops_per_call operations, for example
+    # one call of receive_loop frames many packets
+    def __init__(self, name, function, ops_per_call=1):
+        self.name = name
+        self.function = function
+        self.ops_per_call = ops_per_call
+
+    def run(self, duration):
+        function = self.function
+
+        function() # warm up caches
+
+        calls = 0
+        start = perf_counter()
+        elapsed = 0
+
+        while elapsed < duration:
+            for _ in range(10):
+                function()
+
+            calls += 10
+            elapsed = perf_counter() - start
+
+        ops_per_second = calls * self.ops_per_call / elapsed
+        allocated_per_op = None
+
+        if tracemalloc != None:
+            samples = []
+
+            for _ in range(5):
+                tracemalloc.start()
+                function()
+                samples.append(tracemalloc.get_traced_memory()[1] / float(self.ops_per_call))
+                tracemalloc.stop()
+
+            allocated_per_op = min(samples)
+
+        return ops_per_second, allocated_per_op
+
+class LoopSocket(object):
+    # stands in for the socket of an IPConnection and returns the given data
+    # to receive_loop until the receive_loop is stopped
+    def __init__(self, ipcon, data, rounds):
+        self.ipcon = ipcon
+        self.data = data
+        self.rounds = rounds
+
+    def recv_into(self, buffer):
+        if self.rounds == 0:
+            self.ipcon.receive_flag = False
+            return 0
+
+        self.rounds -= 1
+        length = min(len(buffer), len(self.data))
+        buffer[0:length] = self.data[0:length]
+
+        return length
+
+class FeedSocket(object):
+    # stands in for the socket of an IPConnection and returns data fed by the
+    # benchmark, so the receive thread and callback thread are running normally
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.data = b''
+        self.closed = False
+
+    def settimeout(self, timeout):
+        pass
+
+    def feed(self, data):
+        with self.condition:
+            self.data += data
+            self.condition.notify()
+
+    def recv_into(self, buffer):
+        with self.condition:
+            while len(self.data) == 0 and not self.closed:
+                self.condition.wait()
+
+            if self.closed:
+                return 0
+
+            length = min(len(buffer), len(self.data))
+            buffer[0:length] = self.data[0:length]
+            self.data = self.data[length:]
+
+            return length
+
+    def send(self, data):
+        return len(data)
+
+    def shutdown(self, how):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+    def close(self):
+        self.shutdown(None)
+
+class FeedIPConnection(IPConnection):
+    def create_socket(self):
+        self.feed_socket = FeedSocket()
+
+        return self.feed_socket
+
+def get_payload_benchmarks():
+    benchmarks = []
+
+    for name, form, payload in load_payload_shapes():
+        data = unpack_payload(payload, form)
+
+        if len(get_payload_codec(form).items) == 1:
+            data = (data,)
+
+        benchmarks.append(Benchmark('pack_payload ' + name, lambda data=data, form=form: pack_payload(data, form)))
+        benchmarks.append(Benchmark('unpack_payload ' + name, lambda payload=payload, form=form: unpack_payload(payload, form)))
+
+    return benchmarks
+
+def get_receive_benchmarks():
+    benchmarks = []
+
+    # framing of 64 KiB of mixed packet sizes, handle_response is replaced
+    ipcon = IPConnection()
+    packets = [make_packet(1, 1, b'\x00' * 2), make_packet(2, 3, b'\x00' * 64), make_packet(3, 4, b'\x00' * 26)]
+    data = b''
+    packet_count = 0
+
+    while len(data) + 72 <= 65536:
+        data += packets[packet_count % len(packets)]
+        packet_count += 1
+
+    ipcon.handle_response = lambda packet: None
+
+    def receive(ipcon=ipcon, data=data):
+        ipcon.socket = LoopSocket(ipcon, data, 16)
+        ipcon.receive_flag = True
+        ipcon.receive_loop(ipcon.socket_id)
+
+    benchmarks.append(Benchmark('receive_loop framing (64 KiB of 10, 34 and 72 byte packets)', receive, packet_count * 16))
+
+    # complete callback path from receive thread to callback thread
+    BrickletTemperatureV2 = import_bindings('bricklet_temperature_v2', 'BrickletTemperatureV2')
+
+    if BrickletTemperatureV2 != None:
+        ipcon = FeedIPConnection()
+        device = BrickletTemperatureV2('tV', ipcon)
+        packet = make_packet(device.uid, BrickletTemperatureV2.CALLBACK_TEMPERATURE, pack_payload((2150,), 'h'))
+        received = [0]
+        done = threading.Event()
+
+        def cb_temperature(temperature):
+            received[0] += 1
+
+            if received[0] == 1000:
+                done.set()
+
+        device.register_callback(BrickletTemperatureV2.CALLBACK_TEMPERATURE, cb_temperature)
+        ipcon.connect('localhost', 4223) # host and port are not used
+        connections.append(ipcon)
+
+        def callback_path(ipcon=ipcon, data=packet * 1000):
+            received[0] = 0
+            done.clear()
+            ipcon.feed_socket.feed(data)
+            done.wait()
+
+        benchmarks.append(Benchmark('receive_loop to callback (Temperature Bricklet 2.0 Temperature)', callback_path, 1000))
+
+    return benchmarks
+
+def get_dispatch_benchmarks():
+    benchmarks = []
+    ipcon = IPConnection()
+
+    BrickletTemperatureV2 = import_bindings('bricklet_temperature_v2', 'BrickletTemperatureV2')
+
+    if BrickletTemperatureV2 != None:
+        device = BrickletTemperatureV2('tV', ipcon)
+        packet = make_packet(device.uid, BrickletTemperatureV2.CALLBACK_TEMPERATURE, pack_payload((2150,), 'h'))
+
+        device.register_callback(BrickletTemperatureV2.CALLBACK_TEMPERATURE, lambda temperature: None)
+
+        benchmarks.append(Benchmark('dispatch_packet callback (Temperature Bricklet 2.0 Temperature)',
+                                    lambda packet=packet: ipcon.dispatch_packet(packet)))
+
+    BrickletIO16V2 = import_bindings('bricklet_io16_v2', 'BrickletIO16V2')
+
+    if BrickletIO16V2 != None:
+        device = BrickletIO16V2('io', ipcon)
+        packet = make_packet(device.uid, BrickletIO16V2.CALLBACK_ALL_INPUT_VALUE, pack_payload(([True, False] * 8, [False, True] * 8), '16! 16!'))
+
+        device.register_callback(BrickletIO16V2.CALLBACK_ALL_INPUT_VALUE, lambda changed, value: None)
+
+        benchmarks.append(Benchmark('dispatch_packet bool bitfield callback (IO-16 Bricklet 2.0 All Input Value)',
+                                    lambda packet=packet: ipcon.dispatch_packet(packet)))
+
+    BrickletThermalImaging = import_bindings('bricklet_thermal_imaging', 'BrickletThermalImaging')
+
+    if BrickletThermalImaging != None:
+        device = BrickletThermalImaging('ti', ipcon)
+        packets = []
+
+        for chunk_offset in range(0, 4800, 31):
+            packets.append(make_packet(device.uid, BrickletThermalImaging.CALLBACK_TEMPERATURE_IMAGE_LOW_LEVEL,
+                                       pack_payload((chunk_offset, list(range(31))), 'H 31H')))
+
+        device.register_callback(BrickletThermalImaging.CALLBACK_TEMPERATURE_IMAGE, lambda image: None)
+
+        def dispatch(packets=packets):
+            for packet in packets:
+                ipcon.dispatch_packet(packet)
+
+        benchmarks.append(Benchmark('dispatch_packet high-level callback (Thermal Imaging Bricklet Temperature Image, 155 packets)', dispatch))
+
+    return benchmarks
+
+def start_simulator():
+    simulator_path = os.path.join(os.path.split(root_dir)[0], 'tcpip', 'brickd_simulator.py')
+    args = [sys.executable, simulator_path, '--port', '0',
+            'bricklet_temperature_v2:tV', 'bricklet_thermal_imaging:ti', 'bricklet_lcd_128x64:Lc', 'bricklet_rs485:rS']
+    process = subprocess.Popen(args, stdout=subprocess.PIPE, universal_newlines=True)
+
+    while True:
+        line = process.stdout.readline()
+
+        if len(line) == 0:
+            raise Exception('Could not start Brick Daemon simulator')
+
+        if line.startswith('Listening on '):
+            return process, int(line.strip().split(':')[-1])
+
+def get_simulator_benchmarks(port):
+    benchmarks = []
+    ipcon = IPConnection()
+
+    ipcon.connect('localhost', port)
+    connections.append(ipcon)
+
+    BrickletTemperatureV2 = import_bindings('bricklet_temperature_v2', 'BrickletTemperatureV2')
+    BrickletThermalImaging = import_bindings('bricklet_thermal_imaging', 'BrickletThermalImaging')
+    BrickletLCD128x64 = import_bindings('bricklet_lcd_128x64', 'BrickletLCD128x64')
+    BrickletRS485 = import_bindings('bricklet_rs485', 'BrickletRS485')
+
+    if BrickletTemperatureV2 != None:
+        device = BrickletTemperatureV2('tV', ipcon)
+
+        calls = [(device.get_temperature,)] * 16
+
+        benchmarks.append(Benchmark('getter (Temperature Bricklet 2.0 Get Temperature)', device.get_temperature))
+        benchmarks.append(Benchmark('call_many getters, 16 per call (Temperature Bricklet 2.0 Get Temperature)',
+                                    lambda device=device, calls=calls: device.call_many(calls), 16))
+
+    if BrickletThermalImaging != None:
+        device = BrickletThermalImaging('ti', ipcon)
+
+        benchmarks.append(Benchmark('stream out (Thermal Imaging Bricklet Get Temperature Image, 4800 items)',
+                                    device.get_temperature_image))
+        benchmarks.append(Benchmark('stream out array (Thermal Imaging Bricklet Get Temperature Image, 4800 items)',
+                                    lambda device=device: device.get_temperature_image(array_type=array.array)))
+
+    if BrickletRS485 != None:
+        device = BrickletRS485('rS', ipcon)
+
+        benchmarks.append(Benchmark('stream out chars (RS485 Bricklet Read, 1000 items)',
+                                    lambda device=device: device.read(1000)))
+
+    if BrickletLCD128x64 != None:
+        device = BrickletLCD128x64('Lc', ipcon)
+        pixels = [True, False] * (128 * 64 // 2)
+
+        benchmarks.append(Benchmark('stream in bools (LCD 128x64 Bricklet Write Pixels, 8192 items)',
+                                    lambda device=device, pixels=pixels: device.write_pixels(0, 0, 127, 63, pixels)))
+
+    return benchmarks
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks for the hot paths of ip_connection.py')
+    parser.add_argument('--duration', type=float, default=1.0, help='duration of each benchmark in seconds (default: 1.0)')
+    parser.add_argument('--filter', help='only run benchmarks whose name contains this text')
+    parser.add_argument('--simulator', action='store_true', help='also run the request and stream benchmarks against the Brick Daemon simulator')
+
+    args = parser.parse_args()
+    benchmarks = get_payload_benchmarks() + get_receive_benchmarks() + get_dispatch_benchmarks()
+    simulator = None
+
+    if import_bindings('bricklet_temperature_v2', 'BrickletTemperatureV2') == None:
+        print('Generated bindings not found, skipping device benchmarks. Run generate_python_bindings.py first')
+
+    if args.simulator:
+        simulator, port = start_simulator()
+        benchmarks += get_simulator_benchmarks(port)
+
+    if tracemalloc == None:
+        print('tracemalloc not available, allocations are not measured')
+
+    print('{0:<110} {1:>12} {2:>10} {3:>12}'.format('benchmark', 'ops/sec', 'usec/op', 'alloc B/op'))
+
+    try:
+        for benchmark in benchmarks:
+            if args.filter != None and args.filter not in benchmark.name:
+                continue
+
+            ops_per_second, allocated_per_op = benchmark.run(args.duration)
+
+            if allocated_per_op != None:
+                allocated_per_op = '{0:.0f}'.format(allocated_per_op)
+            else:
+                allocated_per_op = '-'
+
+            print('{0:<110} {1:>12.0f} {2:>10.2f} {3:>12}'.format(benchmark.name, ops_per_second, 1000000.0 / ops_per_second, allocated_per_op))
+            sys.stdout.flush()
+    finally:
+        for ipcon in connections:
+            ipcon.disconnect()
+
+        if simulator != None:
+            simulator.terminate()
+            simulator.wait()
+
+if __name__ == '__main__':
+    main()
@@ -26,11 +26,26 @@ Boston, MA 02111-1307, USA.
 
 import sys
 import os
+import re
 
 sys.path.append(os.path.split(os.getcwd())[0])
 import common
 import python_common
 
+def get_python_payload_codec_name(form):
+    if len(form) == 0:
+        return '_PAYLOAD_EMPTY'
+
+    return '_PAYLOAD_' + form.replace(' ', '_').replace('!', 'BOOL')
+
+def get_python_parameters_tuple(packet):
+    parameters = packet.get_python_parameters()
+
+    if len(parameters) > 0 and not ',' in parameters:
+        parameters += ','
+
+    return '(' + parameters + ')'
+
 class PythonBindingsDevice(python_common.PythonDevice):
     def get_python_import(self):
         template = """# -*- coding: utf-8 -*-
@@ -38,9 +53,9 @@ class PythonBindingsDevice(python_common.PythonDevice):
 from collections import namedtuple
 
 try:
-    from .ip_connection import Device, IPConnection, Error, create_char, create_char_list, create_string, create_chunk_data
+    from .ip_connection import Device, IPConnection, Error, create_char, create_char_list, create_string, create_chunk_data, get_payload_codec
 except ValueError:
-    from ip_connection import Device, IPConnection, Error, create_char, create_char_list, create_string, create_chunk_data
+    from ip_connection import Device, IPConnection, Error, create_char, create_char_list, create_string, create_chunk_data, get_payload_codec
 
 """
 
@@ -52,10 +67,27 @@ except ValueError:
         return template.format(self.get_generator().get_header_comment('hash'),
                                released)
 
-    def get_python_namedtuples(self):
-        tuples = ''
-        template = """{0} = namedtuple('{1}', [{2}])
-"""
+    def get_python_payload_codecs(self):
+        # the payload codecs are created once at import time and shared by all
+        # functions and callbacks with the same format
+        codecs = ''
+        template = "{0} = get_payload_codec('{1}')\n"
+        forms = set()
+
+        for packet in self.get_packets('function'):
+            forms.add(packet.get_python_format_list('in'))
+            forms.add(packet.get_python_format_list('out'))
+
+        for packet in self.get_packets('callback'):
+            forms.add(packet.get_python_format_list('out'))
+
+        for form in sorted(forms):
+            codecs += template.format(get_python_payload_codec_name(form), form)
+
+        return codecs + '\n'
+
+    def get_python_namedtuple_definitions(self):
+        definitions = []
 
         for packet in self.get_packets('function'):
             if len(packet.get_elements(direction='out')) < 2:
@@ -73,7 +105,7 @@ except ValueError:
             for element in packet.get_elements(direction='out'):
                 params.append("'{0}'".format(element.get_name().under))
 
-            tuples += template.format(name.camel, name_tup, ", ".join(params))
+            definitions.append((name.camel, name_tup, params))
 
         for packet in self.get_packets('function'):
             if not packet.has_high_level():
@@ -94,7 +126,17 @@ except ValueError:
             for element in packet.get_elements(direction='out', high_level=True):
                 params.append("'{0}'".format(element.get_name().under))
 
-            tuples += template.format(name.camel, name_tup, ", ".join(params))
+            definitions.append((name.camel, name_tup, params))
+
+        return definitions
+
+    def get_python_namedtuples(self):
+        tuples = ''
+        template = """{0} = namedtuple('{1}', [{2}])
+"""
+
+        for name, name_tup, params in self.get_python_namedtuple_definitions():
+            tuples += template.format(name, name_tup, ", ".join(params))
 
         return tuples
 
@@ -173,12 +215,12 @@ class {0}(Device):
 
     def get_python_callback_formats(self):
         callback_formats = ''
-        template = "        self.callback_formats[{0}.CALLBACK_{1}] = '{2}'\n"
+        template = "        self.callback_formats[{0}.CALLBACK_{1}] = {2}\n"
 
         for packet in self.get_packets('callback'):
             callback_formats += template.format(self.get_python_class_name(),
                                                 packet.get_name().upper,
-                                                packet.get_python_format_list('out'))
+                                                get_python_payload_codec_name(packet.get_python_format_list('out')))
 
         return callback_formats + '\n'
 
@@ -209,21 +251,21 @@ class {0}(Device):
         \"\"\"
         {9}
         \"\"\"{10}
-        return {1}(*self.ipcon.send_request(self, {2}.FUNCTION_{3}, ({4}{8}), '{5}', '{6}'))
+        return {1}(*self.ipcon.send_request(self, {2}.FUNCTION_{3}, ({4}{8}), {5}, {6}))
 """
         m_ret = """
     def {0}(self{6}{3}):
         \"\"\"
         {8}
         \"\"\"{9}
-        return self.ipcon.send_request(self, {1}.FUNCTION_{2}, ({3}{7}), '{4}', '{5}')
+        return self.ipcon.send_request(self, {1}.FUNCTION_{2}, ({3}{7}), {4}, {5})
 """
         m_nor = """
     def {0}(self{6}{3}):
         \"\"\"
         {8}
         \"\"\"{9}
-        self.ipcon.send_request(self, {1}.FUNCTION_{2}, ({3}{7}), '{4}', '{5}')
+        self.ipcon.send_request(self, {1}.FUNCTION_{2}, ({3}{7}), {4}, {5})
 """
         methods = ''
         cls = self.get_python_class_name()
@@ -243,8 +285,8 @@ class {0}(Device):
                 if not ',' in par:
                     ct = ','
 
-            in_f = packet.get_python_format_list('in')
-            out_f = packet.get_python_format_list('out')
+            in_f = get_python_payload_codec_name(packet.get_python_format_list('in'))
+            out_f = get_python_payload_codec_name(packet.get_python_format_list('out'))
             coercions = common.wrap_non_empty('\n        ', packet.get_python_parameter_coercions(), '\n')
 
             elements = len(packet.get_elements(direction='out'))
@@ -272,11 +314,18 @@ class {0}(Device):
             {stream_name_under}_chunk_data = [{chunk_padding}] * {chunk_cardinality}
             ret = self.{function_name}_low_level({parameters})
         else:
+            {stream_name_under}_requests = []
+
+            while {stream_name_under}_chunk_offset < {stream_name_under}_length:
+                {stream_name_under}_chunk_data = create_chunk_data({stream_name_under}, {stream_name_under}_chunk_offset, {chunk_cardinality}, {chunk_padding})
+                {stream_name_under}_requests.append({parameters_tuple})
+                {stream_name_under}_chunk_offset += {chunk_cardinality}
+
+            # the chunks are written with multiple requests in flight
             with self.stream_lock:
-                while {stream_name_under}_chunk_offset < {stream_name_under}_length:
-                    {stream_name_under}_chunk_data = create_chunk_data({stream_name_under}, {stream_name_under}_chunk_offset, {chunk_cardinality}, {chunk_padding})
-                    ret = self.{function_name}_low_level({parameters})
-                    {stream_name_under}_chunk_offset += {chunk_cardinality}
+                rets = self.ipcon.send_requests(self, {class_name}.FUNCTION_{function_name_upper}_LOW_LEVEL, {stream_name_under}_requests, {form_in}, {form_out})
+
+            ret = {last_ret}
 {result}
 """
         template_stream_in_fixed_length = """
@@ -290,11 +339,18 @@ class {0}(Device):
         if len({stream_name_under}) != {stream_name_under}_length:
             raise Error(Error.INVALID_PARAMETER, '{stream_name_space} has to be exactly {{0}} items long'.format({stream_name_under}_length))
 
+        {stream_name_under}_requests = []
+
+        while {stream_name_under}_chunk_offset < {stream_name_under}_length:
+            {stream_name_under}_chunk_data = create_chunk_data({stream_name_under}, {stream_name_under}_chunk_offset, {chunk_cardinality}, {chunk_padding})
+            {stream_name_under}_requests.append({parameters_tuple})
+            {stream_name_under}_chunk_offset += {chunk_cardinality}
+
+        # the chunks are written with multiple requests in flight
         with self.stream_lock:
-            while {stream_name_under}_chunk_offset < {stream_name_under}_length:
-                {stream_name_under}_chunk_data = create_chunk_data({stream_name_under}, {stream_name_under}_chunk_offset, {chunk_cardinality}, {chunk_padding})
-                ret = self.{function_name}_low_level({parameters})
-                {stream_name_under}_chunk_offset += {chunk_cardinality}
+            rets = self.ipcon.send_requests(self, {class_name}.FUNCTION_{function_name_upper}_LOW_LEVEL, {stream_name_under}_requests, {form_in}, {form_out})
+
+        ret = {last_ret}
 {result}
 """
         template_stream_in_result = """
@@ -361,15 +417,27 @@ class {0}(Device):
         template_stream_in_single_chunk_namedtuple_result = """
         return {result_camel_name}(*self.{function_name}_low_level({parameters}))"""
         template_stream_out = """
-    def {function_name}(self{high_level_parameters}):
+    def {function_name}(self{high_level_parameters}{array_type_parameter}):
         \"\"\"
-        {doc}
-        \"\"\"{coercions}{fixed_length}
+        {doc}{array_type_doc}
+        \"\"\"{coercions}{fixed_length}{array_mode}
         with self.stream_lock:
             ret = self.{function_name}_low_level({parameters}){dynamic_length_3}
             {chunk_offset_check}{stream_name_under}_out_of_sync = ret.{stream_name_under}_chunk_offset != 0
             {chunk_offset_check_indent}{stream_name_under}_data = ret.{stream_name_under}_chunk_data
 
+            if not {stream_name_under}_out_of_sync and len({stream_name_under}_data) < {stream_name_under}_length:
+                # the remaining chunks are read with multiple requests in flight
+                {stream_name_under}_chunk_count = ({stream_name_under}_length - len({stream_name_under}_data) - 1) // {chunk_cardinality} + 1
+                rets = self.ipcon.send_requests(self, {class_name}.FUNCTION_{function_name_upper}_LOW_LEVEL, [{parameters_tuple}] * {stream_name_under}_chunk_count, {form_in}, {form_out})
+
+                for low_level_ret in rets:
+                    ret = {low_level_name}(*low_level_ret){dynamic_length_5}
+
+                    if not {stream_name_under}_out_of_sync:
+                        {stream_name_under}_out_of_sync = ret.{stream_name_under}_chunk_offset != len({stream_name_under}_data)
+                        {stream_name_under}_data += ret.{stream_name_under}_chunk_data
+
             while not {stream_name_under}_out_of_sync and len({stream_name_under}_data) < {stream_name_under}_length:
                 ret = self.{function_name}_low_level({parameters}){dynamic_length_4}
                 {stream_name_under}_out_of_sync = ret.{stream_name_under}_chunk_offset != len({stream_name_under}_data)
@@ -394,6 +462,19 @@ class {0}(Device):
                 {stream_name_under}_data = ()
             else:
                 """
+        template_stream_out_array_type_doc = """
+
+        If *array_type* is 'numpy' or array.array then the {stream_name_space} data is
+        returned as an array of that type instead of a tuple."""
+        template_stream_out_array_mode = """
+        if array_type is not None:
+            with self.stream_lock:
+                {stream_name_under}_data, ret = self.read_stream_array({class_name}.FUNCTION_{function_name_upper}_LOW_LEVEL, {parameters_tuple}, {form_in}, {form_out}, {roles}, {fixed_length}, '{stream_name_space}', array_type)
+{low_level_ret}{result}
+"""
+        template_stream_out_array_mode_low_level_ret = """
+            ret = {low_level_name}(*ret)
+"""
         template_stream_out_single_chunk = """
     def {function_name}(self{high_level_parameters}):
         \"\"\"
@@ -477,10 +558,21 @@ class {0}(Device):
                         else:
                             result = template_stream_in_namedtuple_result.format(result_camel_name=packet.get_name(skip=-2).camel)
 
+                if len(packet.get_elements(direction='out')) > 1:
+                    last_ret = '{0}(*rets[-1])'.format(packet.get_name().camel)
+                else:
+                    last_ret = 'rets[-1]'
+
                 methods += template.format(doc=packet.get_python_formatted_doc(),
                                            coercions=common.wrap_non_empty('\n        ', packet.get_python_parameter_coercions(high_level=True), '\n'),
                                            function_name=packet.get_name(skip=-2).under,
+                                           function_name_upper=packet.get_name(skip=-2).upper,
+                                           class_name=cls,
                                            parameters=packet.get_python_parameters(),
+                                           parameters_tuple=get_python_parameters_tuple(packet),
+                                           form_in=get_python_payload_codec_name(packet.get_python_format_list('in')),
+                                           form_out=get_python_payload_codec_name(packet.get_python_format_list('out')),
+                                           last_ret=last_ret,
                                            high_level_parameters=common.wrap_non_empty(', ', packet.get_python_parameters(high_level=True), ''),
                                            stream_name_space=stream_in.get_name().space,
                                            stream_name_under=stream_in.get_name().under,
@@ -532,10 +624,51 @@ class {0}(Device):
                 else:
                     template = template_stream_out
 
+                if packet.has_python_array_type():
+                    roles = []
+
+                    for element in packet.get_elements(direction='out'):
+                        roles.append(element.get_role())
+
+                    array_result = result.replace('{0}_data[:{0}_length]'.format(stream_out.get_name().under),
+                                                  '{0}_data'.format(stream_out.get_name().under))
+
+                    if 'ret.' in array_result:
+                        low_level_ret = template_stream_out_array_mode_low_level_ret.format(low_level_name=packet.get_name().camel)
+                    else:
+                        low_level_ret = ''
+
+                    array_type_parameter = ', array_type=None'
+                    array_type_doc = template_stream_out_array_type_doc.format(stream_name_space=stream_out.get_name().space.lower())
+                    array_mode = template_stream_out_array_mode.format(stream_name_under=stream_out.get_name().under,
+                                                                       stream_name_space=stream_out.get_name().space,
+                                                                       class_name=cls,
+                                                                       function_name_upper=packet.get_name(skip=-2).upper,
+                                                                       parameters_tuple=get_python_parameters_tuple(packet),
+                                                                       form_in=get_python_payload_codec_name(packet.get_python_format_list('in')),
+                                                                       form_out=get_python_payload_codec_name(packet.get_python_format_list('out')),
+                                                                       roles=repr(tuple(roles)),
+                                                                       fixed_length=stream_out.get_fixed_length(),
+                                                                       low_level_ret=low_level_ret,
+                                                                       result=array_result.replace('\n        ', '\n            '))
+                else:
+                    array_type_parameter = ''
+                    array_type_doc = ''
+                    array_mode = ''
+
                 methods += template.format(doc=packet.get_python_formatted_doc(),
                                            coercions=common.wrap_non_empty('\n        ', packet.get_python_parameter_coercions(high_level=True), '\n'),
                                            function_name=packet.get_name(skip=-2).under,
+                                           function_name_upper=packet.get_name(skip=-2).upper,
+                                           class_name=cls,
                                            parameters=packet.get_python_parameters(),
+                                           parameters_tuple=get_python_parameters_tuple(packet),
+                                           form_in=get_python_payload_codec_name(packet.get_python_format_list('in')),
+                                           form_out=get_python_payload_codec_name(packet.get_python_format_list('out')),
+                                           low_level_name=packet.get_name().camel,
+                                           array_type_parameter=array_type_parameter,
+                                           array_type_doc=array_type_doc,
+                                           array_mode=array_mode,
                                            high_level_parameters=common.wrap_non_empty(', ', packet.get_python_parameters(high_level=True), ''),
                                            stream_name_space=stream_out.get_name().space,
                                            stream_name_under=stream_out.get_name().under,
@@ -574,6 +707,7 @@ class {0}(Device):
 
     def get_python_source(self):
         source  = self.get_python_import()
+        source += self.get_python_payload_codecs()
         source += self.get_python_namedtuples()
         source += self.get_python_class()
         source += self.get_python_callback_id_definitions()
@@ -589,6 +723,70 @@ class {0}(Device):
 
         return common.strip_trailing_whitespace(source)
 
+    def get_python_async_import(self):
+        template = """# -*- coding: utf-8 -*-
+{0}{1}
+try:
+    from .ip_connection import Error, create_char, create_char_list, create_string, create_chunk_data, get_payload_codec
+    from .async_ip_connection import AsyncDevice
+    from .{2} import {3}
+except ImportError:
+    from ip_connection import Error, create_char, create_char_list, create_string, create_chunk_data, get_payload_codec
+    from async_ip_connection import AsyncDevice
+    from {2} import {3}
+
+"""
+
+        if not self.is_released():
+            released = '\n#### __DEVICE_IS_NOT_RELEASED__ ####\n'
+        else:
+            released = ''
+
+        names = [self.get_python_class_name()]
+
+        for name, _, _ in self.get_python_namedtuple_definitions():
+            names.append(name)
+
+        return template.format(self.get_generator().get_header_comment('hash'),
+                               released,
+                               self.get_python_import_name(),
+                               ', '.join(names))
+
+    def get_python_async_class(self):
+        template = """class Async{0}(AsyncDevice, {0}):
+    \"\"\"
+    {1}
+
+    asyncio variant of {0}. All functions that communicate
+    with the device are coroutines, see AsyncIPConnection.
+    \"\"\"
+"""
+
+        return template.format(self.get_python_class_name(),
+                               common.select_lang(self.get_description()))
+
+    def get_python_async_methods(self):
+        # the async methods are derived from the normal methods. each method
+        # becomes a coroutine that awaits the requests it sends and the
+        # low-level methods it calls
+        methods = self.get_python_methods()
+        methods = re.sub(r'^    def ', '    async def ', methods, flags=re.MULTILINE)
+        methods = methods.replace('self.ipcon.send_request(', 'await self.ipcon.send_request(')
+        methods = methods.replace('self.ipcon.send_requests(', 'await self.ipcon.send_requests(')
+        methods = methods.replace('self.read_stream_array(', 'await self.read_stream_array(')
+        methods = re.sub(r'self\.(\w+_low_level)\(', r'await self.\1(', methods)
+        methods = methods.replace('with self.stream_lock:', 'async with self.stream_lock:')
+
+        return methods
+
+    def get_python_async_source(self):
+        source  = self.get_python_async_import()
+        source += self.get_python_payload_codecs()
+        source += self.get_python_async_class()
+        source += self.get_python_async_methods()
+
+        return common.strip_trailing_whitespace(source)
+
 class PythonBindingsPacket(python_common.PythonPacket):
     def get_python_formatted_doc(self):
         text = common.select_lang(self.get_doc_text())
@@ -622,6 +820,8 @@ class PythonBindingsPacket(python_common.PythonPacket):
         return '\n        '.join(coercions)
 
 class PythonBindingsGenerator(python_common.PythonGeneratorTrait, common.BindingsGenerator):
+    incremental_state = ['released_files', 'device_factory_all_classes', 'device_factory_released_classes']
+
     def get_bindings_name(self):
         return 'python'
 
@@ -646,14 +846,17 @@ class PythonBindingsGenerator(python_common.PythonGeneratorTrait, common.Binding
     def generate(self, device):
         filename = '{0}_{1}.py'.format(device.get_category().under, device.get_name().under)
 
-        with open(os.path.join(self.get_bindings_dir(), filename), 'w') as f:
-            f.write(device.get_python_source())
+        async_filename = 'async_' + filename
+
+        common.write_output_file(os.path.join(self.get_bindings_dir(), filename), device.get_python_source())
+        common.write_output_file(os.path.join(self.get_bindings_dir(), async_filename), device.get_python_async_source())
 
         self.device_factory_all_classes.append((device.get_python_import_name(), device.get_python_class_name()))
 
         if device.is_released():
             self.device_factory_released_classes.append((device.get_python_import_name(), device.get_python_class_name()))
             self.released_files.append(filename)
+            self.released_files.append(async_filename)
 
     def finish(self):
         template_import = """try:
@@ -687,10 +890,10 @@ def create_device(device_identifier, uid, ipcon):
                 imports.append(template_import.format(import_name, class_name))
                 classes.append('    {0}.DEVICE_IDENTIFIER: {0},'.format(class_name))
 
-            with open(os.path.join(self.get_bindings_dir(), filename), 'w') as f:
-                f.write(template.format(self.get_header_comment('hash'),
-                                        '\n'.join(imports),
-                                        '\n'.join(classes)))
+            common.write_output_file(os.path.join(self.get_bindings_dir(), filename),
+                                     template.format(self.get_header_comment('hash'),
+                                                     '\n'.join(imports),
+                                                     '\n'.join(classes)))
 
         return common.BindingsGenerator.finish(self)
 
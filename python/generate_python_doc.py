@@ -66,6 +66,12 @@ class PythonDocDevice(python_common.PythonDevice):
             r = packet.get_python_return_desc(high_level=True)
             d = packet.get_python_formatted_doc()
             obj_desc = packet.get_python_object_desc(high_level=True)
+
+            if packet.has_python_array_type():
+                params = common.wrap_non_empty('', params, ', ') + 'array_type=None'
+                pd += ' :param array_type: str or type\n'
+                d += packet.get_python_array_type_desc()
+
             desc = '{0}{1}{2}{3}'.format(pd, r, d, obj_desc)
             func = '{0}{1}.{2}({3})\n{4}\n'.format(func_start,
                                                    cls,
@@ -402,6 +408,20 @@ class PythonDocPacket(python_common.PythonPacket):
 
         return ret.format('(' + ', '.join(ret_list) + ')')
 
+    def get_python_array_type_desc(self):
+        desc = {
+            'en': """
+ If ``array_type`` is ``'numpy'`` or ``array.array`` then ``{0}`` is returned
+ as an array of that type, otherwise as a list.
+""",
+            'de': """
+ Falls ``array_type`` ``'numpy'`` oder ``array.array`` ist, dann wird ``{0}``
+ als Array dieses Typs zurückgegeben, ansonsten als Liste.
+"""
+        }
+
+        return common.select_lang(desc).format(self.get_high_level('stream_out').get_name().under)
+
     def get_python_object_desc(self, high_level=False):
         if len(self.get_elements(direction='out', high_level=high_level)) < 2:
             return ''
@@ -455,8 +475,7 @@ class PythonDocGenerator(python_common.PythonGeneratorTrait, common.DocGenerator
         return python_common.PythonElement
 
     def generate(self, device):
-        with open(device.get_doc_rst_path(), 'w') as f:
-            f.write(device.get_python_doc())
+        common.write_output_file(device.get_doc_rst_path(), device.get_python_doc())
 
 def generate(root_dir, language):
     common.generate(root_dir, language, PythonDocGenerator)
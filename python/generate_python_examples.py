@@ -637,8 +637,7 @@ class PythonExamplesGenerator(python_common.PythonGeneratorTrait, common.Example
             else:
                 print('  - ' + filename)
 
-            with open(filepath, 'w') as f:
-                f.write(example.get_python_source())
+            common.write_output_file(filepath, example.get_python_source())
 
 def generate(root_dir):
     common.generate(root_dir, 'en', PythonExamplesGenerator)
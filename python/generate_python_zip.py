@@ -78,6 +78,9 @@ class PythonZipGenerator(python_common.PythonGeneratorTrait, common.ZipGenerator
             shutil.copy(os.path.join(self.get_bindings_dir(), filename), self.tmp_source_tinkerforge_dir)
 
         shutil.copy(os.path.join(root_dir, 'ip_connection.py'),             self.tmp_source_tinkerforge_dir)
+        shutil.copy(os.path.join(root_dir, 'async_ip_connection.py'),       self.tmp_source_tinkerforge_dir)
+        shutil.copy(os.path.join(root_dir, 'ip_connection_pool.py'),        self.tmp_source_tinkerforge_dir)
+        shutil.copy(os.path.join(root_dir, 'ip_connection_replay.py'),      self.tmp_source_tinkerforge_dir)
         shutil.copy(os.path.join(root_dir, 'changelog.txt'),                self.tmp_dir)
         shutil.copy(os.path.join(root_dir, 'readme.txt'),                   self.tmp_dir)
         shutil.copy(os.path.join(root_dir, '..', 'configs', 'license.txt'), self.tmp_dir)
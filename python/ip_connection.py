@@ -16,6 +16,9 @@ import hmac
 import hashlib
 import errno
 import threading
+import collections
+import array
+import bisect
 
 try:
     import queue # Python 3
@@ -194,111 +197,553 @@ else:
         else:
             return ''.join(create_char_list(value, expected_type='string'))
 
-def pack_payload(data, form):
-    if sys.hexversion < 0x03000000:
-        packed = ''
-    else:
-        packed = b''
+class PayloadCodec(object):
+    # converts between the payload bytes and the values of a space separated
+    # format string like 'H 3B 10s 4!' using a single precompiled struct.Struct
+    # for the whole payload. '!' marks a bool and 'N!' a bool array that is
+    # packed as a bit field
+
+    KIND_VALUE = 0
+    KIND_ARRAY = 1
+    KIND_BOOL_ARRAY = 2
+    KIND_CHAR = 3
+    KIND_CHAR_ARRAY = 4
+    KIND_STRING = 5
+
+    def __init__(self, form):
+        self.form = form
+        self.items = [] # [(kind, count, width), ...]
+        self.item_forms = [] # struct format of each item
+        self.offsets = [] # byte offset of each item in the payload
+        struct_form = ['<']
+
+        for f in form.split(' ') if len(form) > 0 else []:
+            self.offsets.append(struct.calcsize(''.join(struct_form)))
+
+            if '!' in f:
+                if len(f) > 1:
+                    count = int(f.replace('!', ''))
+                    width = int(math.ceil(count / 8.0))
+
+                    self.items.append((PayloadCodec.KIND_BOOL_ARRAY, count, width))
+                    struct_form.append('{0}B'.format(width))
+                else:
+                    self.items.append((PayloadCodec.KIND_VALUE, 1, 1))
+                    struct_form.append('?')
+            elif 'c' in f:
+                if len(f) > 1:
+                    count = int(f.replace('c', ''))
+
+                    self.items.append((PayloadCodec.KIND_CHAR_ARRAY, count, count))
+                else:
+                    self.items.append((PayloadCodec.KIND_CHAR, 1, 1))
+
+                struct_form.append(f)
+            elif 's' in f:
+                self.items.append((PayloadCodec.KIND_STRING, 1, 1))
+                struct_form.append(f)
+            elif len(f) > 1:
+                count = int(f[:-1])
 
-    for f, d in zip(form.split(' '), data):
-        if '!' in f:
-            if len(f) > 1:
-                if int(f.replace('!', '')) != len(d):
+                self.items.append((PayloadCodec.KIND_ARRAY, count, count))
+                struct_form.append(f)
+            else:
+                self.items.append((PayloadCodec.KIND_VALUE, 1, 1))
+                struct_form.append(f)
+
+        self.item_forms = struct_form[1:]
+        self.struct = struct.Struct(''.join(struct_form))
+        self.size = self.struct.size
+        self.simple = all([item[0] == PayloadCodec.KIND_VALUE for item in self.items])
+
+    def pack(self, data):
+        if self.simple:
+            return self.struct.pack(*data)
+
+        values = []
+
+        for (kind, count, width), d in zip(self.items, data):
+            if kind == PayloadCodec.KIND_VALUE:
+                values.append(d)
+            elif kind == PayloadCodec.KIND_ARRAY:
+                if len(d) != count:
+                    raise struct.error('pack expected {0} items for packing (got {1})'.format(count, len(d)))
+
+                values.extend(d)
+            elif kind == PayloadCodec.KIND_BOOL_ARRAY:
+                if len(d) != count:
                     raise ValueError('Incorrect bool list length')
 
-                p = [0] * int(math.ceil(len(d) / 8.0))
+                p = [0] * width
 
                 for i, b in enumerate(d):
                     if b:
                         p[i // 8] |= 1 << (i % 8)
 
-                packed += struct.pack('<{0}B'.format(len(p)), *p)
-            else:
-                packed += struct.pack('<?', d)
-        elif 'c' in f:
-            if sys.hexversion < 0x03000000:
-                if len(f) > 1:
-                    packed += struct.pack('<' + f, *d)
+                values.extend(p)
+            elif kind == PayloadCodec.KIND_CHAR:
+                if sys.hexversion < 0x03000000:
+                    values.append(d)
                 else:
-                    packed += struct.pack('<' + f, d)
-            else:
-                if len(f) > 1:
-                    packed += struct.pack('<' + f, *list(map(lambda char: bytes([ord(char)]), d)))
+                    values.append(bytes([ord(d)]))
+            elif kind == PayloadCodec.KIND_CHAR_ARRAY:
+                if len(d) != count:
+                    raise struct.error('pack expected {0} items for packing (got {1})'.format(count, len(d)))
+
+                if sys.hexversion < 0x03000000:
+                    values.extend(d)
                 else:
-                    packed += struct.pack('<' + f, bytes([ord(d)]))
-        elif 's' in f:
-            if sys.hexversion < 0x03000000:
-                packed += struct.pack('<' + f, d)
+                    values.extend([bytes([ord(char)]) for char in d])
+            else: # KIND_STRING
+                if sys.hexversion < 0x03000000:
+                    values.append(d)
+                else:
+                    values.append(bytes(map(ord, d)))
+
+        return self.struct.pack(*values)
+
+    def unpack(self, data, offset=0):
+        x = self.struct.unpack_from(data, offset)
+
+        if self.simple:
+            if len(x) == 1:
+                return x[0]
             else:
-                packed += struct.pack('<' + f, bytes(map(ord, d)))
-        elif len(f) > 1:
-            packed += struct.pack('<' + f, *d)
+                return list(x)
+
+        ret = []
+        i = 0
+
+        for kind, count, width in self.items:
+            if kind == PayloadCodec.KIND_VALUE:
+                ret.append(x[i])
+            elif kind == PayloadCodec.KIND_ARRAY:
+                if count > 1:
+                    ret.append(x[i:i + count])
+                else:
+                    ret.append(x[i])
+            elif kind == PayloadCodec.KIND_BOOL_ARRAY:
+                y = tuple([x[i + k // 8] & (1 << (k % 8)) != 0 for k in range(count)])
+
+                if count > 1:
+                    ret.append(y)
+                else:
+                    ret.append(y[0])
+            elif kind == PayloadCodec.KIND_CHAR or kind == PayloadCodec.KIND_CHAR_ARRAY:
+                if sys.hexversion < 0x03000000:
+                    y = x[i:i + count]
+                else:
+                    y = tuple([chr(ord(item)) for item in x[i:i + count]])
+
+                if count > 1:
+                    ret.append(y)
+                else:
+                    ret.append(y[0])
+            else: # KIND_STRING
+                if sys.hexversion < 0x03000000:
+                    s = x[i]
+                else:
+                    s = ''.join(map(chr, x[i]))
+
+                k = s.find('\x00')
+
+                if k >= 0:
+                    s = s[:k]
+
+                ret.append(s)
+
+            i += width
+
+        if len(ret) == 1:
+            return ret[0]
         else:
-            packed += struct.pack('<' + f, d)
+            return ret
 
-    return packed
+    def unpack_item(self, data, index, offset=0):
+        # unpacks a single value item without unpacking the whole payload
+        return struct.unpack_from('<' + self.item_forms[index], data, offset + self.offsets[index])[0]
+
+payload_codecs = {} # form -> PayloadCodec
+
+def get_payload_codec(form):
+    # the generated device classes pass precompiled codecs
+    if isinstance(form, PayloadCodec):
+        return form
+
+    try:
+        return payload_codecs[form]
+    except KeyError:
+        codec = PayloadCodec(form)
+        payload_codecs[form] = codec
+
+        return codec
+
+def pack_payload(data, form):
+    return get_payload_codec(form).pack(data)
 
 def unpack_payload(data, form):
-    ret = []
+    return get_payload_codec(form).unpack(data)
 
-    for f in form.split(' '):
-        o = f
+class StreamArray(object):
+    # collects the data of a high-level stream in a preallocated array of
+    # the given array_type ('numpy' or array.array). the chunks are copied
+    # directly from the raw response payloads instead of being unpacked into
+    # tuples and concatenated. roles and fixed_length describe the low-level
+    # response in the same way as for high-level callbacks
 
-        if '!' in f:
-            if len(f) > 1:
-                f = '{0}B'.format(int(math.ceil(int(f.replace('!', '')) / 8.0)))
-            else:
-                f = 'B'
+    def __init__(self, codec, roles, fixed_length, array_type):
+        if array_type != 'numpy' and array_type is not array.array:
+            raise ValueError('Invalid array type {0}'.format(repr(array_type)))
 
-        f = '<' + f
-        length = struct.calcsize(f)
-        x = struct.unpack(f, data[:length])
+        self.codec = codec
+        self.fixed_length = fixed_length
+        self.array_type = array_type
 
-        if '!' in o:
-            y = []
+        if fixed_length == None:
+            self.length_index = roles.index('stream_length')
+        else:
+            self.length_index = None
+
+        self.chunk_offset_index = roles.index('stream_chunk_offset')
+        self.chunk_data_index = roles.index('stream_chunk_data')
+        self.chunk_offset_max = (1 << (8 * struct.calcsize('<' + codec.item_forms[self.chunk_offset_index]))) - 1
+        self.chunk_cardinality = codec.items[self.chunk_data_index][1]
+        self.chunk_start = 8 + codec.offsets[self.chunk_data_index]
+        self.typecode = codec.item_forms[self.chunk_data_index][-1]
+        self.data = None
+        self.length = 0
+        self.chunk_offset = 0
+        self.received = 0
+        self.out_of_sync = False
+        self.last_response = None
+
+    def add_response(self, response):
+        chunk_offset = self.codec.unpack_item(response, self.chunk_offset_index, 8)
+
+        if self.length_index != None:
+            length = self.codec.unpack_item(response, self.length_index, 8)
+        else:
+            length = self.fixed_length
 
-            if len(o) > 1:
-                for i in range(int(o.replace('!', ''))):
-                    y.append(x[i // 8] & (1 << (i % 8)) != 0)
+        if self.data is None: # stream starts
+            if self.length_index == None and chunk_offset == self.chunk_offset_max: # stream has no data
+                length = 0
             else:
-                y.append(x[0] != 0)
+                self.out_of_sync = chunk_offset != 0
 
-            x = tuple(y)
+            self.length = length
+            self.data = self.create_array(length)
+        elif not self.out_of_sync:
+            # the array was allocated for the initial length
+            self.out_of_sync = chunk_offset != self.received or length != self.length
+
+        self.length = length
+        self.chunk_offset = chunk_offset
+        self.last_response = response
+
+        if not self.out_of_sync and self.received < len(self.data):
+            count = min(self.chunk_cardinality, len(self.data) - self.received)
+
+            self.write_chunk(self.received, response, count)
+            self.received += count
+
+    def get_missing_chunk_count(self):
+        if self.out_of_sync or self.received >= self.length:
+            return 0
+
+        return (self.length - self.received - 1) // self.chunk_cardinality + 1
+
+    def has_remaining_chunks(self):
+        return self.chunk_offset + self.chunk_cardinality < self.length
+
+    def get_last_values(self):
+        return self.codec.unpack(self.last_response, 8)
+
+    def create_array(self, length):
+        if self.array_type == 'numpy':
+            import numpy # optional dependency, only needed for this array type
+
+            return numpy.zeros(length, dtype=numpy.dtype('<' + self.typecode))
+
+        return array.array(self.typecode, [0]) * length
+
+    def write_chunk(self, offset, response, count):
+        if self.array_type == 'numpy':
+            import numpy
+
+            chunk = numpy.frombuffer(response, dtype=self.data.dtype, count=count, offset=self.chunk_start)
+        else:
+            chunk = array.array(self.typecode)
+            raw = response[self.chunk_start:self.chunk_start + count * chunk.itemsize]
 
-        if 'c' in f:
-            if sys.hexversion < 0x03000000:
-                if len(x) > 1:
-                    ret.append(x)
-                else:
-                    ret.append(x[0])
-            else:
-                if len(x) > 1:
-                    ret.append(tuple(map(lambda item: chr(ord(item)), x)))
-                else:
-                    ret.append(chr(ord(x[0])))
-        elif 's' in f:
             if sys.hexversion < 0x03000000:
-                s = x[0]
+                chunk.fromstring(raw)
             else:
-                s = ''.join(map(chr, x[0]))
+                chunk.frombytes(raw)
 
-            i = s.find('\x00')
+            if sys.byteorder == 'big':
+                chunk.byteswap()
 
-            if i >= 0:
-                s = s[:i]
+        self.data[offset:offset + count] = chunk
 
-            ret.append(s)
-        elif len(x) > 1:
-            ret.append(x)
+class CallbackStream(object):
+    # reassembles a high-level callback stream from the low-level callback
+    # payloads. the raw chunk bytes are copied into a preallocated buffer that
+    # is reused for the next stream and the data is only decoded once the
+    # stream is complete, instead of unpacking every chunk into a tuple and
+    # concatenating the tuples
+
+    def __init__(self, codec, roles, options):
+        self.codec = codec
+        self.fixed_length = options['fixed_length']
+
+        if self.fixed_length == None:
+            self.length_index = roles.index('stream_length')
         else:
-            ret.append(x[0])
+            self.length_index = None
 
-        data = data[length:]
+        if not options['single_chunk']:
+            self.chunk_offset_index = roles.index('stream_chunk_offset')
+        else:
+            self.chunk_offset_index = None
 
-    if len(ret) == 1:
-        return ret[0]
-    else:
-        return ret
+        chunk_data_index = roles.index('stream_chunk_data')
+
+        self.chunk_kind, self.chunk_cardinality, _ = codec.items[chunk_data_index]
+        self.chunk_start = 8 + codec.offsets[chunk_data_index]
+        self.typecode = codec.item_forms[chunk_data_index][-1]
+
+        if self.chunk_kind == PayloadCodec.KIND_BOOL_ARRAY:
+            self.item_size = None # bit field
+        else:
+            self.item_size = struct.calcsize('<' + self.typecode)
+
+        self.buffer = bytearray()
+        self.length = 0
+        self.received = None # None -> no stream in-progress
+
+    def get_byte_count(self, item_count):
+        if self.item_size == None:
+            return (item_count + 7) // 8
+
+        return item_count * self.item_size
+
+    def add_packet(self, packet):
+        # returns (has_data, data). data is None if the stream got out-of-sync
+        if self.chunk_offset_index != None:
+            chunk_offset = self.codec.unpack_item(packet, self.chunk_offset_index, 8)
+        else:
+            chunk_offset = 0
+
+        if self.length_index != None:
+            length = self.codec.unpack_item(packet, self.length_index, 8)
+        else:
+            length = self.fixed_length
+
+        if self.received == None: # no stream in-progress
+            if chunk_offset != 0: # ignore tail of current stream, wait for next stream start
+                return False, None
+
+            self.received = 0 # stream starts
+        elif chunk_offset != self.received: # stream out-of-sync
+            self.received = None
+
+            return True, None
+
+        self.length = length
+
+        if len(self.buffer) < self.get_byte_count(length):
+            self.buffer.extend(bytearray(self.get_byte_count(length) - len(self.buffer)))
+
+        self.write_chunk(packet, min(self.chunk_cardinality, length - self.received))
+        self.received += self.chunk_cardinality
+
+        if self.received < length:
+            return False, None
+
+        self.received = None # stream complete
+
+        return True, self.decode()
+
+    def write_chunk(self, packet, count):
+        if count <= 0:
+            return
+
+        if self.item_size == None and self.received % 8 != 0:
+            # the chunk doesn't start at a byte boundary of the bit field
+            chunk = bytearray(packet[self.chunk_start:self.chunk_start + self.get_byte_count(count)])
+
+            for k in range(count):
+                i = self.received + k
+
+                if chunk[k // 8] & (1 << (k % 8)) != 0:
+                    self.buffer[i // 8] |= 1 << (i % 8)
+                else:
+                    self.buffer[i // 8] &= ~(1 << (i % 8)) & 0xFF
+
+            return
+
+        start = self.get_byte_count(self.received)
+        size = self.get_byte_count(count)
+
+        self.buffer[start:start + size] = packet[self.chunk_start:self.chunk_start + size]
+
+    def decode(self):
+        if self.chunk_kind == PayloadCodec.KIND_BOOL_ARRAY:
+            return tuple([self.buffer[k // 8] & (1 << (k % 8)) != 0 for k in range(self.length)])
+        elif self.chunk_kind == PayloadCodec.KIND_CHAR_ARRAY:
+            return tuple(map(chr, self.buffer[:self.length]))
+
+        return struct.unpack_from('<{0}{1}'.format(self.length, self.typecode), self.buffer)
+
+class Statistics(object):
+    # request and callback statistics of an IP Connection. the IP Connection
+    # only calls into this if statistics are enabled
+
+    RTT_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0) # upper bounds in seconds
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        # NOTE: assumes that lock is locked or not used yet
+        self.start_time = time.time()
+        self.packets_sent = 0
+        self.bytes_sent = 0
+        self.packets_received = 0
+        self.bytes_received = 0
+        self.requests = {} # (uid, function_id) -> [count, timeouts, rtt_sum, rtt_max, rtt_histogram]
+        self.callbacks = {} # (uid, function_id) -> count
+
+    def get_request_entry(self, uid, function_id):
+        # NOTE: assumes that lock is locked
+        try:
+            return self.requests[(uid, function_id)]
+        except KeyError:
+            entry = [0, 0, 0.0, 0.0, [0] * (len(Statistics.RTT_BUCKETS) + 1)]
+            self.requests[(uid, function_id)] = entry
+
+            return entry
+
+    def add_sent(self, packet):
+        with self.lock:
+            self.packets_sent += 1
+            self.bytes_sent += len(packet)
+
+    def add_received(self, packet):
+        uid, _, function_id, sequence_number_and_options = struct.unpack_from('<IBBB', packet, 0)
+
+        with self.lock:
+            self.packets_received += 1
+            self.bytes_received += len(packet)
+
+            if sequence_number_and_options >> 4 == 0:
+                self.callbacks[(uid, function_id)] = self.callbacks.get((uid, function_id), 0) + 1
+
+    def add_request(self, uid, function_id, rtt):
+        with self.lock:
+            entry = self.get_request_entry(uid, function_id)
+            entry[0] += 1
+            entry[2] += rtt
+            entry[3] = max(entry[3], rtt)
+            entry[4][bisect.bisect_left(Statistics.RTT_BUCKETS, rtt)] += 1
+
+    def add_timeout(self, uid, function_id):
+        with self.lock:
+            entry = self.get_request_entry(uid, function_id)
+            entry[0] += 1
+            entry[1] += 1
+
+    def get_snapshot(self, callback_queue_depth, reset):
+        with self.lock:
+            now = time.time()
+            duration = now - self.start_time
+            requests = {}
+            callbacks = {}
+            devices = {}
+
+            def get_device(uid):
+                try:
+                    return devices[uid]
+                except KeyError:
+                    device = {'requests': 0, 'timeouts': 0, 'callbacks': 0, 'callback_rate': 0.0}
+                    devices[uid] = device
+
+                    return device
+
+            for (uid, function_id), (count, timeouts, rtt_sum, rtt_max, rtt_histogram) in self.requests.items():
+                uid = base58encode(uid)
+                requests[(uid, function_id)] = {'count': count,
+                                                'timeouts': timeouts,
+                                                'rtt_sum': rtt_sum,
+                                                'rtt_max': rtt_max,
+                                                'rtt_histogram': list(rtt_histogram)}
+
+                device = get_device(uid)
+                device['requests'] += count
+                device['timeouts'] += timeouts
+
+            for (uid, function_id), count in self.callbacks.items():
+                uid = base58encode(uid)
+
+                if duration > 0:
+                    rate = count / duration
+                else:
+                    rate = 0.0
+
+                callbacks[(uid, function_id)] = {'count': count, 'rate': rate}
+
+                device = get_device(uid)
+                device['callbacks'] += count
+                device['callback_rate'] += rate
+
+            snapshot = {'time': now,
+                        'duration': duration,
+                        'packets_sent': self.packets_sent,
+                        'bytes_sent': self.bytes_sent,
+                        'packets_received': self.packets_received,
+                        'bytes_received': self.bytes_received,
+                        'callback_queue_depth': callback_queue_depth,
+                        'rtt_buckets': Statistics.RTT_BUCKETS,
+                        'requests': requests,
+                        'callbacks': callbacks,
+                        'devices': devices}
+
+            if reset:
+                self.reset()
+
+        return snapshot
+
+class PacketCapture(object):
+    # writes packets with their time to a binary capture file. the file
+    # starts with MAGIC, followed by one record per packet: the time as
+    # little endian double, the direction as byte and the packet itself,
+    # which contains its own length
+
+    MAGIC = b'TFPCAP\x00\x01'
+    DIRECTION_RECEIVED = 0
+    DIRECTION_SENT = 1
+
+    record_header = struct.Struct('<dB')
+
+    def __init__(self, filename):
+        self.lock = threading.Lock()
+        self.file = open(filename, 'wb') # protected by lock
+
+        self.file.write(PacketCapture.MAGIC)
+
+    def write(self, direction, packet):
+        with self.lock:
+            if self.file is not None:
+                self.file.write(PacketCapture.record_header.pack(time.time(), direction))
+                self.file.write(packet)
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
 
 class Error(Exception):
     TIMEOUT = -1
@@ -329,6 +774,22 @@ class Error(Exception):
             self.__cause__ = None
             self.__suppress_context__ = True
 
+def check_error_code(response, function_id):
+    error_code = get_error_code_from_data(response)
+
+    if error_code == 0:
+        # no error
+        pass
+    elif error_code == 1:
+        msg = 'Got invalid parameter for function {0}'.format(function_id)
+        raise Error(Error.INVALID_PARAMETER, msg)
+    elif error_code == 2:
+        msg = 'Function {0} is not supported'.format(function_id)
+        raise Error(Error.NOT_SUPPORTED, msg)
+    else:
+        msg = 'Function {0} returned an unknown error'.format(function_id)
+        raise Error(Error.UNKNOWN_ERROR_CODE, msg)
+
 class Device(object):
     RESPONSE_EXPECTED_INVALID_FUNCTION_ID = 0
     RESPONSE_EXPECTED_ALWAYS_TRUE = 1 # getter
@@ -456,6 +917,34 @@ class Device(object):
             if self.response_expected[i] in [Device.RESPONSE_EXPECTED_TRUE, Device.RESPONSE_EXPECTED_FALSE]:
                 self.response_expected[i] = flag
 
+    def call_many(self, calls):
+        """
+        Calls the given functions of this device and returns their results
+        as a list. Each call is a tuple of a function of this device and its
+        arguments. With pipelining enabled on the IP Connection the calls are
+        executed concurrently, see IPConnection.call_many.
+        """
+
+        return self.ipcon.call_many(calls)
+
+    def read_stream_array(self, function_id, data, form, form_ret, roles, fixed_length, stream_name, array_type):
+        # NOTE: assumes that stream_lock is locked
+        stream = StreamArray(get_payload_codec(form_ret), roles, fixed_length, array_type)
+
+        stream.add_response(self.ipcon.send_requests(self, function_id, [data], form, form_ret, True)[0])
+
+        # the remaining chunks are read with multiple requests in flight
+        for response in self.ipcon.send_requests(self, function_id, [data] * stream.get_missing_chunk_count(), form, form_ret, True):
+            stream.add_response(response)
+
+        if stream.out_of_sync: # discard remaining stream to bring it back in-sync
+            while stream.has_remaining_chunks():
+                stream.add_response(self.ipcon.send_requests(self, function_id, [data], form, form_ret, True)[0])
+
+            raise Error(Error.STREAM_OUT_OF_SYNC, '{0} stream is out-of-sync'.format(stream_name))
+
+        return stream.data, stream.get_last_values()
+
 class BrickDaemon(Device):
     FUNCTION_GET_AUTHENTICATION_NONCE = 1
     FUNCTION_AUTHENTICATE = 2
@@ -517,10 +1006,97 @@ class IPConnection(object):
 
     DISCONNECT_PROBE_INTERVAL = 5
 
+    PIPELINE_DEPTH = 15 # sequence numbers 1 to 15
+
+    # overflow_policy parameter to set_callback_queue_limit
+    OVERFLOW_POLICY_DROP_OLDEST = 0
+    OVERFLOW_POLICY_DROP_NEWEST = 1
+    OVERFLOW_POLICY_COALESCE = 2
+
+    class CallbackQueue(object):
+        # queue for the callback threads with an optional limit for the
+        # number of queued packets. meta and exit items are never dropped.
+        # packets with a coalesce key can replace an already queued packet
+        # with the same key if the queue is full
+
+        RESULT_QUEUED = 0
+        RESULT_DROPPED = 1
+        RESULT_COALESCED = 2
+
+        def __init__(self, limit, overflow_policy):
+            self.limit = limit # protected by condition
+            self.overflow_policy = overflow_policy # protected by condition
+            self.items = collections.deque() # [kind, data, coalesce_key], protected by condition
+            self.packet_count = 0 # protected by condition
+            self.coalesce_items = {} # coalesce_key -> newest queued item, protected by condition
+            self.condition = threading.Condition()
+
+        def qsize(self):
+            with self.condition:
+                return len(self.items)
+
+        def put(self, item, coalesce_key=None):
+            kind, data = item
+            result = IPConnection.CallbackQueue.RESULT_QUEUED
+
+            with self.condition:
+                if kind == IPConnection.QUEUE_PACKET and self.limit > 0 and self.packet_count >= self.limit:
+                    if self.overflow_policy == IPConnection.OVERFLOW_POLICY_DROP_NEWEST:
+                        return IPConnection.CallbackQueue.RESULT_DROPPED
+
+                    if self.overflow_policy == IPConnection.OVERFLOW_POLICY_COALESCE and \
+                       coalesce_key in self.coalesce_items:
+                        self.coalesce_items[coalesce_key][1] = data
+
+                        return IPConnection.CallbackQueue.RESULT_COALESCED
+
+                    # drop the oldest packet, also if nothing can be coalesced
+                    for i, queued_item in enumerate(self.items):
+                        if queued_item[0] == IPConnection.QUEUE_PACKET:
+                            del self.items[i]
+                            self.remove_packet(queued_item)
+                            break
+
+                    result = IPConnection.CallbackQueue.RESULT_DROPPED
+
+                queued_item = [kind, data, coalesce_key]
+
+                self.items.append(queued_item)
+
+                if kind == IPConnection.QUEUE_PACKET:
+                    self.packet_count += 1
+
+                    if coalesce_key != None:
+                        self.coalesce_items[coalesce_key] = queued_item
+
+                self.condition.notify()
+
+            return result
+
+        def get(self):
+            with self.condition:
+                while len(self.items) == 0:
+                    self.condition.wait()
+
+                queued_item = self.items.popleft()
+
+                if queued_item[0] == IPConnection.QUEUE_PACKET:
+                    self.remove_packet(queued_item)
+
+            return queued_item[0], queued_item[1]
+
+        def remove_packet(self, queued_item):
+            # NOTE: assumes that condition is locked
+            self.packet_count -= 1
+
+            if queued_item[2] != None and self.coalesce_items.get(queued_item[2]) is queued_item:
+                del self.coalesce_items[queued_item[2]]
+
     class CallbackContext(object):
         def __init__(self):
             self.queue = None
             self.thread = None
+            self.workers = [] # [(queue, thread), ...] for device callbacks
             self.packet_dispatch_allowed = False
             self.lock = None
 
@@ -551,10 +1127,26 @@ class IPConnection(object):
         self.receive_flag = False
         self.receive_thread = None
         self.callback = None
+        self.callback_threads = 1
+        self.callback_queue_limit = 0
+        self.callback_queue_overflow_policy = IPConnection.OVERFLOW_POLICY_DROP_OLDEST
+        self.callback_dropped_count = 0 # only written by the receive thread
+        self.callback_coalesced_count = 0 # only written by the receive thread
         self.disconnect_probe_flag = False
         self.disconnect_probe_queue = None
         self.disconnect_probe_thread = None
         self.waiter = threading.Semaphore()
+        self.pipelining = False
+        self.pipeline_slots = threading.Semaphore(IPConnection.PIPELINE_DEPTH)
+        self.pipeline_local = threading.local()
+        self.pending_requests = {} # protected by pending_requests_lock
+        self.pending_requests_lock = threading.Lock()
+        self.pipeline_queue = None # protected by pipeline_lock
+        self.pipeline_threads = [] # protected by pipeline_lock
+        self.pipeline_lock = threading.Lock()
+        self.statistics = None
+        self.capture = None
+        self.statistics_export_stop = None # threading.Event of the export thread
         self.brickd = BrickDaemon('2', self)
 
     def connect(self, host, port):
@@ -607,10 +1199,26 @@ class IPConnection(object):
         callback.queue.put((IPConnection.QUEUE_META,
                             (IPConnection.CALLBACK_DISCONNECTED,
                              IPConnection.DISCONNECT_REASON_REQUEST, None)))
-        callback.queue.put((IPConnection.QUEUE_EXIT, None))
 
-        if threading.current_thread() is not callback.thread:
-            callback.thread.join()
+        self.end_callback_threads(callback)
+
+        # end pipeline threads, join them outside of pipeline_lock like the
+        # callback threads
+        with self.pipeline_lock:
+            pipeline_threads = self.pipeline_threads
+
+            if self.pipeline_queue is not None:
+                for _ in pipeline_threads:
+                    self.pipeline_queue.put(None)
+
+                self.pipeline_queue = None
+                self.pipeline_threads = []
+
+        # a call in a pipeline thread can disconnect but cannot wait for its
+        # own thread
+        for thread in pipeline_threads:
+            if threading.current_thread() is not thread:
+                thread.join()
 
     def authenticate(self, secret):
         """
@@ -716,6 +1324,247 @@ class IPConnection(object):
 
         return self.timeout
 
+    def set_pipelining(self, pipelining):
+        """
+        Enables or disables pipelining. By default a device can only have one
+        request in flight and each request waits for the response of the
+        previous one. With pipelining enabled up to 15 requests can be in
+        flight per IP Connection at the same time, also for the same device.
+        Responses are matched to their requests by UID, function ID and
+        sequence number.
+
+        Requests are only sent concurrently if they are issued from multiple
+        threads, by call_many or by the high-level stream functions, which
+        send the requests for their chunks without waiting for each response.
+
+        Default value is *False*.
+        """
+
+        self.pipelining = bool(pipelining)
+
+    def get_pipelining(self):
+        """
+        Returns *true* if pipelining is enabled, *false* otherwise.
+        """
+
+        return self.pipelining
+
+    def set_callback_threads(self, callback_threads):
+        """
+        Sets the number of threads that dispatch the device callbacks. By
+        default all callbacks are dispatched one after another by a single
+        thread, so a slow callback function delays the callbacks of all other
+        devices. With more than one thread the callbacks are distributed by
+        device UID, callbacks of different devices can be dispatched
+        concurrently and the callbacks of each device are still dispatched in
+        order. The enumerate, connected and disconnected callbacks are always
+        dispatched by a single thread.
+
+        The change takes effect with the next call of connect after a
+        disconnect.
+
+        Default value is 1.
+        """
+
+        callback_threads = int(callback_threads)
+
+        if callback_threads < 1:
+            raise ValueError('Callback thread count has to be at least 1')
+
+        self.callback_threads = callback_threads
+
+    def get_callback_threads(self):
+        """
+        Returns the number of callback threads as set by set_callback_threads.
+        """
+
+        return self.callback_threads
+
+    def get_callback_queue_depth(self):
+        """
+        Returns the number of received callbacks that are not dispatched yet.
+        A steadily growing value means that the callback functions cannot keep
+        up with the callback periods.
+        """
+
+        callback = self.callback
+
+        if callback is None:
+            return 0
+
+        return callback.queue.qsize() + sum([worker_queue.qsize() for worker_queue, _ in callback.workers])
+
+    def set_callback_queue_limit(self, limit, overflow_policy=OVERFLOW_POLICY_DROP_OLDEST):
+        """
+        Limits the number of received callbacks that can be queued for
+        dispatching, per callback thread. If the callback functions cannot
+        keep up with the callback periods then the queue grows without a
+        limit by default, using more and more memory and delaying the
+        callbacks more and more.
+
+        If the limit is reached then the *overflow_policy* decides which
+        callback is lost:
+
+        - OVERFLOW_POLICY_DROP_OLDEST: The oldest queued callback is dropped.
+        - OVERFLOW_POLICY_DROP_NEWEST: The newly received callback is dropped.
+        - OVERFLOW_POLICY_COALESCE: The newly received callback replaces the
+          value of a queued callback with the same callback ID from the same
+          device. If there is no such callback then the oldest queued callback
+          is dropped. Parts of high-level callbacks are never coalesced.
+
+        Dropped high-level callback parts result in an out-of-sync high-level
+        callback. A limit of 0 disables the limit.
+
+        Default value is 0.
+        """
+
+        limit = int(limit)
+
+        if limit < 0:
+            raise ValueError('Callback queue limit cannot be negative')
+
+        if overflow_policy not in [IPConnection.OVERFLOW_POLICY_DROP_OLDEST,
+                                   IPConnection.OVERFLOW_POLICY_DROP_NEWEST,
+                                   IPConnection.OVERFLOW_POLICY_COALESCE]:
+            raise ValueError('Invalid overflow policy {0}'.format(overflow_policy))
+
+        self.callback_queue_limit = limit
+        self.callback_queue_overflow_policy = overflow_policy
+
+        callback = self.callback
+
+        if callback is not None:
+            for callback_queue in [callback.queue] + [worker_queue for worker_queue, _ in callback.workers]:
+                with callback_queue.condition:
+                    callback_queue.limit = limit
+                    callback_queue.overflow_policy = overflow_policy
+
+    def get_callback_queue_limit(self):
+        """
+        Returns the callback queue limit and overflow policy as set by
+        set_callback_queue_limit.
+        """
+
+        return self.callback_queue_limit, self.callback_queue_overflow_policy
+
+    def get_callback_overflow_counts(self):
+        """
+        Returns the number of dropped and the number of coalesced callbacks
+        since the IP Connection was created.
+        """
+
+        return self.callback_dropped_count, self.callback_coalesced_count
+
+    def set_statistics_enabled(self, enabled):
+        """
+        Enables or disables the collection of statistics about the requests,
+        callbacks and the traffic of this IP Connection, see get_statistics.
+        Enabling resets the statistics.
+
+        Default value is *False*.
+        """
+
+        if not enabled:
+            self.statistics = None
+        elif self.statistics is None:
+            self.statistics = Statistics()
+
+    def get_statistics_enabled(self):
+        """
+        Returns *true* if statistics are enabled, *false* otherwise.
+        """
+
+        return self.statistics is not None
+
+    def get_statistics(self, reset=False):
+        """
+        Returns a snapshot of the statistics as a dict, or *None* if
+        statistics are disabled. If *reset* is *true* then the statistics are
+        reset after taking the snapshot. The snapshot contains the following
+        keys:
+
+        - time: Time of the snapshot as returned by time.time().
+        - duration: Seconds since the statistics were enabled or reset.
+        - packets_sent, bytes_sent, packets_received, bytes_received: Traffic
+          without the disconnect probes.
+        - callback_queue_depth: See get_callback_queue_depth.
+        - rtt_buckets: Upper bounds in seconds of the round-trip time
+          histogram buckets. The histograms have one more bucket for all
+          longer round-trip times.
+        - requests: Dict from (UID, function ID) to a dict with the number of
+          requests that expected a response (count), the number of timeouts
+          (timeouts), the sum and the maximum of the round-trip times in
+          seconds (rtt_sum, rtt_max) and the round-trip time histogram
+          (rtt_histogram).
+        - callbacks: Dict from (UID, callback function ID) to a dict with the
+          number of received callbacks (count) and their rate per second
+          (rate).
+        - devices: Dict from UID to a dict with the requests, timeouts and
+          callbacks counts and the callback_rate of the device.
+        """
+
+        statistics = self.statistics
+
+        if statistics is None:
+            return None
+
+        return statistics.get_snapshot(self.get_callback_queue_depth(), reset)
+
+    def set_statistics_export(self, function, interval=10.0):
+        """
+        Sets a *function* that is called with a statistics snapshot (see
+        get_statistics) every *interval* seconds while statistics are enabled,
+        for example to export the statistics to a metrics system. The function
+        is called from a thread of its own. The statistics are reset after
+        each export, so each snapshot covers one interval.
+
+        Set the function to *None* to stop the export.
+        """
+
+        interval = float(interval)
+
+        if interval <= 0:
+            raise ValueError('Statistics export interval has to be positive')
+
+        if self.statistics_export_stop is not None:
+            self.statistics_export_stop.set()
+            self.statistics_export_stop = None
+
+        if function is not None:
+            self.statistics_export_stop = threading.Event()
+
+            thread = threading.Thread(name='Statistics-Exporter',
+                                      target=self.statistics_export_loop,
+                                      args=(self.statistics_export_stop, function, interval))
+            thread.daemon = True
+            thread.start()
+
+    def start_capture(self, filename):
+        """
+        Starts writing all packets that are sent and received by this IP
+        Connection, except for the disconnect probes, with their time to the
+        capture file *filename*. An already running capture is stopped. The
+        capture can be replayed with ReplayIPConnection from the
+        ip_connection_replay module.
+        """
+
+        capture = PacketCapture(filename)
+
+        self.stop_capture()
+
+        self.capture = capture
+
+    def stop_capture(self):
+        """
+        Stops writing the capture file started by start_capture.
+        """
+
+        capture = self.capture
+        self.capture = None
+
+        if capture is not None:
+            capture.close()
+
     def enumerate(self):
         """
         Broadcasts an enumerate request. All devices will respond with an
@@ -757,6 +1606,63 @@ class IPConnection(object):
         else:
             self.registered_callbacks[callback_id] = function
 
+    def call_many(self, calls):
+        """
+        Calls the given device functions and returns their results as a list
+        in the same order. Each call is a tuple of a device function and its
+        arguments, for example::
+
+            ipcon.call_many([(temperature.get_temperature,),
+                             (lcd.write_line, 0, 0, 'Hello')])
+
+        If pipelining is enabled then the calls are executed concurrently
+        with up to 15 requests in flight, otherwise they are executed one
+        after another. If calls fail then the exception of the first failed
+        call is raised after all calls are done.
+        """
+
+        results = [None] * len(calls)
+        errors = [None] * len(calls)
+
+        if not self.pipelining:
+            for index, call in enumerate(calls):
+                try:
+                    results[index] = call[0](*call[1:])
+                except Exception:
+                    errors[index] = sys.exc_info()[1]
+        else:
+            self.call_many_pipelined(calls, results, errors)
+
+        for error in errors:
+            if error is not None:
+                raise error
+
+        return results
+
+    def call_many_pipelined(self, calls, results, errors):
+        results_queue = queue.Queue()
+
+        with self.pipeline_lock:
+            if self.pipeline_queue is None:
+                self.pipeline_queue = queue.Queue()
+
+            while len(self.pipeline_threads) < min(len(calls), IPConnection.PIPELINE_DEPTH):
+                thread = threading.Thread(name='Pipeline-Processor',
+                                          target=self.pipeline_loop,
+                                          args=(self.pipeline_queue,))
+                thread.daemon = True
+                thread.start()
+
+                self.pipeline_threads.append(thread)
+
+            for index, call in enumerate(calls):
+                self.pipeline_queue.put((results_queue, index, call))
+
+        for _ in calls:
+            index, result, error = results_queue.get()
+            results[index] = result
+            errors[index] = error
+
     def connect_unlocked(self, is_auto_reconnect):
         # NOTE: assumes that socket is None and socket_lock is locked
 
@@ -764,35 +1670,36 @@ class IPConnection(object):
         if self.callback is None:
             try:
                 self.callback = IPConnection.CallbackContext()
-                self.callback.queue = queue.Queue()
+                self.callback.queue = IPConnection.CallbackQueue(self.callback_queue_limit,
+                                                                 self.callback_queue_overflow_policy)
                 self.callback.packet_dispatch_allowed = False
                 self.callback.lock = threading.Lock()
                 self.callback.thread = threading.Thread(name='Callback-Processor',
                                                         target=self.callback_loop,
-                                                        args=(self.callback,))
+                                                        args=(self.callback, self.callback.queue))
                 self.callback.thread.daemon = True
                 self.callback.thread.start()
+
+                # device callbacks are dispatched by worker threads selected
+                # by UID, so the callbacks of each device stay in order
+                if self.callback_threads > 1:
+                    for _ in range(self.callback_threads):
+                        worker_queue = IPConnection.CallbackQueue(self.callback_queue_limit,
+                                                                  self.callback_queue_overflow_policy)
+                        worker_thread = threading.Thread(name='Callback-Worker',
+                                                         target=self.callback_loop,
+                                                         args=(self.callback, worker_queue))
+                        worker_thread.daemon = True
+                        worker_thread.start()
+
+                        self.callback.workers.append((worker_queue, worker_thread))
             except:
                 self.callback = None
                 raise
 
         # create and connect socket
         try:
-            tmp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            tmp.settimeout(5)
-            tmp.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
-            tmp.connect((self.host, self.port))
-
-            if sys.platform == 'win32':
-                # for some unknown reason the socket recv() call does not
-                # immediate return on Windows if the socket gets shut down on
-                # disconnect. the socket recv() call will still block for
-                # several seconds before it returns. this in turn blocks the
-                # disconnect. to workaround this use a 100ms timeout for
-                # blocking socket operations.
-                tmp.settimeout(0.1)
-            else:
-                tmp.settimeout(None)
+            tmp = self.create_socket()
         except Exception as e:
             def cleanup1():
                 if self.auto_reconnect_internal:
@@ -812,10 +1719,7 @@ class IPConnection(object):
                 else:
                     # end callback thread
                     if not is_auto_reconnect:
-                        self.callback.queue.put((IPConnection.QUEUE_EXIT, None))
-
-                        if threading.current_thread() is not self.callback.thread:
-                            self.callback.thread.join()
+                        self.end_callback_threads(self.callback)
 
                         self.callback = None
 
@@ -844,10 +1748,7 @@ class IPConnection(object):
 
                 # end callback thread
                 if not is_auto_reconnect:
-                    self.callback.queue.put((IPConnection.QUEUE_EXIT, None))
-
-                    if threading.current_thread() is not self.callback.thread:
-                        self.callback.thread.join()
+                    self.end_callback_threads(self.callback)
 
                     self.callback = None
 
@@ -873,10 +1774,7 @@ class IPConnection(object):
 
                 # end callback thread
                 if not is_auto_reconnect:
-                    self.callback.queue.put((IPConnection.QUEUE_EXIT, None))
-
-                    if threading.current_thread() is not self.callback.thread:
-                        self.callback.thread.join()
+                    self.end_callback_threads(self.callback)
 
                     self.callback = None
 
@@ -895,6 +1793,25 @@ class IPConnection(object):
                                  (IPConnection.CALLBACK_CONNECTED,
                                   connect_reason, None)))
 
+    def create_socket(self):
+        tmp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        tmp.settimeout(5)
+        tmp.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        tmp.connect((self.host, self.port))
+
+        if sys.platform == 'win32':
+            # for some unknown reason the socket recv() call does not
+            # immediate return on Windows if the socket gets shut down on
+            # disconnect. the socket recv() call will still block for
+            # several seconds before it returns. this in turn blocks the
+            # disconnect. to workaround this use a 100ms timeout for
+            # blocking socket operations.
+            tmp.settimeout(0.1)
+        else:
+            tmp.settimeout(None)
+
+        return tmp
+
     def disconnect_unlocked(self):
         # NOTE: assumes that socket is not None and socket_lock is locked
 
@@ -936,14 +1853,24 @@ class IPConnection(object):
         self.connect_failure_callback = connect_failure_callback
 
     def receive_loop(self, socket_id):
-        if sys.hexversion < 0x03000000:
-            pending_data = ''
-        else:
-            pending_data = bytes()
+        # packets are framed in place in a preallocated buffer. data is
+        # received directly into the free space at the end of the buffer and
+        # the start of the pending data is tracked by an offset, so only
+        # complete packets are copied. the buffer is only compacted if the
+        # free space at the end is used up, that moves less than one packet
+        buffer = bytearray(65536)
+        view = memoryview(buffer)
+        start = 0
+        end = 0
 
         while self.receive_flag:
+            if end == len(buffer):
+                buffer[0:end - start] = buffer[start:end]
+                end -= start
+                start = 0
+
             try:
-                data = self.socket.recv(8192)
+                received = self.socket.recv_into(view[end:])
             except socket.timeout:
                 continue
             except socket.error:
@@ -955,29 +1882,33 @@ class IPConnection(object):
                     self.handle_disconnect_by_peer(IPConnection.DISCONNECT_REASON_ERROR, socket_id, False)
                 break
 
-            if len(data) == 0:
+            if received == 0:
                 if self.receive_flag:
                     self.handle_disconnect_by_peer(IPConnection.DISCONNECT_REASON_SHUTDOWN, socket_id, False)
                 break
 
-            pending_data += data
+            end += received
 
             while self.receive_flag:
-                if len(pending_data) < 8:
+                if end - start < 8:
                     # Wait for complete header
                     break
 
-                length = get_length_from_data(pending_data)
+                length = buffer[start + 4]
 
-                if len(pending_data) < length:
+                if end - start < length:
                     # Wait for complete packet
                     break
 
-                packet = pending_data[0:length]
-                pending_data = pending_data[length:]
+                packet = view[start:start + length].tobytes()
+                start += length
 
                 self.handle_response(packet)
 
+            if start == end:
+                start = 0
+                end = 0
+
     def dispatch_meta(self, function_id, parameter, socket_id):
         if function_id == IPConnection.CALLBACK_CONNECTED:
             if IPConnection.CALLBACK_CONNECTED in self.registered_callbacks:
@@ -1053,51 +1984,18 @@ class IPConnection(object):
         device = self.devices[uid]
 
         if -function_id in device.high_level_callbacks:
-            hlcb = device.high_level_callbacks[-function_id] # [roles, options, data]
-            form = device.callback_formats[function_id] # FIXME: currently assuming that form is longer than 1
-            llvalues = unpack_payload(payload, form)
-            has_data = False
-            data = None
-
-            if hlcb[1]['fixed_length'] != None:
-                length = hlcb[1]['fixed_length']
-            else:
-                length = llvalues[hlcb[0].index('stream_length')]
+            hlcb = device.high_level_callbacks[-function_id] # [roles, options, stream]
 
-            if not hlcb[1]['single_chunk']:
-                chunk_offset = llvalues[hlcb[0].index('stream_chunk_offset')]
-            else:
-                chunk_offset = 0
-
-            chunk_data = llvalues[hlcb[0].index('stream_chunk_data')]
-
-            if hlcb[2] == None: # no stream in-progress
-                if chunk_offset == 0: # stream starts
-                    hlcb[2] = chunk_data
-
-                    if len(hlcb[2]) >= length: # stream complete
-                        has_data = True
-                        data = hlcb[2][:length]
-                        hlcb[2] = None
-                else: # ignore tail of current stream, wait for next stream start
-                    pass
-            else: # stream in-progress
-                if chunk_offset != len(hlcb[2]): # stream out-of-sync
-                    has_data = True
-                    data = None
-                    hlcb[2] = None
-                else: # stream in-sync
-                    hlcb[2] += chunk_data
-
-                    if len(hlcb[2]) >= length: # stream complete
-                        has_data = True
-                        data = hlcb[2][:length]
-                        hlcb[2] = None
+            if hlcb[2] == None:
+                codec = get_payload_codec(device.callback_formats[function_id]) # FIXME: currently assuming that form is longer than 1
+                hlcb[2] = CallbackStream(codec, hlcb[0], hlcb[1])
+
+            has_data, data = hlcb[2].add_packet(packet)
 
             if has_data and -function_id in device.registered_callbacks:
                 result = []
 
-                for role, llvalue in zip(hlcb[0], llvalues):
+                for role, llvalue in zip(hlcb[0], hlcb[2].codec.unpack(packet, 8)):
                     if role == 'stream_chunk_data':
                         result.append(data)
                     elif role == None:
@@ -1107,18 +2005,29 @@ class IPConnection(object):
 
         if function_id in device.registered_callbacks:
             cb = device.registered_callbacks[function_id]
-            form = device.callback_formats[function_id]
+            codec = get_payload_codec(device.callback_formats[function_id])
 
-            if len(form) == 0:
+            if len(codec.items) == 0:
                 cb()
-            elif len(form.split(' ')) == 1:
-                cb(unpack_payload(payload, form))
+            elif len(codec.items) == 1:
+                cb(codec.unpack(packet, 8))
             else:
-                cb(*unpack_payload(payload, form))
+                cb(*codec.unpack(packet, 8))
+
+    def end_callback_threads(self, callback):
+        callback.queue.put((IPConnection.QUEUE_EXIT, None))
+
+        for worker_queue, _ in callback.workers:
+            worker_queue.put((IPConnection.QUEUE_EXIT, None))
+
+        # a callback function can end its own thread but cannot wait for it
+        for thread in [callback.thread] + [worker_thread for _, worker_thread in callback.workers]:
+            if threading.current_thread() is not thread:
+                thread.join()
 
-    def callback_loop(self, callback):
+    def callback_loop(self, callback, callback_queue):
         while True:
-            kind, data = callback.queue.get()
+            kind, data = callback_queue.get()
 
             # FIXME: cannot hold callback lock here because this can
             #        deadlock due to an ordering problem with the socket lock
@@ -1133,6 +2042,27 @@ class IPConnection(object):
                     if callback.packet_dispatch_allowed:
                         self.dispatch_packet(data)
 
+    def statistics_export_loop(self, stop, function, interval):
+        while not stop.wait(interval):
+            snapshot = self.get_statistics(True)
+
+            if snapshot is not None:
+                function(snapshot)
+
+    def pipeline_loop(self, pipeline_queue):
+        while True:
+            item = pipeline_queue.get()
+
+            if item is None:
+                break
+
+            results_queue, index, call = item
+
+            try:
+                results_queue.put((index, call[0](*call[1:]), None))
+            except Exception:
+                results_queue.put((index, None, sys.exc_info()[1]))
+
     # NOTE: the disconnect probe thread is not allowed to hold the socket_lock at any
     #       time because it is created and joined while the socket_lock is locked
     def disconnect_probe_loop(self, disconnect_probe_queue):
@@ -1180,68 +2110,222 @@ class IPConnection(object):
 
             self.disconnect_probe_flag = False
 
-    def send_request(self, device, function_id, data, form, form_ret):
-        patched_from = []
+            statistics = self.statistics
 
-        for f in form.split(' '):
-            if '!' in f:
-                if len(f) > 1:
-                    patched_from.append('{0}B'.format(int(math.ceil(int(f.replace('!', '')) / 8.0))))
-                else:
-                    patched_from.append('?')
-            else:
-                patched_from.append(f)
+            if statistics is not None:
+                statistics.add_sent(packet)
+
+            capture = self.capture
+
+            if capture is not None:
+                capture.write(PacketCapture.DIRECTION_SENT, packet)
 
-        patched_from = '<' + ' '.join(patched_from)
-        length = 8 + struct.calcsize(patched_from)
+    def send_request(self, device, function_id, data, form, form_ret, raw=False):
+        # if raw is true then the response packet is returned instead of the
+        # unpacked result
+        codec = get_payload_codec(form)
         request, response_expected, sequence_number = \
-            self.create_packet_header(device, length, function_id)
+            self.create_packet_header(device, 8 + codec.size, function_id)
 
-        request += pack_payload(data, form)
+        request += codec.pack(data)
 
         if response_expected:
-            with device.request_lock:
-                device.expected_response_function_id = function_id
-                device.expected_response_sequence_number = sequence_number
+            if self.pipelining:
+                response = self.send_pipelined_request(device, function_id, sequence_number, request)
+            else:
+                with device.request_lock:
+                    device.expected_response_function_id = function_id
+                    device.expected_response_sequence_number = sequence_number
 
-                try:
-                    self.send(request)
+                    statistics = self.statistics
 
-                    while True:
-                        response = device.response_queue.get(True, self.timeout)
+                    if statistics is not None:
+                        start_time = time.time()
 
-                        if function_id == get_function_id_from_data(response) and \
-                           sequence_number == get_sequence_number_from_data(response):
-                            # ignore old responses that arrived after the timeout expired, but before setting
-                            # expected_response_function_id and expected_response_sequence_number back to None
-                            break
-                except queue.Empty:
-                    msg = 'Did not receive response for function {0} in time'.format(function_id)
-                    raise Error(Error.TIMEOUT, msg, suppress_context=True)
-                finally:
-                    device.expected_response_function_id = None
-                    device.expected_response_sequence_number = None
+                    try:
+                        self.send(request)
+
+                        while True:
+                            response = device.response_queue.get(True, self.timeout)
 
-            error_code = get_error_code_from_data(response)
+                            if function_id == get_function_id_from_data(response) and \
+                               sequence_number == get_sequence_number_from_data(response):
+                                # ignore old responses that arrived after the timeout expired, but before setting
+                                # expected_response_function_id and expected_response_sequence_number back to None
+                                break
 
-            if error_code == 0:
-                # no error
-                pass
-            elif error_code == 1:
-                msg = 'Got invalid parameter for function {0}'.format(function_id)
-                raise Error(Error.INVALID_PARAMETER, msg)
-            elif error_code == 2:
-                msg = 'Function {0} is not supported'.format(function_id)
-                raise Error(Error.NOT_SUPPORTED, msg)
-            else:
-                msg = 'Function {0} returned an unknown error'.format(function_id)
-                raise Error(Error.UNKNOWN_ERROR_CODE, msg)
+                        if statistics is not None:
+                            statistics.add_request(device.uid, function_id, time.time() - start_time)
+                    except queue.Empty:
+                        if statistics is not None:
+                            statistics.add_timeout(device.uid, function_id)
+
+                        msg = 'Did not receive response for function {0} in time'.format(function_id)
+                        raise Error(Error.TIMEOUT, msg, suppress_context=True)
+                    finally:
+                        device.expected_response_function_id = None
+                        device.expected_response_sequence_number = None
 
-            if len(form_ret) > 0:
-                return unpack_payload(response[8:], form_ret)
+            check_error_code(response, function_id)
+
+            if raw:
+                return response
+
+            codec_ret = get_payload_codec(form_ret)
+
+            if len(codec_ret.items) > 0:
+                return codec_ret.unpack(response, 8)
         else:
             self.send(request)
 
+    def send_pipelined_request(self, device, function_id, sequence_number, request):
+        # each thread can only wait for one response at a time, so the
+        # response queue is reused for all requests of a thread
+        try:
+            response_queue = self.pipeline_local.response_queue
+        except AttributeError:
+            response_queue = queue.Queue()
+            self.pipeline_local.response_queue = response_queue
+
+        with self.pipeline_slots:
+            key, request = self.add_pending_request(device.uid, function_id, sequence_number, request, response_queue)
+
+            statistics = self.statistics
+
+            if statistics is not None:
+                start_time = time.time()
+
+            try:
+                self.send(request)
+
+                # responses to other keys are old responses that arrived after
+                # the timeout expired, but before the key was removed again
+                response = self.receive_pending_response(response_queue, key, {})
+
+                if statistics is not None:
+                    statistics.add_request(device.uid, function_id, time.time() - start_time)
+
+                return response
+            finally:
+                self.remove_pending_request(key)
+
+    def send_requests(self, device, function_id, data_list, form, form_ret, raw=False):
+        # sends the requests in the given order and returns their results in
+        # the same order. this is used by the high-level stream functions.
+        # with pipelining enabled up to PIPELINE_DEPTH requests are kept in
+        # flight, otherwise the requests are sent one after another. if raw
+        # is true then the response packets are returned instead of the
+        # unpacked results
+        codec = get_payload_codec(form)
+        codec_ret = get_payload_codec(form_ret)
+
+        if not self.pipelining or not device.get_response_expected(function_id):
+            return [self.send_request(device, function_id, data, codec, codec_ret, raw) for data in data_list]
+
+        response_queue = queue.Queue()
+        early_responses = {}
+        pending_keys = collections.deque()
+        statistics = self.statistics
+        start_times = collections.deque() # only used if statistics are enabled
+        results = []
+
+        def receive_oldest():
+            key = pending_keys[0]
+            response = self.receive_pending_response(response_queue, key, early_responses)
+
+            pending_keys.popleft()
+            self.remove_pending_request(key)
+            self.pipeline_slots.release()
+
+            if statistics is not None:
+                statistics.add_request(device.uid, function_id, time.time() - start_times.popleft())
+
+            check_error_code(response, function_id)
+
+            if raw:
+                results.append(response)
+            elif len(codec_ret.items) > 0:
+                results.append(codec_ret.unpack(response, 8))
+            else:
+                results.append(None)
+
+        try:
+            for data in data_list:
+                request, _, sequence_number = self.create_packet_header(device, 8 + codec.size, function_id)
+                request += codec.pack(data)
+
+                # only block on a free pipeline slot if no slot is held yet,
+                # otherwise make room by receiving the oldest response. this
+                # avoids a deadlock between threads holding some slots each
+                while not self.pipeline_slots.acquire(len(pending_keys) == 0):
+                    receive_oldest()
+
+                key, request = self.add_pending_request(device.uid, function_id, sequence_number, request, response_queue)
+                pending_keys.append(key)
+
+                if statistics is not None:
+                    start_times.append(time.time())
+
+                self.send(request)
+
+            while len(pending_keys) > 0:
+                receive_oldest()
+        finally:
+            for key in pending_keys:
+                self.remove_pending_request(key)
+                self.pipeline_slots.release()
+
+        return results
+
+    def add_pending_request(self, uid, function_id, sequence_number, request, response_queue):
+        # NOTE: assumes that a pipeline slot is held
+        with self.pending_requests_lock:
+            # requests without response use up sequence numbers as well, so
+            # the sequence number of a request that is still in flight can
+            # come around again. in that case pick another one, there is always
+            # a free one because at most 15 requests are in flight
+            key = (uid, function_id, sequence_number)
+
+            while key in self.pending_requests:
+                sequence_number = self.get_next_sequence_number()
+                key = (uid, function_id, sequence_number)
+
+            self.pending_requests[key] = response_queue
+
+        request = request[0:6] + struct.pack('<B', (sequence_number << 4) | (1 << 3)) + request[7:]
+
+        return key, request
+
+    def remove_pending_request(self, key):
+        with self.pending_requests_lock:
+            del self.pending_requests[key]
+
+    def receive_pending_response(self, response_queue, key, early_responses):
+        # the response queue can be shared by multiple requests in flight.
+        # responses to other requests are kept in early_responses until they
+        # are asked for
+        if key in early_responses:
+            return early_responses.pop(key)
+
+        try:
+            while True:
+                response = response_queue.get(True, self.timeout)
+                response_key = (get_uid_from_data(response), get_function_id_from_data(response),
+                                get_sequence_number_from_data(response))
+
+                if response_key == key:
+                    return response
+
+                early_responses[response_key] = response
+        except queue.Empty:
+            statistics = self.statistics
+
+            if statistics is not None:
+                statistics.add_timeout(key[0], key[1])
+
+            msg = 'Did not receive response for function {0} in time'.format(key[1])
+            raise Error(Error.TIMEOUT, msg, suppress_context=True)
+
     def get_next_sequence_number(self):
         with self.sequence_number_lock:
             sequence_number = self.next_sequence_number + 1
@@ -1251,12 +2335,22 @@ class IPConnection(object):
     def handle_response(self, packet):
         self.disconnect_probe_flag = False
 
+        statistics = self.statistics
+
+        if statistics is not None:
+            statistics.add_received(packet)
+
+        capture = self.capture
+
+        if capture is not None:
+            capture.write(PacketCapture.DIRECTION_RECEIVED, packet)
+
         function_id = get_function_id_from_data(packet)
         sequence_number = get_sequence_number_from_data(packet)
 
         if sequence_number == 0 and function_id == IPConnection.CALLBACK_ENUMERATE:
             if IPConnection.CALLBACK_ENUMERATE in self.registered_callbacks:
-                self.callback.queue.put((IPConnection.QUEUE_PACKET, packet))
+                self.queue_callback_packet(self.callback.queue, packet, None)
             return
 
         uid = get_uid_from_data(packet)
@@ -1270,7 +2364,26 @@ class IPConnection(object):
         if sequence_number == 0:
             if function_id in device.registered_callbacks or \
                -function_id in device.high_level_callbacks:
-                self.callback.queue.put((IPConnection.QUEUE_PACKET, packet))
+                callback = self.callback
+
+                if len(callback.workers) > 0:
+                    callback_queue = callback.workers[uid % len(callback.workers)][0]
+                else:
+                    callback_queue = callback.queue
+
+                # parts of high-level callbacks cannot be coalesced
+                if -function_id in device.high_level_callbacks:
+                    coalesce_key = None
+                else:
+                    coalesce_key = (uid, function_id)
+
+                self.queue_callback_packet(callback_queue, packet, coalesce_key)
+            return
+
+        response_queue = self.pending_requests.get((uid, function_id, sequence_number))
+
+        if response_queue is not None:
+            response_queue.put(packet)
             return
 
         if device.expected_response_function_id == function_id and \
@@ -1280,6 +2393,14 @@ class IPConnection(object):
 
         # Response seems to be OK, but can't be handled
 
+    def queue_callback_packet(self, callback_queue, packet, coalesce_key):
+        result = callback_queue.put((IPConnection.QUEUE_PACKET, packet), coalesce_key)
+
+        if result == IPConnection.CallbackQueue.RESULT_DROPPED:
+            self.callback_dropped_count += 1
+        elif result == IPConnection.CallbackQueue.RESULT_COALESCED:
+            self.callback_coalesced_count += 1
+
     def handle_disconnect_by_peer(self, disconnect_reason, socket_id, disconnect_immediately):
         # NOTE: assumes that socket_lock is locked if disconnect_immediately is true
 
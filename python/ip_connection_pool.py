@@ -0,0 +1,592 @@
+# -*- coding: utf-8 -*-
+#
+# Redistribution and use in source and binary forms of this file,
+# with or without modification, are permitted. See the Creative
+# Commons Zero (CC0 1.0) License for more details.
+
+# IP Connections that share their threads. a normal IP Connection uses a
+# receive thread, a callback thread and a disconnect probe thread of its own.
+# the IP Connections of a pool receive their packets through a single
+# selectors based I/O thread that also sends the disconnect probes, their
+# callbacks are dispatched by the callback threads of the pool and a single
+# thread takes care of auto-reconnects. this module requires Python 3.4 or
+# newer
+
+import selectors
+import select
+import socket
+import threading
+import errno
+import time
+import traceback
+
+try:
+    from .ip_connection import IPConnection, Error
+except ImportError:
+    from ip_connection import IPConnection, Error
+
+def is_writable(sock):
+    # a writable socket has room for at least a small packet, so a probe can
+    # be sent without blocking. poll has no limit for the file descriptor
+    # number, but isn't available on Windows
+    if hasattr(select, 'poll'):
+        poller = select.poll()
+        poller.register(sock, select.POLLOUT)
+
+        return len(poller.poll(0)) > 0
+
+    return len(select.select([], [sock], [], 0)[1]) > 0
+
+class PooledCallbackQueue(object):
+    # stands in for the callback queue of a pooled IP Connection and forwards
+    # its items to the callback queues of the pool. all items of a connection
+    # go to the same queue, so its connected and disconnected callbacks stay
+    # in order with its device callbacks, like for a normal IP Connection
+
+    def __init__(self, pool, ipcon, callback):
+        self.pool = pool
+        self.ipcon = ipcon
+        self.callback = callback
+
+    def qsize(self):
+        return sum([callback_queue.qsize() for callback_queue in self.pool.callback_queues])
+
+    def put(self, item, coalesce_key=None):
+        kind, data = item
+        callback_queues = self.pool.callback_queues
+        index = self.ipcon.pool_index % len(callback_queues)
+
+        if coalesce_key != None:
+            coalesce_key = (self.ipcon.pool_index, coalesce_key)
+
+        return callback_queues[index].put((kind, (self.ipcon, self.callback, data)), coalesce_key)
+
+class PoolChannel(object):
+    # receive state of a connected socket, only used by the I/O thread
+
+    def __init__(self, ipcon, sock, socket_id):
+        self.ipcon = ipcon
+        self.socket = sock
+        self.socket_id = socket_id
+        self.removed = False # protected by the lock of the pool
+        self.buffer = bytearray(65536)
+        self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = 0
+        self.probe_request, _, _ = ipcon.create_packet_header(None, 8, IPConnection.FUNCTION_DISCONNECT_PROBE)
+
+class PooledIPConnection(IPConnection):
+    """
+    IP Connection that is managed by an IPConnectionPool. It has the same
+    API as the normal IP Connection and is used with the normal Device
+    classes. Create it with IPConnectionPool.create_ip_connection().
+    """
+
+    def __init__(self, pool, pool_index):
+        IPConnection.__init__(self)
+
+        self.pool = pool
+        self.pool_index = pool_index
+
+    def set_callback_threads(self, callback_threads):
+        """
+        Not supported, the callback threads are shared by all IP Connections
+        of the pool and configured by IPConnectionPool.
+        """
+
+        raise Error(Error.NOT_SUPPORTED, 'Callback threads are configured by the IP Connection pool')
+
+    def set_callback_queue_limit(self, limit, overflow_policy=IPConnection.OVERFLOW_POLICY_DROP_OLDEST):
+        """
+        Not supported, the callback queues are shared by all IP Connections
+        of the pool, see IPConnectionPool.set_callback_queue_limit.
+        """
+
+        raise Error(Error.NOT_SUPPORTED, 'Callback queues are configured by the IP Connection pool')
+
+    def connect_unlocked(self, is_auto_reconnect):
+        # NOTE: assumes that socket is None and socket_lock is locked
+
+        # create callback context. the callbacks are dispatched by the
+        # callback threads of the pool
+        if self.callback is None:
+            self.callback = IPConnection.CallbackContext()
+            self.callback.queue = PooledCallbackQueue(self.pool, self, self.callback)
+            self.callback.packet_dispatch_allowed = False
+            self.callback.lock = threading.Lock()
+
+        # create and connect socket
+        try:
+            tmp = self.create_socket()
+        except Exception as e:
+            if self.auto_reconnect_internal:
+                if is_auto_reconnect:
+                    raise
+
+                if self.connect_failure_callback is not None:
+                    self.connect_failure_callback(e)
+
+                self.auto_reconnect_allowed = True
+
+                # FIXME: don't misuse disconnected-callback here to trigger an auto-reconnect
+                #        because not actual connection has been established yet
+                self.callback.queue.put((IPConnection.QUEUE_META,
+                                         (IPConnection.CALLBACK_DISCONNECTED,
+                                          IPConnection.DISCONNECT_REASON_ERROR, None)))
+            elif not is_auto_reconnect:
+                self.callback = None
+
+            raise
+
+        self.socket = tmp
+        self.socket_id += 1
+
+        # let the I/O thread of the pool receive from the socket
+        self.disconnect_probe_flag = True
+        self.callback.packet_dispatch_allowed = True
+
+        self.pool.add_socket(self, self.socket, self.socket_id)
+
+        self.auto_reconnect_allowed = False
+        self.auto_reconnect_pending = False
+
+        if is_auto_reconnect:
+            connect_reason = IPConnection.CONNECT_REASON_AUTO_RECONNECT
+        else:
+            connect_reason = IPConnection.CONNECT_REASON_REQUEST
+
+        self.callback.queue.put((IPConnection.QUEUE_META,
+                                 (IPConnection.CALLBACK_CONNECTED,
+                                  connect_reason, None)))
+
+    def disconnect_unlocked(self):
+        # NOTE: assumes that socket is not None and socket_lock is locked
+
+        # stop dispatching packet callbacks before the I/O thread stops
+        # receiving from the socket
+        self.callback.packet_dispatch_allowed = False
+
+        self.pool.remove_socket(self.socket)
+
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+
+        # close socket
+        self.socket.close()
+        self.socket = None
+
+    def end_callback_threads(self, callback):
+        # the callback threads belong to the pool
+        pass
+
+    def dispatch_meta(self, function_id, parameter, socket_id):
+        if function_id != IPConnection.CALLBACK_DISCONNECTED:
+            IPConnection.dispatch_meta(self, function_id, parameter, socket_id)
+            return
+
+        if parameter != IPConnection.DISCONNECT_REASON_REQUEST:
+            with self.socket_lock:
+                # don't close the socket if it got disconnected or
+                # reconnected in the meantime
+                if self.socket is not None and self.socket_id == socket_id:
+                    self.disconnect_unlocked()
+
+        if IPConnection.CALLBACK_DISCONNECTED in self.registered_callbacks:
+            self.registered_callbacks[IPConnection.CALLBACK_DISCONNECTED](parameter)
+
+        # don't block the callback threads of the pool until reconnect, the
+        # reconnect is done by the auto-reconnect thread of the pool
+        if parameter != IPConnection.DISCONNECT_REASON_REQUEST and \
+           self.auto_reconnect and self.auto_reconnect_allowed:
+            self.auto_reconnect_pending = True
+            self.pool.add_auto_reconnect(self)
+
+class IPConnectionPool(object):
+    """
+    Manages many IP Connections with a fixed number of threads. A normal
+    IP Connection uses three threads of its own. The IP Connections of a
+    pool share a single I/O thread for receiving and disconnect probing,
+    the callback threads and a single auto-reconnect thread.
+
+    Create the IP Connections with create_ip_connection and use them
+    with the normal Device classes::
+
+        pool = IPConnectionPool()
+        ipcon = pool.create_ip_connection()
+        ipcon.connect('localhost', 4223)
+        temperature = BrickletTemperature('XYZ', ipcon)
+
+    The callbacks of all IP Connections of the pool are dispatched by
+    *callback_threads* threads, distributed by connection. A slow callback
+    function delays the callbacks of other connections that are dispatched
+    by the same thread. An exception raised by a
+    callback function is printed and doesn't stop the dispatching.
+    """
+
+    def __init__(self, callback_threads=1):
+        """
+        Creates the pool and starts its threads.
+        """
+
+        callback_threads = int(callback_threads)
+
+        if callback_threads < 1:
+            raise ValueError('Callback thread count has to be at least 1')
+
+        self.lock = threading.Lock()
+        self.running = True # protected by lock
+        self.connections = [] # protected by lock
+        self.channels = {} # socket -> PoolChannel, protected by lock
+        self.commands = [] # for the I/O thread, protected by lock
+        self.selector = selectors.DefaultSelector() # only used by the I/O thread
+        self.wakeup_receiver, self.wakeup_sender = socket.socketpair()
+        self.wakeup_receiver.setblocking(False)
+        self.wakeup_sender.setblocking(False)
+        self.reconnect_condition = threading.Condition()
+        self.reconnect_pending = [] # protected by reconnect_condition
+
+        self.selector.register(self.wakeup_receiver, selectors.EVENT_READ, None)
+
+        self.callback_queues = []
+        self.callback_threads = []
+
+        for _ in range(callback_threads):
+            callback_queue = IPConnection.CallbackQueue(0, IPConnection.OVERFLOW_POLICY_DROP_OLDEST)
+            callback_thread = threading.Thread(name='Callback-Processor',
+                                               target=self.callback_loop,
+                                               args=(callback_queue,))
+            callback_thread.daemon = True
+            callback_thread.start()
+
+            self.callback_queues.append(callback_queue)
+            self.callback_threads.append(callback_thread)
+
+        self.io_thread = threading.Thread(name='Brickd-Multiplexer', target=self.io_loop)
+        self.io_thread.daemon = True
+        self.io_thread.start()
+
+        self.reconnect_thread = threading.Thread(name='Auto-Reconnector', target=self.reconnect_loop)
+        self.reconnect_thread.daemon = True
+        self.reconnect_thread.start()
+
+    def create_ip_connection(self):
+        """
+        Creates a new IP Connection that is managed by this pool.
+        """
+
+        with self.lock:
+            if not self.running:
+                raise Error(Error.NOT_SUPPORTED, 'IP Connection pool is closed')
+
+            ipcon = PooledIPConnection(self, len(self.connections))
+
+            self.connections.append(ipcon)
+
+        return ipcon
+
+    def get_ip_connections(self):
+        """
+        Returns a list of all IP Connections created by this pool.
+        """
+
+        with self.lock:
+            return list(self.connections)
+
+    def set_callback_queue_limit(self, limit, overflow_policy=IPConnection.OVERFLOW_POLICY_DROP_OLDEST):
+        """
+        Limits the number of received callbacks that can be queued for
+        dispatching, per callback thread of the pool. See
+        IPConnection.set_callback_queue_limit for the overflow policies. The
+        dropped and coalesced callbacks are counted by the IP Connection they
+        were received by.
+
+        Default value is 0.
+        """
+
+        limit = int(limit)
+
+        if limit < 0:
+            raise ValueError('Callback queue limit cannot be negative')
+
+        if overflow_policy not in [IPConnection.OVERFLOW_POLICY_DROP_OLDEST,
+                                   IPConnection.OVERFLOW_POLICY_DROP_NEWEST,
+                                   IPConnection.OVERFLOW_POLICY_COALESCE]:
+            raise ValueError('Invalid overflow policy {0}'.format(overflow_policy))
+
+        for callback_queue in self.callback_queues:
+            with callback_queue.condition:
+                callback_queue.limit = limit
+                callback_queue.overflow_policy = overflow_policy
+
+    def get_callback_queue_depth(self):
+        """
+        Returns the number of received callbacks of all IP Connections of the
+        pool that are not dispatched yet.
+        """
+
+        return sum([callback_queue.qsize() for callback_queue in self.callback_queues])
+
+    def close(self):
+        """
+        Disconnects all IP Connections of the pool and ends its threads. The
+        pool cannot be used anymore afterwards.
+        """
+
+        with self.lock:
+            if not self.running:
+                return
+
+            connections = list(self.connections)
+
+        for ipcon in connections:
+            try:
+                ipcon.disconnect()
+            except Error as e:
+                if e.value != Error.NOT_CONNECTED:
+                    raise
+
+        with self.lock:
+            self.running = False
+
+        self.wakeup()
+
+        with self.reconnect_condition:
+            self.reconnect_condition.notify()
+
+        for callback_queue in self.callback_queues:
+            callback_queue.put((IPConnection.QUEUE_EXIT, None))
+
+        # a callback function can close the pool but cannot wait for its own thread
+        for thread in [self.io_thread, self.reconnect_thread] + self.callback_threads:
+            if threading.current_thread() is not thread:
+                thread.join()
+
+    def add_socket(self, ipcon, sock, socket_id):
+        channel = PoolChannel(ipcon, sock, socket_id)
+
+        with self.lock:
+            self.channels[sock] = channel
+            self.commands.append((selectors.EVENT_READ, channel, None))
+
+        self.wakeup()
+
+    def remove_socket(self, sock):
+        # waits until the I/O thread doesn't use the socket anymore
+        with self.lock:
+            channel = self.channels.pop(sock, None)
+
+            if channel is None: # already removed by the I/O thread
+                return
+
+            channel.removed = True
+
+            if threading.current_thread() is self.io_thread:
+                self.selector.unregister(sock)
+                return
+
+            removed = threading.Event()
+
+            self.commands.append((0, channel, removed))
+
+        self.wakeup()
+        removed.wait()
+
+    def add_auto_reconnect(self, ipcon):
+        with self.reconnect_condition:
+            if ipcon not in self.reconnect_pending:
+                self.reconnect_pending.append(ipcon)
+
+            self.reconnect_condition.notify()
+
+    def wakeup(self):
+        try:
+            self.wakeup_sender.send(b'\x00')
+        except socket.error:
+            pass # wakeup is already pending
+
+    def io_loop(self):
+        next_probe = time.time() + IPConnection.DISCONNECT_PROBE_INTERVAL
+
+        while True:
+            with self.lock:
+                if not self.running:
+                    break
+
+                commands = self.commands
+                self.commands = []
+
+            for events, channel, removed in commands:
+                if events != 0:
+                    self.selector.register(channel.socket, events, channel)
+                else:
+                    try:
+                        self.selector.unregister(channel.socket)
+                    except (KeyError, ValueError):
+                        pass # already unregistered after a receive error
+
+                    removed.set()
+
+            for key, _ in self.selector.select(max(next_probe - time.time(), 0)):
+                if key.data is None:
+                    try:
+                        while len(self.wakeup_receiver.recv(4096)) > 0:
+                            pass
+                    except socket.error:
+                        pass
+                else:
+                    self.receive_from_channel(key.data)
+
+            if time.time() >= next_probe:
+                next_probe = time.time() + IPConnection.DISCONNECT_PROBE_INTERVAL
+
+                for key in list(self.selector.get_map().values()):
+                    if key.data is not None:
+                        self.probe_channel(key.data)
+
+        with self.lock:
+            commands = self.commands
+            self.commands = []
+
+        for _, _, removed in commands:
+            if removed is not None:
+                removed.set()
+
+        self.selector.close()
+        self.wakeup_receiver.close()
+        self.wakeup_sender.close()
+
+    def receive_from_channel(self, channel):
+        # packets are framed in place in the buffer of the channel, in the
+        # same way as in IPConnection.receive_loop
+        buffer = channel.buffer
+
+        if channel.end == len(buffer):
+            buffer[0:channel.end - channel.start] = buffer[channel.start:channel.end]
+            channel.end -= channel.start
+            channel.start = 0
+
+        try:
+            received = channel.socket.recv_into(channel.view[channel.end:])
+        except socket.timeout:
+            return
+        except socket.error as e:
+            if e.errno in [errno.EINTR, errno.EAGAIN, errno.EWOULDBLOCK]:
+                return
+
+            self.close_channel(channel, IPConnection.DISCONNECT_REASON_ERROR)
+            return
+
+        if received == 0:
+            self.close_channel(channel, IPConnection.DISCONNECT_REASON_SHUTDOWN)
+            return
+
+        channel.end += received
+
+        while channel.end - channel.start >= 8:
+            length = buffer[channel.start + 4]
+
+            if channel.end - channel.start < length:
+                # Wait for complete packet
+                break
+
+            packet = channel.view[channel.start:channel.start + length].tobytes()
+            channel.start += length
+
+            channel.ipcon.handle_response(packet)
+
+        if channel.start == channel.end:
+            channel.start = 0
+            channel.end = 0
+
+    def probe_channel(self, channel):
+        ipcon = channel.ipcon
+
+        if ipcon.disconnect_probe_flag:
+            # the I/O thread must not block on a single connection. if a
+            # request is being sent or the send buffer is full then the
+            # probe is skipped and tried again in the next interval
+            if not ipcon.socket_send_lock.acquire(False):
+                return
+
+            try:
+                if is_writable(channel.socket):
+                    channel.socket.send(channel.probe_request)
+            except socket.error:
+                failed = True
+            else:
+                failed = False
+            finally:
+                ipcon.socket_send_lock.release()
+
+            if failed:
+                self.close_channel(channel, IPConnection.DISCONNECT_REASON_ERROR)
+        else:
+            ipcon.disconnect_probe_flag = True
+
+    def close_channel(self, channel, disconnect_reason):
+        # stop receiving from the socket. the socket itself is closed by the
+        # IP Connection when it dispatches the disconnected callback
+        with self.lock:
+            if channel.removed: # disconnect is already in progress
+                return
+
+            channel.removed = True
+
+            self.channels.pop(channel.socket, None)
+
+        self.selector.unregister(channel.socket)
+
+        channel.ipcon.handle_disconnect_by_peer(disconnect_reason, channel.socket_id, False)
+
+    def callback_loop(self, callback_queue):
+        while True:
+            kind, data = callback_queue.get()
+
+            if kind == IPConnection.QUEUE_EXIT:
+                break
+
+            ipcon, callback, data = data
+
+            try:
+                if kind == IPConnection.QUEUE_META:
+                    ipcon.dispatch_meta(*data)
+                elif kind == IPConnection.QUEUE_PACKET:
+                    # don't dispatch callbacks when the connection is closed
+                    if callback.packet_dispatch_allowed:
+                        ipcon.dispatch_packet(data)
+            except Exception:
+                traceback.print_exc()
+
+    def reconnect_loop(self):
+        while True:
+            with self.reconnect_condition:
+                while self.running and len(self.reconnect_pending) == 0:
+                    self.reconnect_condition.wait()
+
+                if not self.running:
+                    break
+
+                pending = list(self.reconnect_pending)
+
+            # FIXME: wait a moment here, otherwise the next connect
+            # attempt will succeed, even if there is no open server
+            # socket. the first receive will then fail directly
+            time.sleep(0.1)
+
+            for ipcon in pending:
+                retry = False
+
+                with ipcon.socket_lock:
+                    if ipcon.auto_reconnect_allowed and ipcon.socket is None:
+                        try:
+                            ipcon.connect_unlocked(True)
+                        except:
+                            retry = True
+                    else:
+                        ipcon.auto_reconnect_pending = False
+
+                if not retry:
+                    with self.reconnect_condition:
+                        self.reconnect_pending.remove(ipcon)
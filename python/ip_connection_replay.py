@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+#
+# Redistribution and use in source and binary forms of this file,
+# with or without modification, are permitted. See the Creative
+# Commons Zero (CC0 1.0) License for more details.
+
+# replay of packet captures written by IPConnection.start_capture. the
+# ReplayIPConnection uses a ReplaySocket instead of a TCP/IP socket, so the
+# received packets take the same path through the receive and callback
+# threads as with a real Brick Daemon
+
+import struct
+import threading
+import collections
+import time
+
+try:
+    from .ip_connection import IPConnection, PacketCapture, Error
+except (ValueError, ImportError):
+    from ip_connection import IPConnection, PacketCapture, Error
+
+def read_capture(filename):
+    """
+    Yields the (time, direction, packet) records of a capture file written by
+    IPConnection.start_capture. The direction is either
+    PacketCapture.DIRECTION_RECEIVED or PacketCapture.DIRECTION_SENT.
+    """
+
+    record_header = PacketCapture.record_header
+
+    with open(filename, 'rb') as f:
+        data = f.read()
+
+    if data[0:len(PacketCapture.MAGIC)] != PacketCapture.MAGIC:
+        raise Error(Error.INVALID_PARAMETER, '{0} is not a packet capture file'.format(filename))
+
+    offset = len(PacketCapture.MAGIC)
+
+    while offset + record_header.size + 8 <= len(data):
+        timestamp, direction = record_header.unpack_from(data, offset)
+        offset += record_header.size
+        length = struct.unpack_from('<B', data, offset + 4)[0]
+
+        if offset + length > len(data): # truncated by an unclean shutdown
+            break
+
+        yield timestamp, direction, data[offset:offset + length]
+
+        offset += length
+
+class ReplaySocket(object):
+    # stands in for the socket of a ReplayIPConnection. callbacks are
+    # received at their recorded time, scaled by speed. responses are
+    # received when a matching request is sent
+
+    def __init__(self, records, speed):
+        self.speed = speed
+        self.condition = threading.Condition()
+        self.closed = False # protected by condition
+        self.data = bytearray() # received but not read yet, protected by condition
+        self.callbacks = [] # [(time, packet), ...]
+        self.callback_index = 0 # protected by condition
+        self.responses = {} # (uid, function_id) -> deque of response packets, protected by condition
+        self.finished = threading.Event()
+
+        for timestamp, direction, packet in records:
+            if direction != PacketCapture.DIRECTION_RECEIVED:
+                continue
+
+            uid, _, function_id, sequence_number_and_options = struct.unpack_from('<IBBB', packet, 0)
+
+            if sequence_number_and_options >> 4 == 0:
+                self.callbacks.append((timestamp, packet))
+            else:
+                key = (uid, function_id)
+
+                if key not in self.responses:
+                    self.responses[key] = collections.deque()
+
+                self.responses[key].append(packet)
+
+        if len(self.callbacks) > 0:
+            self.first_time = self.callbacks[0][0]
+        else:
+            self.first_time = 0
+
+        self.start_time = time.time()
+
+    def settimeout(self, timeout):
+        pass
+
+    def send(self, packet):
+        uid, _, function_id, sequence_number_and_options = struct.unpack_from('<IBBB', packet, 0)
+
+        if sequence_number_and_options & 0x08 == 0: # no response expected
+            return len(packet)
+
+        with self.condition:
+            responses = self.responses.get((uid, function_id))
+
+            if responses is None or len(responses) == 0:
+                # answer with a function-not-supported error
+                response = bytearray(packet[0:8])
+                response[4] = 8
+                response[7] = 2 << 6
+            else:
+                # responses are used in recorded order, the last one is
+                # repeated for all following requests
+                if len(responses) > 1:
+                    response = bytearray(responses.popleft())
+                else:
+                    response = bytearray(responses[0])
+
+                response[6] = (sequence_number_and_options & 0xF0) | (response[6] & 0x0F)
+
+            self.data += response
+            self.condition.notify()
+
+        return len(packet)
+
+    def recv_into(self, buffer):
+        with self.condition:
+            while not self.closed:
+                # deliver callbacks that are due
+                while self.callback_index < len(self.callbacks):
+                    timestamp, packet = self.callbacks[self.callback_index]
+
+                    if self.speed > 0:
+                        delay = self.start_time + (timestamp - self.first_time) / self.speed - time.time()
+                    else:
+                        delay = 0
+
+                    if delay > 0:
+                        break
+
+                    self.data += packet
+                    self.callback_index += 1
+
+                if self.callback_index == len(self.callbacks):
+                    self.finished.set()
+
+                if len(self.data) > 0:
+                    length = min(len(buffer), len(self.data))
+                    buffer[0:length] = bytes(self.data[0:length])
+                    del self.data[0:length]
+
+                    return length
+
+                if self.callback_index < len(self.callbacks):
+                    self.condition.wait(delay)
+                else:
+                    self.condition.wait()
+
+            return 0
+
+    def shutdown(self, how):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+    def close(self):
+        self.shutdown(None)
+
+class ReplayIPConnection(IPConnection):
+    """
+    IP Connection that replays a capture file written by
+    IPConnection.start_capture instead of connecting to a Brick Daemon or
+    WIFI/Ethernet Extension. It has the same API as the normal IP Connection
+    and is used with the normal Device classes. The host and port given to
+    connect are ignored.
+
+    With each connect the recorded callbacks are received again at their
+    recorded time, divided by *speed*. A *speed* of 0 replays the callbacks
+    as fast as possible. Requests are answered with the recorded responses
+    for the same UID and function ID in recorded order, the last recorded
+    response is repeated. Requests without a recorded response fail with a
+    not-supported error.
+    """
+
+    def __init__(self, filename, speed=1.0):
+        IPConnection.__init__(self)
+
+        speed = float(speed)
+
+        if speed < 0:
+            raise ValueError('Replay speed cannot be negative')
+
+        self.records = list(read_capture(filename))
+        self.speed = speed
+        self.replay_socket = None
+
+    def create_socket(self):
+        self.replay_socket = ReplaySocket(self.records, self.speed)
+
+        return self.replay_socket
+
+    def wait_for_replay(self, timeout=None):
+        """
+        Blocks until all recorded callbacks were received, or until the
+        *timeout* in seconds expired. Returns *true* if all recorded callbacks
+        were received. Their dispatch by the callback thread can still be
+        in progress.
+        """
+
+        replay_socket = self.replay_socket
+
+        if replay_socket is None:
+            raise Error(Error.NOT_CONNECTED, 'Not connected')
+
+        return replay_socket.finished.wait(timeout)
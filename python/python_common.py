@@ -46,6 +46,14 @@ class PythonPacket(common.Packet):
 
         return ', '.join(parameters)
 
+    def has_python_array_type(self):
+        # the array mode of high-level stream getters needs a numeric chunk
+        # type that can be copied from the payload as is
+        stream_out = self.get_high_level('stream_out')
+
+        return stream_out != None and not stream_out.has_single_chunk() and \
+               stream_out.get_chunk_data_element().get_python_struct_format()[-1] in 'bBhHiIqQ'
+
 class PythonElement(common.Element):
     python_types = {
         'int8':   'int',
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+# tests AsyncIPConnection and the generated async_* device classes against the
+# Brick Daemon simulator from the tcpip/ directory. the device classes are
+# taken from the bindings/ directory, run generate_python_bindings.py first.
+# this requires Python 3.5 or newer
+
+import sys
+import os
+import types
+import array
+import asyncio
+
+root_dir = os.path.dirname(os.path.realpath(__file__))
+
+sys.path.append(os.path.join(os.path.split(root_dir)[0], 'tcpip'))
+from brickd_simulator import BrickdSimulator
+
+if not os.path.exists(os.path.join(root_dir, 'bindings', 'async_bricklet_temperature_v2.py')):
+    print('bindings/ directory is missing, run generate_python_bindings.py first')
+    sys.exit(1)
+
+# the generated bindings use a relative import of ip_connection, so they are
+# imported as part of a tinkerforge package made of this directory and the
+# bindings/ directory, like in benchmark_ip_connection.py
+package = types.ModuleType('tinkerforge')
+package.__path__ = [root_dir, os.path.join(root_dir, 'bindings')]
+sys.modules['tinkerforge'] = package
+
+from tinkerforge.ip_connection import IPConnection, Error
+from tinkerforge.async_ip_connection import AsyncIPConnection
+from tinkerforge.async_bricklet_temperature_v2 import AsyncBrickletTemperatureV2
+from tinkerforge.async_bricklet_rs485 import AsyncBrickletRS485
+from tinkerforge.async_bricklet_thermal_imaging import AsyncBrickletThermalImaging
+
+simulator = BrickdSimulator(port=0, latency=0.001)
+simulator.add_device('bricklet_temperature_v2', 'tV', {'temperature': 100})
+simulator.add_device('bricklet_rs485', 'Fcx')
+simulator.add_device('bricklet_thermal_imaging', 'Th', {'temperature_image': 5})
+
+port = simulator.start()
+
+async def main():
+    ipcon = AsyncIPConnection()
+    events = []
+
+    ipcon.register_callback(IPConnection.CALLBACK_CONNECTED, events.append)
+
+    await ipcon.connect('localhost', port)
+
+    assert(ipcon.get_connection_state() == IPConnection.CONNECTION_STATE_CONNECTED)
+
+    temperature = AsyncBrickletTemperatureV2('tV', ipcon)
+    rs485 = AsyncBrickletRS485('Fcx', ipcon)
+    thermal_imaging = AsyncBrickletThermalImaging('Th', ipcon)
+
+    # getters
+    assert(await temperature.get_temperature() == 0)
+    assert((await temperature.get_identity()).uid == 'tV')
+
+    # concurrent getters of different devices
+    identities = await asyncio.gather(temperature.get_identity(), rs485.get_identity(), thermal_imaging.get_identity())
+
+    assert([identity.uid for identity in identities] == ['tV', 'Fcx', 'Th'])
+
+    # stream read and write
+    assert(len(await rs485.read(200)) == 200)
+    assert(await rs485.write(['x'] * 200) == 200)
+
+    image = await thermal_imaging.get_temperature_image()
+
+    assert(len(image) == 4800)
+
+    image = await thermal_imaging.get_temperature_image(array_type=array.array)
+
+    assert(isinstance(image, array.array) and len(image) == 4800)
+
+    # callbacks, as function and as iterator, normal and high-level
+    values = []
+
+    async def on_temperature(value):
+        values.append(value)
+
+    temperature.register_callback(AsyncBrickletTemperatureV2.CALLBACK_TEMPERATURE, on_temperature)
+
+    temperatures = temperature.callbacks(AsyncBrickletTemperatureV2.CALLBACK_TEMPERATURE)
+    images = thermal_imaging.callbacks(AsyncBrickletThermalImaging.CALLBACK_TEMPERATURE_IMAGE, maxsize=1)
+
+    assert(await asyncio.wait_for(temperatures.__anext__(), 5) == 0)
+
+    temperatures.close()
+
+    async with images:
+        image = await asyncio.wait_for(images.__anext__(), 5)
+
+        assert(len(image) == 4800)
+
+    while len(values) == 0:
+        await asyncio.sleep(0.01)
+
+    assert(values[0] == 0)
+
+    temperature.register_callback(AsyncBrickletTemperatureV2.CALLBACK_TEMPERATURE, None)
+
+    assert(AsyncBrickletTemperatureV2.CALLBACK_TEMPERATURE not in temperature.registered_callbacks)
+    assert(AsyncBrickletThermalImaging.CALLBACK_TEMPERATURE_IMAGE not in thermal_imaging.registered_callbacks)
+
+    await ipcon.disconnect()
+
+    assert(events == [IPConnection.CONNECT_REASON_REQUEST])
+
+    try:
+        await temperature.get_temperature()
+        assert(False)
+    except Error as e:
+        assert(e.value == Error.NOT_CONNECTED)
+
+loop = asyncio.new_event_loop()
+
+try:
+    loop.run_until_complete(main())
+finally:
+    loop.close()
+    simulator.stop()
@@ -1,7 +1,18 @@
 # -*- coding: utf-8 -*-
 
+import os
 import sys
-from ip_connection import create_char, create_char_list, create_string, pack_payload, unpack_payload
+import time
+import struct
+import array
+import socket
+import tempfile
+import threading
+from ip_connection import create_char, create_char_list, create_string, pack_payload, unpack_payload, \
+                          get_payload_codec, StreamArray, CallbackStream, get_length_from_data, \
+                          get_function_id_from_data, get_sequence_number_from_data, IPConnection, Device, Error, \
+                          PacketCapture
+from ip_connection_replay import read_capture, ReplayIPConnection
 
 def b(value):
     if sys.hexversion < 0x03000000:
@@ -147,6 +158,21 @@ assert(pack_payload(('abc',), '5s') == b('abc\0\0'))
 assert(pack_payload(('abc\xff',), '5s') == b('abc\xff\0'))
 assert(pack_payload(('a',), 'c') == b('a'))
 assert(pack_payload((['a', 'b', 'c'],), '3c') == b('abc'))
+assert(pack_payload((True,), '!') == b('\x01'))
+assert(pack_payload(([True, False, True, False, False, False, False, False, True],), '9!') == b('\x05\x01'))
+assert(pack_payload((0x1234, [1, 2, 3], 'ab', [True, True]), 'H 3B 3s 2!') == b('\x34\x12\x01\x02\x03ab\0\x03'))
+
+try:
+    pack_payload(([True],), '2!')
+    assert(False)
+except ValueError:
+    pass
+
+try:
+    pack_payload(([1, 2], [3, 4]), '1B 3B')
+    assert(False)
+except:
+    pass
 
 #
 # unpack_payload
@@ -158,3 +184,502 @@ assert(unpack_payload(b('abc\xff\0'), '5s') == 'abc\xff')
 assert(unpack_payload(b('a'), 'c') == 'a')
 assert(unpack_payload(b('abc'), '3c') == ('a', 'b', 'c'))
 assert(unpack_payload(b('a\xff\0'), '3c') == ('a', '\xff', '\0'))
+assert(unpack_payload(b('\x02'), '!') == True)
+assert(unpack_payload(b('\x05\x01'), '9!') == (True, False, True, False, False, False, False, False, True))
+assert(unpack_payload(b('\x34\x12\x01\x02\x03ab\0\x03'), 'H 3B 3s 2!') == [0x1234, (1, 2, 3), 'ab', (True, True)])
+assert(unpack_payload(b('\x34\x12\x01\x02'), 'H B') == [0x1234, 1]) # trailing data is ignored
+
+#
+# StreamArray
+#
+
+stream = StreamArray(get_payload_codec('H H 2H'), ('stream_length', 'stream_chunk_offset', 'stream_chunk_data'), None, array.array)
+stream.add_response(b('\0\0\0\0\0\0\0\0\x03\0\0\0\x01\x02\x03\x04'))
+
+assert(stream.get_missing_chunk_count() == 1)
+
+stream.add_response(b('\0\0\0\0\0\0\0\0\x03\0\x02\0\x05\x06\0\0'))
+
+assert(stream.get_missing_chunk_count() == 0)
+assert(not stream.out_of_sync)
+assert(stream.data == array.array('H', [0x0201, 0x0403, 0x0605]))
+assert(stream.get_last_values() == [3, 2, (0x0605, 0)])
+
+stream = StreamArray(get_payload_codec('H 2B'), ('stream_chunk_offset', 'stream_chunk_data'), 5, array.array)
+stream.add_response(b('\0\0\0\0\0\0\0\0\x02\0\x01\x02'))
+
+assert(stream.out_of_sync)
+assert(stream.get_missing_chunk_count() == 0)
+assert(stream.has_remaining_chunks())
+
+try:
+    StreamArray(get_payload_codec('H 2B'), ('stream_chunk_offset', 'stream_chunk_data'), 5, list)
+    assert(False)
+except ValueError:
+    pass
+
+#
+# CallbackStream
+#
+
+stream = CallbackStream(get_payload_codec('H H 3H'), ('stream_length', 'stream_chunk_offset', 'stream_chunk_data'),
+                        {'fixed_length': None, 'single_chunk': False})
+
+assert(stream.add_packet(b('\0\0\0\0\0\0\0\0\x04\0\x03\0\x01\0\x02\0\x03\0')) == (False, None)) # tail of a stream
+assert(stream.add_packet(b('\0\0\0\0\0\0\0\0\x04\0\0\0\x01\0\x02\0\x03\0')) == (False, None))
+assert(stream.add_packet(b('\0\0\0\0\0\0\0\0\x04\0\x03\0\x04\0\0\0\0\0')) == (True, (1, 2, 3, 4)))
+assert(stream.add_packet(b('\0\0\0\0\0\0\0\0\x04\0\0\0\x05\0\x06\0\x07\0')) == (False, None))
+assert(stream.add_packet(b('\0\0\0\0\0\0\0\0\x04\0\x06\0\x08\0\0\0\0\0')) == (True, None)) # out-of-sync
+
+stream = CallbackStream(get_payload_codec('H 3! B'), ('stream_chunk_offset', 'stream_chunk_data', None),
+                        {'fixed_length': 5, 'single_chunk': False})
+
+assert(stream.add_packet(b('\0\0\0\0\0\0\0\0\0\0\x05\0')) == (False, None))
+assert(stream.add_packet(b('\0\0\0\0\0\0\0\0\x03\0\x02\0')) == (True, (True, False, True, False, True)))
+
+#
+# CallbackQueue
+#
+
+PACKET = IPConnection.QUEUE_PACKET
+META = IPConnection.QUEUE_META
+QUEUED = IPConnection.CallbackQueue.RESULT_QUEUED
+DROPPED = IPConnection.CallbackQueue.RESULT_DROPPED
+COALESCED = IPConnection.CallbackQueue.RESULT_COALESCED
+
+q = IPConnection.CallbackQueue(2, IPConnection.OVERFLOW_POLICY_DROP_OLDEST)
+
+assert(q.put((PACKET, 'a')) == QUEUED)
+assert(q.put((META, 'm')) == QUEUED)
+assert(q.put((PACKET, 'b')) == QUEUED)
+assert(q.put((PACKET, 'c')) == DROPPED)
+assert(q.put((META, 'n')) == QUEUED) # meta items are never dropped
+assert([q.get() for _ in range(q.qsize())] == [(META, 'm'), (PACKET, 'b'), (PACKET, 'c'), (META, 'n')])
+
+q = IPConnection.CallbackQueue(2, IPConnection.OVERFLOW_POLICY_DROP_NEWEST)
+
+assert(q.put((PACKET, 'a')) == QUEUED)
+assert(q.put((PACKET, 'b')) == QUEUED)
+assert(q.put((PACKET, 'c')) == DROPPED)
+assert([q.get() for _ in range(q.qsize())] == [(PACKET, 'a'), (PACKET, 'b')])
+
+q = IPConnection.CallbackQueue(2, IPConnection.OVERFLOW_POLICY_COALESCE)
+
+assert(q.put((PACKET, 'a'), (1, 5)) == QUEUED)
+assert(q.put((PACKET, 'b'), (2, 5)) == QUEUED)
+assert(q.put((PACKET, 'c'), (1, 5)) == COALESCED)
+assert(q.put((PACKET, 'd'), None) == DROPPED) # nothing to coalesce, oldest is dropped
+assert([q.get() for _ in range(q.qsize())] == [(PACKET, 'b'), (PACKET, 'd')])
+
+#
+# stub Brick Daemon
+#
+
+class StubBrickDaemon(object):
+    # accepts one connection and answers each request by sending it back as
+    # its response after the given delay. each request is answered from a
+    # thread of its own, so the responses of concurrent requests can overtake
+    # each other
+    def __init__(self, delay):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.socket = None # protected by lock
+        self.sequence_numbers = [] # protected by lock
+        self.in_flight = 0 # protected by lock
+        self.max_in_flight = 0 # protected by lock
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(1)
+        self.port = self.server.getsockname()[1]
+
+        thread = threading.Thread(target=self.receive_loop)
+        thread.daemon = True
+        thread.start()
+
+    def receive_loop(self):
+        sock, _ = self.server.accept()
+        self.server.close()
+        pending = b('')
+
+        with self.lock:
+            self.socket = sock
+
+        while True:
+            data = sock.recv(4096)
+
+            if len(data) == 0:
+                break
+
+            pending += data
+
+            while len(pending) >= 8 and len(pending) >= get_length_from_data(pending):
+                request = pending[:get_length_from_data(pending)]
+                pending = pending[len(request):]
+
+                if get_function_id_from_data(request) == IPConnection.FUNCTION_DISCONNECT_PROBE:
+                    continue
+
+                with self.lock:
+                    self.sequence_numbers.append(get_sequence_number_from_data(request))
+
+                thread = threading.Thread(target=self.respond, args=(sock, request))
+                thread.daemon = True
+                thread.start()
+
+        sock.close()
+
+    def respond(self, sock, request):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        time.sleep(self.delay)
+
+        with self.lock:
+            self.in_flight -= 1
+
+            try:
+                sock.sendall(request)
+            except socket.error:
+                pass # the connection was closed in the meantime
+
+    def send_callback(self, device, value):
+        with self.lock:
+            self.socket.sendall(struct.pack('<IBBBBI', device.uid, 12, StubDevice.CALLBACK_VALUE, 0, 0, value))
+
+class StubDevice(Device):
+    FUNCTION_ECHO = 1
+    CALLBACK_VALUE = 2
+
+    def __init__(self, uid, ipcon):
+        Device.__init__(self, uid, ipcon)
+
+        self.api_version = (2, 0, 0)
+
+        self.response_expected[StubDevice.FUNCTION_ECHO] = StubDevice.RESPONSE_EXPECTED_ALWAYS_TRUE
+
+        self.callback_formats[StubDevice.CALLBACK_VALUE] = 'I'
+
+    def echo(self, value):
+        return self.ipcon.send_request(self, StubDevice.FUNCTION_ECHO, (value,), 'I', 'I')
+
+def fail(called, message):
+    called.append(message)
+    raise ValueError(message)
+
+def wait_for(condition):
+    timeout = time.time() + 5
+
+    while not condition():
+        assert(time.time() < timeout)
+        time.sleep(0.001)
+
+#
+# call_many and pipelining
+#
+
+stub = StubBrickDaemon(0.02)
+ipcon = IPConnection()
+ipcon.connect('127.0.0.1', stub.port)
+device = StubDevice('a', ipcon)
+
+# without pipelining the calls are executed one after another
+assert(ipcon.call_many([(device.echo, i) for i in range(4)]) == [0, 1, 2, 3])
+assert(stub.max_in_flight == 1)
+
+# the remaining calls are executed after a failed call, then the first error is raised
+called = []
+
+try:
+    ipcon.call_many([(fail, called, 'a'), (device.echo, 5), (fail, called, 'b'), (called.append, 'c')])
+    assert(False)
+except ValueError as e:
+    assert(str(e) == 'a')
+
+assert(called == ['a', 'b', 'c'])
+
+# with pipelining the calls are executed concurrently
+ipcon.set_pipelining(True)
+
+assert(ipcon.call_many([(device.echo, i) for i in range(40)]) == list(range(40)))
+assert(1 < stub.max_in_flight <= 15)
+
+called = []
+
+try:
+    device.call_many([(fail, called, 'a'), (device.echo, 5), (fail, called, 'b'), (called.append, 'c')])
+    assert(False)
+except ValueError as e:
+    assert(str(e) == 'a')
+
+assert(sorted(called) == ['a', 'b', 'c'])
+
+# if the sequence number of a request in flight comes around again then
+# another one is picked, otherwise the responses could not be told apart
+results = []
+
+with stub.lock:
+    del stub.sequence_numbers[:]
+
+ipcon.next_sequence_number = 0
+thread = threading.Thread(target=lambda: results.append(device.echo(1)))
+thread.start()
+
+while len(stub.sequence_numbers) == 0:
+    time.sleep(0.001)
+
+ipcon.next_sequence_number = 0
+
+assert(device.echo(2) == 2)
+
+thread.join()
+
+assert(results == [1])
+assert(stub.sequence_numbers[0] == 1 and stub.sequence_numbers[1] != 1)
+
+# disconnect ends and joins the pipeline threads
+ipcon.disconnect()
+
+assert(not any([thread.name == 'Pipeline-Processor' for thread in threading.enumerate()]))
+
+#
+# send_requests
+#
+
+stub = StubBrickDaemon(0.02)
+ipcon = IPConnection()
+ipcon.connect('127.0.0.1', stub.port)
+device = StubDevice('a', ipcon)
+
+# without pipelining the requests are sent one after another
+assert(ipcon.send_requests(device, StubDevice.FUNCTION_ECHO, [(i,) for i in range(20)], 'I', 'I') == list(range(20)))
+assert(stub.max_in_flight == 1)
+
+# with raw set the response packets are returned
+assert([response[8:] for response in ipcon.send_requests(device, StubDevice.FUNCTION_ECHO, [(1,), (2,)], 'I', 'I', True)] == [b('\x01\0\0\0'), b('\x02\0\0\0')])
+
+# with pipelining up to 15 requests are in flight and the results keep their order
+ipcon.set_pipelining(True)
+
+assert(ipcon.send_requests(device, StubDevice.FUNCTION_ECHO, [(i,) for i in range(40)], 'I', 'I') == list(range(40)))
+assert(1 < stub.max_in_flight <= 15)
+assert([response[8:] for response in ipcon.send_requests(device, StubDevice.FUNCTION_ECHO, [(1,), (2,)], 'I', 'I', True)] == [b('\x01\0\0\0'), b('\x02\0\0\0')])
+
+ipcon.disconnect()
+
+#
+# statistics
+#
+
+stub = StubBrickDaemon(0.02)
+ipcon = IPConnection()
+ipcon.connect('127.0.0.1', stub.port)
+device = StubDevice('a', ipcon)
+received = []
+
+device.registered_callbacks[StubDevice.CALLBACK_VALUE] = received.append
+
+assert(ipcon.get_statistics() is None)
+
+ipcon.set_statistics_enabled(True)
+
+assert(ipcon.get_statistics_enabled())
+
+for i in range(5):
+    device.echo(i)
+
+for i in range(3):
+    stub.send_callback(device, i)
+
+wait_for(lambda: len(received) == 3)
+
+ipcon.set_timeout(0.005)
+
+try:
+    device.echo(5)
+    assert(False)
+except Error as e:
+    assert(e.value == Error.TIMEOUT)
+
+ipcon.set_timeout(2.5)
+
+statistics = ipcon.get_statistics(True)
+request = statistics['requests'][('a', StubDevice.FUNCTION_ECHO)]
+
+assert(statistics['packets_sent'] == 6 and statistics['bytes_sent'] == 6 * 12)
+assert(statistics['packets_received'] >= 8) # the late response can arrive in time
+assert(request['count'] == 6 and request['timeouts'] == 1)
+assert(0.02 <= request['rtt_max'] < 2.5 and request['rtt_sum'] >= 5 * 0.02)
+assert(sum(request['rtt_histogram']) == 5)
+assert(len(request['rtt_histogram']) == len(statistics['rtt_buckets']) + 1)
+assert(statistics['callbacks'][('a', StubDevice.CALLBACK_VALUE)]['count'] == 3)
+assert(statistics['devices']['a']['requests'] == 6 and statistics['devices']['a']['callbacks'] == 3)
+
+wait_for(lambda: ipcon.get_callback_queue_depth() == 0)
+time.sleep(0.05) # let the late response arrive before the reset
+
+ipcon.get_statistics(True)
+statistics = ipcon.get_statistics()
+
+assert(statistics['packets_sent'] == 0 and statistics['requests'] == {} and statistics['callbacks'] == {})
+
+# the statistics are reset after each export
+snapshots = []
+
+ipcon.set_statistics_export(snapshots.append, 0.05)
+device.echo(1)
+
+wait_for(lambda: len(snapshots) >= 2)
+
+ipcon.set_statistics_export(None)
+
+assert(snapshots[0]['requests'][('a', StubDevice.FUNCTION_ECHO)]['count'] == 1)
+assert(snapshots[1]['requests'] == {})
+
+wait_for(lambda: not any([thread.name == 'Statistics-Exporter' for thread in threading.enumerate()]))
+
+# disabling the statistics while packets are received doesn't break the connection
+for i in range(50):
+    stub.send_callback(device, i)
+    ipcon.set_statistics_enabled(i % 2 == 0)
+
+assert(device.echo(7) == 7)
+
+ipcon.disconnect()
+
+#
+# capture and replay
+#
+
+stub = StubBrickDaemon(0.001)
+ipcon = IPConnection()
+ipcon.connect('127.0.0.1', stub.port)
+device = StubDevice('a', ipcon)
+received = []
+fd, filename = tempfile.mkstemp()
+os.close(fd)
+
+device.registered_callbacks[StubDevice.CALLBACK_VALUE] = received.append
+
+ipcon.start_capture(filename)
+
+for i in range(3):
+    device.echo(i)
+
+for i in range(5):
+    stub.send_callback(device, i)
+
+wait_for(lambda: len(received) == 5)
+
+ipcon.stop_capture()
+device.echo(3) # not captured anymore
+ipcon.disconnect()
+
+records = list(read_capture(filename))
+
+assert([direction for _, direction, _ in records] == [PacketCapture.DIRECTION_SENT, PacketCapture.DIRECTION_RECEIVED] * 3 +
+                                                     [PacketCapture.DIRECTION_RECEIVED] * 5)
+assert(records[0][2][8:] == b('\0\0\0\0') and records[-1][2][8:] == b('\x04\0\0\0'))
+
+# the recorded callbacks are received again and requests are answered with
+# the recorded responses, the last one is repeated
+ipcon = ReplayIPConnection(filename, 0)
+device = StubDevice('a', ipcon)
+received = []
+
+device.registered_callbacks[StubDevice.CALLBACK_VALUE] = received.append
+
+ipcon.connect('localhost', 4223)
+
+assert(ipcon.wait_for_replay(5))
+
+wait_for(lambda: len(received) == 5)
+
+assert(received == list(range(5)))
+assert([device.echo(7) for _ in range(4)] == [0, 1, 2, 2])
+
+# requests without a recorded response fail instead of timing out
+try:
+    StubDevice('b', ipcon).echo(7)
+    assert(False)
+except Error as e:
+    assert(e.value == Error.NOT_SUPPORTED)
+
+ipcon.disconnect()
+
+os.remove(filename)
+
+#
+# IPConnectionPool
+#
+
+if sys.hexversion >= 0x03040000: # the pool requires selectors
+    from ip_connection_pool import IPConnectionPool
+
+    pool = IPConnectionPool(2)
+    stubs = [StubBrickDaemon(0.01) for _ in range(3)]
+    ipcons = [pool.create_ip_connection() for _ in stubs]
+    devices = [StubDevice('a', ipcon) for ipcon in ipcons]
+    received = [[] for _ in stubs]
+
+    assert(pool.get_ip_connections() == ipcons)
+
+    for ipcon, values in zip(ipcons, received):
+        ipcon.register_callback(IPConnection.CALLBACK_CONNECTED, lambda reason, values=values: values.append('connected'))
+
+    for device, values in zip(devices, received):
+        device.registered_callbacks[StubDevice.CALLBACK_VALUE] = values.append
+
+    threads = threading.active_count()
+
+    for ipcon, stub in zip(ipcons, stubs):
+        ipcon.connect('127.0.0.1', stub.port)
+
+    # the connections don't start threads of their own
+    assert(threading.active_count() == threads)
+
+    # the requests of all connections are answered
+    assert([device.echo(i) for i, device in enumerate(devices)] == [0, 1, 2])
+
+    ipcons[0].set_pipelining(True)
+
+    assert(ipcons[0].call_many([(devices[0].echo, i) for i in range(20)]) == list(range(20)))
+
+    ipcons[0].set_pipelining(False)
+
+    # the callbacks of a connection are dispatched in order, after its connected callback
+    for i in range(20):
+        for device, stub in zip(devices, stubs):
+            stub.send_callback(device, i)
+
+    wait_for(lambda: all([len(values) == 21 for values in received]))
+
+    assert(all([values == ['connected'] + list(range(20)) for values in received]))
+
+    # a pooled connection has no callback threads of its own
+    try:
+        ipcons[0].set_callback_threads(2)
+        assert(False)
+    except Error as e:
+        assert(e.value == Error.NOT_SUPPORTED)
+
+    # a disconnected connection is not dispatched anymore, the others are
+    ipcons[0].disconnect()
+    stubs[1].send_callback(devices[1], 20)
+
+    wait_for(lambda: len(received[1]) == 22)
+
+    assert(ipcons[0].get_connection_state() == IPConnection.CONNECTION_STATE_DISCONNECTED)
+    assert(devices[2].echo(7) == 7)
+
+    # close disconnects all connections and ends the threads of the pool
+    pool.close()
+
+    assert(all([ipcon.get_connection_state() == IPConnection.CONNECTION_STATE_DISCONNECTED for ipcon in ipcons]))
+    assert(not any([thread.name in ['Brickd-Multiplexer', 'Auto-Reconnector', 'Callback-Processor'] for thread in threading.enumerate()]))
+
+    try:
+        pool.create_ip_connection()
+        assert(False)
+    except Error as e:
+        assert(e.value == Error.NOT_SUPPORTED)
@@ -36,6 +36,11 @@ class PythonTester(common.Tester):
         self.python = python
 
     def test(self, cookie, path, extra):
+        # the asyncio variants require Python 3
+        if self.python == 'python' and os.path.basename(path).startswith('async_'):
+            self.handle_result(cookie, 0, '>>> skipping')
+            return
+
         args = [self.python,
                 '-c',
                 'import py_compile; py_compile.compile("{0}", doraise=True)'.format(path)]
@@ -49,6 +54,11 @@ class PylintTester(common.Tester):
         self.python = python
 
     def test(self, cookie, path, extra):
+        # the asyncio variants require Python 3
+        if self.python == 'python' and os.path.basename(path).startswith('async_'):
+            self.handle_result(cookie, 0, '>>> skipping')
+            return
+
         if self.python == 'python3':
             with open(path, 'r') as f:
                 code = f.read()
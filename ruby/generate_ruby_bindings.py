@@ -631,6 +631,8 @@ class RubyBindingsPacket(ruby_common.RubyPacket):
         return ' '.join(forms), total_size
 
 class RubyBindingsGenerator(ruby_common.RubyGeneratorTrait, common.BindingsGenerator):
+    incremental_state = ['released_files']
+
     def get_bindings_name(self):
         return 'ruby'
 
@@ -649,8 +651,7 @@ class RubyBindingsGenerator(ruby_common.RubyGeneratorTrait, common.BindingsGener
     def generate(self, device):
         filename = '{0}_{1}.rb'.format(device.get_category().under, device.get_name().under)
 
-        with open(os.path.join(self.get_bindings_dir(), filename), 'w') as f:
-            f.write(device.get_ruby_source())
+        common.write_output_file(os.path.join(self.get_bindings_dir(), filename), device.get_ruby_source())
 
         if device.is_released():
             self.released_files.append(filename)
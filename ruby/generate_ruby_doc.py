@@ -422,8 +422,7 @@ class RubyDocGenerator(ruby_common.RubyGeneratorTrait, common.DocGenerator):
         return ruby_common.RubyElement
 
     def generate(self, device):
-        with open(device.get_doc_rst_path(), 'w') as f:
-            f.write(device.get_ruby_doc())
+        common.write_output_file(device.get_doc_rst_path(), device.get_ruby_doc())
 
 def generate(root_dir, language):
     common.generate(root_dir, language, RubyDocGenerator)
@@ -616,8 +616,7 @@ class RubyExamplesGenerator(ruby_common.RubyGeneratorTrait, common.ExamplesGener
             else:
                 print('  - ' + filename)
 
-            with open(filepath, 'w') as f:
-                f.write(example.get_ruby_source())
+            common.write_output_file(filepath, example.get_ruby_source())
 
 def generate(root_dir):
     common.generate(root_dir, 'en', RubyExamplesGenerator)
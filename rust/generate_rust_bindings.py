@@ -677,8 +677,7 @@ class RustBindingsGenerator(rust_common.RustGeneratorTrait, common.BindingsGener
         else:
             filename = '{0}_{1}'.format(device.get_name().under, device.get_category().under)
 
-        with open(os.path.join(self.get_bindings_dir(), filename + '.rs'), 'w') as f:
-            f.write(device.get_rust_source())
+        common.write_output_file(os.path.join(self.get_bindings_dir(), filename + '.rs'), device.get_rust_source())
 
         if device.is_released():
             self.released_files.append(filename + '.rs')
@@ -780,10 +779,8 @@ impl FromByteSlice for [bool; {count}] {{
                 if typestring in packet_param_types or typestring in packet_return_types:
                     array_impl.append(template.format(type=primitive_type, count=i, count_in_bytes=size_in_bytes*i, unchecked=("" if "f" not in primitive_type else "_unchecked")))
 
-        with open(os.path.join(self.get_bindings_dir(), 'byte_converter.rs'), 'w') as f:
-            f.write(primitive_type_impl)
-            f.write("\n")
-            f.write("\n\n".join(array_impl))
+        common.write_output_file(os.path.join(self.get_bindings_dir(), 'byte_converter.rs'),
+                                 primitive_type_impl + "\n" + "\n\n".join(array_impl))
 
     def write_cargo_toml(self):
         common.specialize_template(os.path.join(self.get_root_dir(), "Cargo.toml.template"), os.path.join(self.get_bindings_dir(), "Cargo.toml"), {"{version}": '"'+".".join(list(self.get_changelog_version())) + '"'})
@@ -812,13 +809,11 @@ pub mod device;
 pub mod ip_connection;
 pub mod low_level_traits;
 """
-        with open(os.path.join(self.get_bindings_dir(), 'lib.rs'), 'w') as f:
-            f.write(template.format(version=".".join(list(self.get_changelog_version()))))
+        common.write_output_file(os.path.join(self.get_bindings_dir(), 'lib.rs'), template.format(version=".".join(list(self.get_changelog_version()))))
 
         bindings_mod_template = """pub mod {module};"""
         decls = [bindings_mod_template.format(module=f.replace(".rs", "")) for f in self.released_files]
-        with open(os.path.join(self.get_bindings_dir(), 'mod.rs'), 'w') as f:
-            f.write("\n".join(decls))
+        common.write_output_file(os.path.join(self.get_bindings_dir(), 'mod.rs'), "\n".join(decls))
 
     def finish(self):
         self.write_cargo_toml()
@@ -348,8 +348,7 @@ class RustDocGenerator(rust_common.RustGeneratorTrait, common.DocGenerator):
         return rust_common.RustElement
 
     def generate(self, device):
-        with open(device.get_doc_rst_path(), 'w') as f:
-            f.write(device.get_rust_doc())
+        common.write_output_file(device.get_doc_rst_path(), device.get_rust_doc())
 
 def generate(root_dir, language):
     common.generate(root_dir, language, RustDocGenerator)
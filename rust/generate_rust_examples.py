@@ -700,8 +700,7 @@ class RustExamplesGenerator(rust_common.RustGeneratorTrait, common.ExamplesGener
             else:
                 print('  - ' + filename)
 
-            with open(filepath, 'w') as f:
-                f.write(example.get_rust_source())
+            common.write_output_file(filepath, example.get_rust_source())
             if not example.is_incomplete():
                 version = subprocess.check_output(["rustfmt", "--version"])
                 if not 'nightly' in version.decode('utf-8'):
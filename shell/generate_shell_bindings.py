@@ -563,8 +563,7 @@ class ShellBindingsGenerator(shell_common.ShellGeneratorTrait, common.BindingsGe
 
         filename = '{0}.part'.format(device.get_shell_device_name())
 
-        with open(os.path.join(self.get_bindings_dir(), filename), 'w') as f:
-            f.write(device.get_shell_source())
+        common.write_output_file(os.path.join(self.get_bindings_dir(), filename), device.get_shell_source())
 
         self.part_files.append(filename)
 
@@ -574,7 +573,7 @@ class ShellBindingsGenerator(shell_common.ShellGeneratorTrait, common.BindingsGe
         root_dir = self.get_root_dir()
         bindings_dir = self.get_bindings_dir()
         version = self.get_changelog_version()
-        shell = open(os.path.join(bindings_dir, 'tinkerforge'), 'w')
+        shell = []
 
         with open(os.path.join(root_dir, 'tinkerforge.header'), 'r') as f:
             header = f.read().replace('<<VERSION>>', '.'.join(version))
@@ -582,23 +581,24 @@ class ShellBindingsGenerator(shell_common.ShellGeneratorTrait, common.BindingsGe
         with open(os.path.join(root_dir, 'tinkerforge.footer'), 'r') as f:
             footer = f.read().replace('<<VERSION>>', '.'.join(version))
 
-        shell.write(header)
+        shell.append(header)
 
         with open(os.path.join(root_dir, '..', 'python', 'ip_connection.py'), 'r') as f:
             ipcon = f.read()
 
-        shell.write('\n\n\n' + ipcon + '\n\n\n')
+        shell.append('\n\n\n' + ipcon + '\n\n\n')
 
         for filename in sorted(self.part_files):
             if filename.endswith('.part'):
                 with open(os.path.join(bindings_dir, filename), 'r') as f:
-                    shell.write(f.read())
+                    shell.append(f.read())
 
-        shell.write('\ncall_devices = {\n' + ',\n'.join(self.call_devices) + '\n}\n')
-        shell.write('\ndispatch_devices = {\n' + ',\n'.join(self.dispatch_devices) + '\n}\n')
-        shell.write('\ndevice_identifier_symbols = {\n' + ',\n'.join(self.device_identifier_symbols) + '\n}\n')
-        shell.write(footer)
-        shell.close()
+        shell.append('\ncall_devices = {\n' + ',\n'.join(self.call_devices) + '\n}\n')
+        shell.append('\ndispatch_devices = {\n' + ',\n'.join(self.dispatch_devices) + '\n}\n')
+        shell.append('\ndevice_identifier_symbols = {\n' + ',\n'.join(self.device_identifier_symbols) + '\n}\n')
+        shell.append(footer)
+
+        common.write_output_file(os.path.join(bindings_dir, 'tinkerforge'), ''.join(shell))
 
         os.system('chmod +x {0}/tinkerforge'.format(bindings_dir))
 
@@ -622,8 +622,7 @@ class ShellBindingsGenerator(shell_common.ShellGeneratorTrait, common.BindingsGe
         else:
             template = template.replace('<<CALLBACK>>', '')
 
-        with open(os.path.join(bindings_dir, 'tinkerforge-bash-completion.sh'), 'w') as f:
-            f.write(template)
+        common.write_output_file(os.path.join(bindings_dir, 'tinkerforge-bash-completion.sh'), template)
 
 def generate(root_dir):
     common.generate(root_dir, 'en', ShellBindingsGenerator)
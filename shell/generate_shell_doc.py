@@ -504,8 +504,7 @@ class ShellDocGenerator(shell_common.ShellGeneratorTrait, common.DocGenerator):
         return shell_common.ShellElement
 
     def generate(self, device):
-        with open(device.get_doc_rst_path(), 'w') as f:
-            f.write(device.get_shell_doc())
+        common.write_output_file(device.get_doc_rst_path(), device.get_shell_doc())
 
 def generate(root_dir, language):
     common.generate(root_dir, language, ShellDocGenerator)
@@ -462,8 +462,7 @@ class ShellExamplesGenerator(shell_common.ShellGeneratorTrait, common.ExamplesGe
             else:
                 print('  - ' + filename)
 
-            with open(filepath, 'w') as f:
-                f.write(example.get_shell_source())
+            common.write_output_file(filepath, example.get_shell_source())
 
             os.chmod(filepath, 0o755)
 
@@ -0,0 +1,893 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Brick Daemon Simulator
+
+brickd_simulator.py: Brick Daemon stand-in for testing bindings without hardware
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+General Public License for more details.
+
+You should have received a copy of the GNU General Public
+License along with this program; if not, write to the
+Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+Boston, MA 02111-1307, USA.
+"""
+
+# the simulator accepts TCP/IP connections like a Brick Daemon and simulates
+# devices based on the same device model that the generators build from the
+# configs/*_config.py files. every function is answered with a well-formed
+# response of the correct size, high-level streams are answered with chunks
+# in the correct order, callbacks are emitted at configurable rates and the
+# responses can be delayed to simulate a slow connection. the simulated
+# devices have no behavior, all response values are zero except for the
+# identity, enumeration and stream bookkeeping values. usage:
+#
+#   python brickd_simulator.py --callback-rate 10 bricklet_temperature_v2 bricklet_rs485:Fcx
+#
+# without device arguments one device of every released device type is
+# simulated
+
+import sys
+import os
+import socket
+import struct
+import threading
+import heapq
+import random
+import time
+import argparse
+
+sys.path.append(os.path.split(os.path.dirname(os.path.realpath(__file__)))[0])
+import common
+
+BASE58 = '123456789abcdefghijkmnopqrstuvwxyzABCDEFGHJKLMNPQRSTUVWXYZ'
+
+FUNCTION_ENUMERATE = 254
+FUNCTION_GET_IDENTITY = 255
+CALLBACK_ENUMERATE = 253
+
+BRICK_DAEMON_UID = 1
+BRICK_DAEMON_FUNCTION_GET_AUTHENTICATION_NONCE = 1
+BRICK_DAEMON_FUNCTION_AUTHENTICATE = 2
+
+ENUMERATION_TYPE_AVAILABLE = 0
+
+ERROR_CODE_INVALID_PARAMETER = 1
+ERROR_CODE_FUNCTION_NOT_SUPPORTED = 2
+
+header_struct = struct.Struct('<IBBBB')
+enumerate_struct = struct.Struct('<8s8sc3B3BHB')
+identity_struct = struct.Struct('<8s8sc3B3BH')
+
+size_formats = {
+    1: '<B',
+    2: '<H',
+    4: '<I',
+    8: '<Q'
+}
+
+def base58encode(value):
+    encoded = ''
+
+    while value >= 58:
+        value, mod = divmod(value, 58)
+        encoded = BASE58[mod] + encoded
+
+    return BASE58[value] + encoded
+
+def base58decode(encoded):
+    value = 0
+    column_multiplier = 1
+
+    for c in encoded[::-1]:
+        if c not in BASE58:
+            raise ValueError('UID "{0}" contains invalid character'.format(encoded))
+
+        column = BASE58.index(c)
+        value += column * column_multiplier
+        column_multiplier *= 58
+
+    return value
+
+def make_header(uid, length, function_id, sequence_number_and_options, error_code=0):
+    return header_struct.pack(uid, length, function_id, sequence_number_and_options, error_code << 6)
+
+def get_element_offsets(packet, direction):
+    # returns the payload offset of every element of the given direction
+    offsets = {}
+    offset = 0
+
+    for element in packet.get_elements(direction=direction):
+        offsets[element] = offset
+        offset += element.get_size()
+
+    return offsets
+
+class SimulatorGenerator(common.Generator):
+    # the generator is only used to build the device model from the configs
+    check_root_dir_name = False
+
+    def get_bindings_name(self):
+        return 'tcpip'
+
+    def get_bindings_display_name(self):
+        return 'TCP/IP'
+
+    def get_doc_null_value_name(self):
+        return 'null'
+
+    def get_doc_formatted_param(self, element):
+        return element.get_name().under
+
+class SimulatedStreamOut(object):
+    # produces the low-level chunks of a high-level stream_out function or
+    # callback. the stream is stateless, the caller keeps track of the chunk
+    # offset. the chunk offset of the next chunk wraps around at the end of
+    # the stream
+
+    def __init__(self, packet, stream_length):
+        stream = packet.get_high_level('stream_out')
+        offsets = get_element_offsets(packet, 'out')
+        in_offsets = get_element_offsets(packet, 'in')
+        chunk_data_element = stream.get_chunk_data_element()
+
+        self.response_size = packet.get_response_size()
+        self.chunk_cardinality = chunk_data_element.get_cardinality()
+
+        if stream.has_single_chunk():
+            self.length = min(stream_length, self.chunk_cardinality)
+        else:
+            self.length = stream.get_fixed_length(stream_length)
+
+        if stream.get_length_element() != None:
+            length_element = stream.get_length_element()
+            self.length_format = size_formats[length_element.get_item_size()]
+            self.length_offset = 8 + offsets[length_element]
+            self.length = min(self.length, (1 << (8 * length_element.get_item_size())) - 1)
+        else:
+            self.length_format = None
+            self.length_offset = None
+
+        if stream.get_chunk_offset_element() != None:
+            chunk_offset_element = stream.get_chunk_offset_element()
+            self.chunk_offset_format = size_formats[chunk_offset_element.get_item_size()]
+            self.chunk_offset_offset = 8 + offsets[chunk_offset_element]
+        else:
+            self.chunk_offset_format = None
+            self.chunk_offset_offset = None
+
+        # variable-length getters limit the stream by their request, either
+        # by a length parameter (rs485.read) or by a pixel window (lcd.read_pixels)
+        in_elements = dict([(element.get_name().space, element) for element in packet.get_elements(direction='in')])
+
+        self.request_length = None
+        self.request_window = None
+
+        if stream.get_fixed_length() == None and not stream.has_single_chunk():
+            if 'Length' in in_elements:
+                element = in_elements['Length']
+                self.request_length = (size_formats[element.get_item_size()], 8 + in_offsets[element])
+            elif all([name in in_elements for name in ['X Start', 'Y Start', 'X End', 'Y End']]):
+                self.request_window = [(size_formats[in_elements[name].get_item_size()], 8 + in_offsets[in_elements[name]])
+                                       for name in ['X Start', 'Y Start', 'X End', 'Y End']]
+
+    def get_length(self, request=None):
+        # returns the stream length for the given request, or for a callback
+        # if there is no request
+        if request == None:
+            return self.length
+
+        if self.request_length != None:
+            return min(self.length, struct.unpack_from(self.request_length[0], request, self.request_length[1])[0])
+
+        if self.request_window != None:
+            x_start, y_start, x_end, y_end = [struct.unpack_from(form, request, offset)[0] for form, offset in self.request_window]
+
+            return min(self.length, max(0, x_end - x_start + 1) * max(0, y_end - y_start + 1))
+
+        return self.length
+
+    def get_chunk_count(self, length):
+        if length == 0:
+            return 1
+
+        return (length - 1) // self.chunk_cardinality + 1
+
+    def fill_chunk(self, packet, length, chunk_offset):
+        # returns the chunk offset of the next chunk
+        if self.length_offset != None:
+            struct.pack_into(self.length_format, packet, self.length_offset, length)
+
+        if self.chunk_offset_offset != None:
+            struct.pack_into(self.chunk_offset_format, packet, self.chunk_offset_offset, chunk_offset)
+
+        if length > 0 and chunk_offset + self.chunk_cardinality < length:
+            return chunk_offset + self.chunk_cardinality
+
+        return 0
+
+class SimulatedStreamIn(object):
+    # computes the number of written items for a stream_in function with
+    # short-write support from the length and chunk offset of the request
+
+    def __init__(self, packet):
+        stream = packet.get_high_level('stream_in')
+        in_offsets = get_element_offsets(packet, 'in')
+        out_offsets = get_element_offsets(packet, 'out')
+        chunk_written_element = packet.get_elements(direction='out', role='stream_chunk_written')[0]
+
+        self.chunk_cardinality = stream.get_chunk_data_element().get_cardinality()
+        self.fixed_length = stream.get_fixed_length()
+        self.chunk_written_format = size_formats[chunk_written_element.get_item_size()]
+        self.chunk_written_offset = 8 + out_offsets[chunk_written_element]
+
+        if stream.get_length_element() != None:
+            length_element = stream.get_length_element()
+            self.length_format = size_formats[length_element.get_item_size()]
+            self.length_offset = 8 + in_offsets[length_element]
+        else:
+            self.length_format = None
+            self.length_offset = None
+
+        if stream.get_chunk_offset_element() != None:
+            chunk_offset_element = stream.get_chunk_offset_element()
+            self.chunk_offset_format = size_formats[chunk_offset_element.get_item_size()]
+            self.chunk_offset_offset = 8 + in_offsets[chunk_offset_element]
+        else:
+            self.chunk_offset_format = None
+            self.chunk_offset_offset = None
+
+    def fill_chunk_written(self, request, packet):
+        if self.length_offset != None:
+            length = struct.unpack_from(self.length_format, request, self.length_offset)[0]
+        else:
+            length = self.fixed_length
+
+        if self.chunk_offset_offset != None:
+            chunk_offset = struct.unpack_from(self.chunk_offset_format, request, self.chunk_offset_offset)[0]
+        else:
+            chunk_offset = 0
+
+        chunk_written = max(0, min(self.chunk_cardinality, length - chunk_offset))
+
+        struct.pack_into(self.chunk_written_format, packet, self.chunk_written_offset, chunk_written)
+
+class SimulatedFunction(object):
+    def __init__(self, packet, stream_length):
+        self.function_id = packet.get_function_id()
+        self.request_size = packet.get_request_size()
+        self.response_size = packet.get_response_size()
+        self.stream_out = None
+        self.stream_in = None
+
+        if packet.get_high_level('stream_out') != None:
+            self.stream_out = SimulatedStreamOut(packet, stream_length)
+        elif packet.get_high_level('stream_in') != None and \
+             len(packet.get_elements(direction='out', role='stream_chunk_written')) > 0:
+            self.stream_in = SimulatedStreamIn(packet)
+
+class SimulatedCallback(object):
+    def __init__(self, packet, stream_length, callback_rates):
+        self.function_id = packet.get_function_id()
+        self.name = packet.get_name(skip=-2 if packet.has_high_level() else 0)
+        self.response_size = packet.get_response_size()
+        self.rate = callback_rates.get(self.name.under, callback_rates.get(None, 0))
+        self.stream_out = None
+
+        if packet.get_high_level('stream_out') != None:
+            self.stream_out = SimulatedStreamOut(packet, stream_length)
+
+class SimulatedDevice(object):
+    def __init__(self, device, uid, connected_uid, position, stream_length, callback_rates):
+        self.device = device
+        self.uid = uid
+        self.connected_uid = connected_uid
+        self.position = position
+        self.functions = {}
+        self.callbacks = []
+
+        self.firmware_version = [2, 0, 0]
+
+        for packet in device.get_packets():
+            since_firmware = packet.get_since_firmware()
+
+            if since_firmware != None and since_firmware > self.firmware_version:
+                self.firmware_version = since_firmware
+
+        for packet in device.get_packets('function'):
+            self.functions[packet.get_function_id()] = SimulatedFunction(packet, stream_length)
+
+        for packet in device.get_packets('callback'):
+            self.callbacks.append(SimulatedCallback(packet, stream_length, callback_rates))
+
+    def get_uid(self):
+        return base58encode(self.uid)
+
+    def get_identity_payload(self):
+        return identity_struct.pack(self.get_uid().encode('ascii'),
+                                    self.connected_uid.encode('ascii'),
+                                    self.position.encode('ascii'),
+                                    1, 0, 0,
+                                    *(self.firmware_version + [self.device.get_device_identifier()]))
+
+    def get_enumerate_payload(self):
+        return enumerate_struct.pack(self.get_uid().encode('ascii'),
+                                     self.connected_uid.encode('ascii'),
+                                     self.position.encode('ascii'),
+                                     1, 0, 0,
+                                     *(self.firmware_version + [self.device.get_device_identifier(),
+                                                                ENUMERATION_TYPE_AVAILABLE]))
+
+class SimulatorConnection(object):
+    # a client connection. received requests are answered by the receive
+    # thread, all outgoing packets are sent by the send thread at their due
+    # time. this allows to delay the responses without blocking the requests
+    # that are pipelined behind them
+
+    def __init__(self, simulator, sock, address):
+        self.simulator = simulator
+        self.socket = sock
+        self.address = address
+        self.pending = [] # heap of (due time, counter, packet), protected by condition
+        self.counter = 0 # protected by condition
+        self.closed = False # protected by condition
+        self.running_threads = 2 # protected by condition
+        self.condition = threading.Condition()
+        self.stream_offsets = {} # (uid, function ID) -> next chunk offset, only used by the receive thread
+        self.receive_thread = threading.Thread(name='Simulator-Receiver', target=self.receive_loop)
+        self.send_thread = threading.Thread(name='Simulator-Sender', target=self.send_loop)
+
+        self.receive_thread.daemon = True
+        self.send_thread.daemon = True
+
+    def start(self):
+        self.receive_thread.start()
+        self.send_thread.start()
+
+    def close(self):
+        with self.condition:
+            if self.closed:
+                return
+
+            self.closed = True
+
+        # the shutdown makes the blocking recv of the receive thread return.
+        # the socket is closed by the last of the two threads to exit, so the
+        # shutdown cannot fail because of an already closed socket
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+
+        with self.condition:
+            self.condition.notify()
+
+        self.simulator.remove_connection(self)
+
+    def join(self):
+        for thread in [self.receive_thread, self.send_thread]:
+            if thread != threading.current_thread():
+                thread.join()
+
+    def thread_exited(self):
+        with self.condition:
+            self.running_threads -= 1
+
+            if self.running_threads > 0:
+                return
+
+        self.socket.close()
+
+    def queue_packet(self, packet, delay=0):
+        with self.condition:
+            if self.closed:
+                return
+
+            due = time.time() + delay
+
+            heapq.heappush(self.pending, (due, self.counter, packet))
+            self.counter += 1
+
+            # only wake up the send thread if the new packet is due first
+            if self.pending[0][1] == self.counter - 1:
+                self.condition.notify()
+
+    def send_loop(self):
+        while True:
+            packets = []
+
+            with self.condition:
+                while not self.closed:
+                    if len(self.pending) > 0:
+                        timeout = self.pending[0][0] - time.time()
+
+                        if timeout <= 0:
+                            break
+                    else:
+                        timeout = None
+
+                    self.condition.wait(timeout)
+
+                if self.closed:
+                    break
+
+                # send all packets that are due in one go
+                now = time.time()
+
+                while len(self.pending) > 0 and self.pending[0][0] <= now:
+                    packets.append(heapq.heappop(self.pending)[2])
+
+            try:
+                self.socket.sendall(b''.join(packets))
+            except socket.error:
+                self.close()
+                break
+
+        self.thread_exited()
+
+    def receive_loop(self):
+        pending_data = b''
+
+        while True:
+            try:
+                data = self.socket.recv(8192)
+            except socket.error:
+                data = b''
+
+            if len(data) == 0:
+                self.close()
+                break
+
+            pending_data += data
+            offset = 0
+
+            while len(pending_data) - offset >= 8:
+                length = struct.unpack_from('<B', pending_data, offset + 4)[0]
+
+                if length < 8: # invalid length, drop all data like brickd does
+                    offset = len(pending_data)
+                    break
+
+                if len(pending_data) - offset < length:
+                    break
+
+                self.simulator.handle_request(self, pending_data[offset:offset + length])
+
+                offset += length
+
+            pending_data = pending_data[offset:]
+
+        self.thread_exited()
+
+class BrickdSimulator(object):
+    """
+    Simulates a Brick Daemon with the given devices. The devices are
+    simulated based on the device model built from the configs/*_config.py
+    files. Each response is delayed by *latency* plus a random *jitter* in
+    seconds.
+    """
+
+    def __init__(self, host='localhost', port=4223, latency=0, jitter=0, stream_length=None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.stream_length = stream_length
+        self.generator = SimulatorGenerator(os.path.dirname(os.path.realpath(__file__)), 'tinkerforge', 'en')
+        self.device_models = {} # config name -> common.Device
+        self.devices = {} # uid -> SimulatedDevice
+        self.connections = []
+        self.connections_lock = threading.Lock()
+        self.server_socket = None
+        self.accept_thread = None
+        self.callback_thread = None
+        self.callback_condition = threading.Condition()
+        self.callback_stopped = False # protected by callback_condition
+        self.callback_devices_added = [] # for the callback thread, protected by callback_condition
+
+        for name, com, _ in common.load_device_configs(self.generator.get_config_dir()):
+            self.device_models[name] = self.generator.get_device_class()(com, self.generator)
+
+    def get_device_names(self, released_only=True):
+        """
+        Returns the names of the configs that can be used with add_device.
+        """
+
+        return sorted([name for name, device in self.device_models.items()
+                       if device.is_released() or not released_only])
+
+    def add_device(self, name, uid=None, callback_rates=None):
+        """
+        Adds a device of the config with the given *name*, for example
+        'bricklet_temperature_v2'. The *uid* is given as Base58 string, a
+        free UID is chosen if it's *None*. The *callback_rates* dict maps the
+        callback names to the rate in Hz in which the callback is emitted, the
+        *None* key sets the rate for all other callbacks. High-level callbacks
+        are emitted as a complete stream of low-level callbacks. By default no
+        callbacks are emitted. Devices can also be added while the simulator
+        is running. Returns the UID.
+        """
+
+        if name not in self.device_models:
+            raise ValueError('Unknown device {0}'.format(name))
+
+        device = self.device_models[name]
+
+        if uid == None:
+            uid_number = 10000 + len(self.devices)
+
+            while uid_number in self.devices:
+                uid_number += 1
+        else:
+            uid_number = base58decode(uid)
+
+        if uid_number in self.devices or uid_number in [0, BRICK_DAEMON_UID]:
+            raise ValueError('UID {0} is already in use'.format(base58encode(uid_number)))
+
+        # bricks are stacked at position 0, bricklets are connected to the
+        # first brick, if there is one
+        if device.get_category().under == 'brick':
+            connected_uid = '0'
+            position = '0'
+        else:
+            bricks = [other for other in self.devices.values() if other.device.get_category().under == 'brick']
+            bricklets = [other for other in self.devices.values() if other.device.get_category().under != 'brick']
+
+            if len(bricks) > 0:
+                connected_uid = bricks[0].get_uid()
+            else:
+                connected_uid = '0'
+
+            position = 'abcdefgh'[len(bricklets) % 8]
+
+        if self.stream_length != None:
+            stream_length = self.stream_length
+        else:
+            stream_length = 1000
+
+        simulated_device = SimulatedDevice(device, uid_number, connected_uid, position,
+                                           stream_length, callback_rates or {})
+
+        self.devices[uid_number] = simulated_device
+
+        # if the simulator is already running then the callback thread starts
+        # to emit the callbacks of the new device
+        with self.callback_condition:
+            self.callback_devices_added.append(simulated_device)
+            self.callback_condition.notify()
+
+        return base58encode(uid_number)
+
+    def start(self):
+        """
+        Starts to accept connections and to emit callbacks in the background.
+        Returns the port, which is useful if the simulator was created with
+        port 0 to choose a free port.
+        """
+
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_socket.bind((self.host, self.port))
+        self.server_socket.listen(10)
+        self.port = self.server_socket.getsockname()[1]
+
+        with self.callback_condition:
+            self.callback_stopped = False
+            self.callback_devices_added = list(self.devices.values())
+
+        self.accept_thread = threading.Thread(name='Simulator-Acceptor', target=self.accept_loop)
+        self.accept_thread.daemon = True
+        self.accept_thread.start()
+
+        self.callback_thread = threading.Thread(name='Simulator-Callback-Emitter', target=self.callback_loop)
+        self.callback_thread.daemon = True
+        self.callback_thread.start()
+
+        return self.port
+
+    def stop(self):
+        """
+        Stops the simulator and closes all connections.
+        """
+
+        with self.callback_condition:
+            self.callback_stopped = True
+            self.callback_condition.notify()
+
+        if self.server_socket != None:
+            try:
+                self.server_socket.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+            self.server_socket.close()
+            self.server_socket = None
+
+        with self.connections_lock:
+            connections = list(self.connections)
+
+        for connection in connections:
+            connection.close()
+
+        for connection in connections:
+            connection.join()
+
+        if self.accept_thread != None:
+            self.accept_thread.join()
+            self.accept_thread = None
+
+        if self.callback_thread != None:
+            self.callback_thread.join()
+            self.callback_thread = None
+
+    def get_connection_count(self):
+        with self.connections_lock:
+            return len(self.connections)
+
+    def remove_connection(self, connection):
+        with self.connections_lock:
+            if connection in self.connections:
+                self.connections.remove(connection)
+
+    def accept_loop(self):
+        server_socket = self.server_socket
+
+        while True:
+            try:
+                sock, address = server_socket.accept()
+            except socket.error:
+                break
+
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            connection = SimulatorConnection(self, sock, address)
+
+            with self.connections_lock:
+                self.connections.append(connection)
+
+            connection.start()
+
+    def get_response_delay(self):
+        if self.jitter > 0:
+            return self.latency + random.uniform(0, self.jitter)
+
+        return self.latency
+
+    def send_response(self, connection, request, payload=b'', error_code=0):
+        uid, _, function_id, sequence_number_and_options = struct.unpack_from('<IBBB', request, 0)
+        header = make_header(uid, 8 + len(payload), function_id, sequence_number_and_options, error_code)
+
+        connection.queue_packet(header + payload, self.get_response_delay())
+
+    def handle_request(self, connection, request):
+        uid, length, function_id, sequence_number_and_options = struct.unpack_from('<IBBB', request, 0)
+        response_expected = sequence_number_and_options & 0x08 != 0
+
+        if uid == 0:
+            if function_id == FUNCTION_ENUMERATE:
+                for device in list(self.devices.values()):
+                    payload = device.get_enumerate_payload()
+
+                    connection.queue_packet(make_header(device.uid, 8 + len(payload), CALLBACK_ENUMERATE, 0) + payload,
+                                            self.get_response_delay())
+
+            # disconnect probes and other broadcasts need no response
+            return
+
+        if uid == BRICK_DAEMON_UID:
+            # authentication always succeeds
+            if function_id == BRICK_DAEMON_FUNCTION_GET_AUTHENTICATION_NONCE:
+                self.send_response(connection, request, struct.pack('<I', random.randint(0, 0xFFFFFFFF)))
+            elif function_id == BRICK_DAEMON_FUNCTION_AUTHENTICATE and response_expected:
+                self.send_response(connection, request)
+
+            return
+
+        device = self.devices.get(uid)
+
+        if device == None: # like brickd, requests for unknown devices are not answered
+            return
+
+        function = device.functions.get(function_id)
+
+        if function == None:
+            if response_expected:
+                self.send_response(connection, request, error_code=ERROR_CODE_FUNCTION_NOT_SUPPORTED)
+
+            return
+
+        if length != function.request_size:
+            if response_expected:
+                self.send_response(connection, request, error_code=ERROR_CODE_INVALID_PARAMETER)
+
+            return
+
+        if function_id == FUNCTION_GET_IDENTITY:
+            self.send_response(connection, request, device.get_identity_payload())
+            return
+
+        if function.stream_out != None:
+            # the chunk offset advances even if no response is expected. it
+            # is kept per connection, so clients reading the same stream
+            # don't get each other's chunks
+            stream_out = function.stream_out
+            key = (uid, function_id)
+            length = stream_out.get_length(request)
+            chunk_offset = connection.stream_offsets.get(key, 0)
+
+            if chunk_offset >= length: # the requested length changed
+                chunk_offset = 0
+
+            response = bytearray(function.response_size)
+            connection.stream_offsets[key] = stream_out.fill_chunk(response, length, chunk_offset)
+        elif not response_expected:
+            return
+        else:
+            response = bytearray(function.response_size)
+
+            if function.stream_in != None:
+                function.stream_in.fill_chunk_written(request, response)
+
+        if response_expected:
+            response[0:8] = make_header(uid, function.response_size, function_id, sequence_number_and_options)
+
+            connection.queue_packet(bytes(response), self.get_response_delay())
+
+    def emit_callback(self, device, callback):
+        if callback.stream_out != None:
+            packets = []
+            length = callback.stream_out.get_length()
+            chunk_offset = 0
+
+            for _ in range(callback.stream_out.get_chunk_count(length)):
+                packet = bytearray(callback.response_size)
+                chunk_offset = callback.stream_out.fill_chunk(packet, length, chunk_offset)
+                packet[0:8] = make_header(device.uid, callback.response_size, callback.function_id, 0)
+                packets.append(bytes(packet))
+
+            data = b''.join(packets)
+        else:
+            data = make_header(device.uid, callback.response_size, callback.function_id, 0) + \
+                   bytes(bytearray(callback.response_size - 8))
+
+        with self.connections_lock:
+            connections = list(self.connections)
+
+        for connection in connections:
+            connection.queue_packet(data)
+
+    def callback_loop(self):
+        schedule = [] # heap of (due time, counter, device, callback)
+        counter = 0
+
+        while True:
+            with self.callback_condition:
+                while not self.callback_stopped and len(self.callback_devices_added) == 0:
+                    if len(schedule) > 0:
+                        timeout = schedule[0][0] - time.time()
+
+                        if timeout <= 0:
+                            break
+                    else:
+                        timeout = None
+
+                    self.callback_condition.wait(timeout)
+
+                if self.callback_stopped:
+                    break
+
+                devices_added = self.callback_devices_added
+                self.callback_devices_added = []
+
+            now = time.time()
+
+            for device in devices_added:
+                for callback in device.callbacks:
+                    if callback.rate > 0:
+                        heapq.heappush(schedule, (now, counter, device, callback))
+                        counter += 1
+
+            if len(schedule) == 0 or schedule[0][0] > time.time():
+                continue
+
+            due, order, device, callback = heapq.heappop(schedule)
+            now = time.time()
+
+            self.emit_callback(device, callback)
+
+            # if the emission falls behind by more than a second then skip
+            # the missed callbacks instead of emitting them in a burst
+            due = max(due + 1.0 / callback.rate, now - 1.0)
+
+            heapq.heappush(schedule, (due, order, device, callback))
+
+    def run(self):
+        """
+        Starts the simulator and blocks until it is interrupted.
+        """
+
+        port = self.start()
+
+        print('Listening on {0}:{1}'.format(self.host, port))
+        sys.stdout.flush()
+
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+        self.stop()
+
+def parse_callback_rate(argument):
+    if '=' in argument:
+        name, rate = argument.split('=', 1)
+    else:
+        name, rate = None, argument
+
+    try:
+        rate = float(rate)
+    except ValueError:
+        raise argparse.ArgumentTypeError('invalid callback rate: {0}'.format(argument))
+
+    if rate < 0:
+        raise argparse.ArgumentTypeError('invalid callback rate: {0}'.format(argument))
+
+    return name, rate
+
+def main():
+    parser = argparse.ArgumentParser(description='Brick Daemon simulator for testing bindings without hardware')
+    parser.add_argument('--host', default='localhost', help='host to listen on (default: localhost)')
+    parser.add_argument('--port', type=int, default=4223, help='port to listen on (default: 4223)')
+    parser.add_argument('--latency', type=float, default=0, help='response latency in milliseconds (default: 0)')
+    parser.add_argument('--jitter', type=float, default=0, help='random additional response latency in milliseconds (default: 0)')
+    parser.add_argument('--stream-length', type=int, help='length of variable-length streams (default: 1000)')
+    parser.add_argument('--callback-rate', type=parse_callback_rate, action='append', default=[], metavar='[CALLBACK=]RATE',
+                        help='emit a callback, or all callbacks, RATE times per second. can be given multiple times')
+    parser.add_argument('--list', action='store_true', help='list the available devices and exit')
+    parser.add_argument('devices', nargs='*', metavar='DEVICE[:UID]', help='config name of a device to simulate, for example bricklet_temperature_v2')
+
+    args = parser.parse_args()
+    simulator = BrickdSimulator(args.host, args.port, args.latency / 1000.0, args.jitter / 1000.0, args.stream_length)
+
+    if args.list:
+        for name in simulator.get_device_names():
+            print(name)
+
+        return
+
+    callback_rates = dict(args.callback_rate)
+    devices = args.devices
+
+    if len(devices) == 0:
+        devices = simulator.get_device_names()
+
+    # add bricks first, so that the bricklets can be connected to them
+    devices = sorted(devices, key=lambda device: not device.startswith('brick_'))
+
+    for device in devices:
+        if ':' in device:
+            name, uid = device.split(':', 1)
+        else:
+            name, uid = device, None
+
+        try:
+            uid = simulator.add_device(name, uid, callback_rates)
+        except ValueError as e:
+            parser.error(str(e))
+
+        print('Simulating {0} with UID {1}'.format(simulator.device_models[name].get_long_display_name(), uid))
+
+    simulator.run()
+
+if __name__ == '__main__':
+    main()
@@ -310,8 +310,7 @@ class TCPIPDocGenerator(common.DocGenerator):
         return TCPIPDocElement
 
     def generate(self, device):
-        with open(device.get_doc_rst_path(), 'w') as f:
-            f.write(device.get_tcpip_doc())
+        common.write_output_file(device.get_doc_rst_path(), device.get_tcpip_doc())
 
 def generate(root_dir, language):
     common.generate(root_dir, language, TCPIPDocGenerator)
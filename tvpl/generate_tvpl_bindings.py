@@ -316,8 +316,7 @@ class TVPLBindingsDevice(tvpl_common.TVPLDevice):
         filename_tvpl_toolbox_part = '_'.join([self.get_category().under,
                                                self.get_name().under]) + '.toolbox.part'
 
-        with open(os.path.join(self.get_generator().get_bindings_dir(), filename_tvpl_toolbox_part), 'wb') as f:
-            f.write(etree.tostring(e_device))
+        common.write_output_file(os.path.join(self.get_generator().get_bindings_dir(), filename_tvpl_toolbox_part), etree.tostring(e_device))
 
         return source
 
@@ -820,14 +819,11 @@ class TVPLBindingsGenerator(tvpl_common.TVPLGeneratorTrait, common.BindingsGener
         filename_tvpl_code_generator_python = '{devicecategory}_{devicename}.generator.python'.format(devicecategory=device.get_category().under,
                                                                                                       devicename=device.get_name().under)
 
-        with open(os.path.join(self.get_bindings_dir(), filename_tvpl_block), 'w') as f:
-            f.write(device.get_tvpl_source_block())
+        common.write_output_file(os.path.join(self.get_bindings_dir(), filename_tvpl_block), device.get_tvpl_source_block())
 
-        with open(os.path.join(self.get_bindings_dir(), filename_tvpl_code_generator_javascript), 'w') as f:
-            f.write(device.get_tvpl_source_generator_javascript())
+        common.write_output_file(os.path.join(self.get_bindings_dir(), filename_tvpl_code_generator_javascript), device.get_tvpl_source_generator_javascript())
 
-        with open(os.path.join(self.get_bindings_dir(), filename_tvpl_code_generator_python), 'w') as f:
-            f.write(device.get_tvpl_source_generator_python())
+        common.write_output_file(os.path.join(self.get_bindings_dir(), filename_tvpl_code_generator_python), device.get_tvpl_source_generator_python())
 
         if device.is_released():
             self.released_files.append('_'.join([device.get_category().under, device.get_name().under]))
@@ -314,8 +314,7 @@ class TVPLDocGenerator(tvpl_common.TVPLGeneratorTrait, common.DocGenerator):
         return tvpl_common.TVPLElement
 
     def generate(self, device):
-        with open(device.get_doc_rst_path(), 'w') as f:
-            f.write(device.get_tvpl_doc())
+        common.write_output_file(device.get_doc_rst_path(), device.get_tvpl_doc())
 
 def generate(root_dir, language):
     common.generate(root_dir, language, TVPLDocGenerator)
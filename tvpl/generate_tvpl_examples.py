@@ -697,8 +697,7 @@ class TVPLExamplesGenerator(tvpl_common.TVPLGeneratorTrait, common.ExamplesGener
             else:
                 print('  - ' + filename)
 
-            with open(filepath, 'w') as f:
-                f.write(example.get_tvpl_source().encode('utf-8'))
+            common.write_output_file(filepath, example.get_tvpl_source().encode('utf-8'))
 
 def generate(root_dir):
     print('### disabled')
@@ -413,8 +413,7 @@ class VBNETDocGenerator(common.DocGenerator):
         return element.get_name().headless
 
     def generate(self, device):
-        with open(device.get_doc_rst_path(), 'w') as f:
-            f.write(device.get_vbnet_doc())
+        common.write_output_file(device.get_doc_rst_path(), device.get_vbnet_doc())
 
 def generate(root_dir, language):
     common.generate(root_dir, language, VBNETDocGenerator)
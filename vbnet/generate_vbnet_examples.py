@@ -730,8 +730,7 @@ class VBNETExamplesGenerator(common.ExamplesGenerator):
             else:
                 print('  - ' + filename)
 
-            with open(filepath, 'w') as f:
-                f.write(example.get_vbnet_source())
+            common.write_output_file(filepath, example.get_vbnet_source())
 
 def generate(root_dir):
     common.generate(root_dir, 'en', VBNETExamplesGenerator)